@@ -0,0 +1,44 @@
+# app/api/admin.py
+from __future__ import annotations
+import secrets
+from fastapi import APIRouter, Depends, Header, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, Optional
+
+from app.api.schemas import RepairReport, SlowQueryOut
+from app.core.deps import get_db
+from app.core.errors import Forbidden
+from app.core.pagination import Limit
+from app.core.settings import settings
+from app.db.slowlog import slow_queries
+from app.services import utilization
+
+
+async def require_admin(token: Annotated[Optional[str], Header(alias="X-Admin-Token")] = None) -> None:
+    if settings.admin_token is None:
+        if not settings.admin_open:
+            raise Forbidden("admin endpoints are disabled; set SUBNETTER_ADMIN_TOKEN")
+        return
+    if token is None or not secrets.compare_digest(token, settings.admin_token):
+        raise Forbidden("invalid admin token")
+
+
+router = APIRouter(prefix="/v1/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/slow-queries", response_model=list[SlowQueryOut])
+async def list_slow_queries(limit: Limit = 50):
+    """Recent statements over ``slow_query_ms``, newest first."""
+    return slow_queries.snapshot(limit)
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries():
+    slow_queries.clear()
+
+@router.post("/utilization:repair", response_model=RepairReport)
+async def repair_utilization(
+    vrf_id: str | None = None,
+    batch_size: Annotated[int, Query(ge=1, le=10_000)] = 500,
+    db: AsyncSession = Depends(get_db),
+):
+    """Recompute prefix utilization counters in batches; reports how many had drifted."""
+    return await utilization.repair_utilization(db, vrf_id=vrf_id, batch_size=batch_size)
@@ -0,0 +1,37 @@
+# app/api/calc.py
+from __future__ import annotations
+from fastapi import APIRouter
+
+from app.api.schemas import (
+    CalcInfoIn, CalcInfoOut, CalcSplitIn, CalcSummarizeIn, CalcContainsIn, CalcContainsOut,
+    CalcOverlapsIn, CalcOverlapsOut,
+)
+from app.services import calc
+
+router = APIRouter(prefix="/subnet", tags=["calculator"])
+
+# CPU-bound and DB-free: plain `def` routes run in the threadpool, off the event loop
+
+@router.get("", response_model=CalcInfoOut)
+def subnet(cidr: str):
+    return calc.info([cidr])[0]
+
+@router.post("/info", response_model=list[CalcInfoOut])
+def info(body: CalcInfoIn):
+    return calc.info(body.items, strict=body.strict)
+
+@router.post("/split", response_model=list[str])
+def split(body: CalcSplitIn):
+    return calc.split(body.cidr, body.new_prefix, body.limit)
+
+@router.post("/summarize", response_model=list[str])
+def summarize(body: CalcSummarizeIn):
+    return calc.summarize(body.items)
+
+@router.post("/contains", response_model=CalcContainsOut)
+def contains(body: CalcContainsIn):
+    return CalcContainsOut(matches=calc.contains(body.networks, body.items))
+
+@router.post("/overlaps", response_model=CalcOverlapsOut)
+def overlaps(body: CalcOverlapsIn):
+    return CalcOverlapsOut(pairs=calc.overlaps(body.items))
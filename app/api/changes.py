@@ -0,0 +1,44 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.schemas import ChangeKind, ChangesPage
+from app.core.deps import get_read_db
+from app.core.settings import settings
+from app.services import changes
+
+router = APIRouter(prefix="/v1/changes", tags=["changes"])
+
+Since = Annotated[str | None, Query(
+    description="Token of the last change seen (a change's `token` or a page's `next_since`); "
+                "omit to replay every retained change, or `now` to start from the current head.",
+)]
+Kinds = Annotated[list[ChangeKind] | None, Query(alias="kind", description="only these entity kinds; repeatable")]
+
+@router.get("", response_model=ChangesPage)
+async def list_changes(
+    since: Since = None,
+    kinds: Kinds = None,
+    vrf_id: str | None = None,
+    limit: int = Query(default=100, ge=1, le=settings.change_feed_page_size),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Changes after ``since``, oldest first. 410 when the token has expired: re-list, then resume from ``now``."""
+    return await changes.list_changes(db, since=since, kinds=kinds, vrf_id=vrf_id, limit=limit)
+
+@router.get("/stream")
+async def stream_changes(
+    since: Since = None,
+    kinds: Kinds = None,
+    vrf_id: str | None = None,
+    last_event_id: Annotated[str | None, Header()] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Server-sent events, one ``change`` event per change; reconnects resume from ``Last-Event-ID``."""
+    after = await changes.resolve_since(db, last_event_id or since)  # 410 before the stream starts
+    return StreamingResponse(
+        changes.stream_changes(after, kinds, vrf_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.schemas import IPCreate, IPUpdate, IPOut, Page
-from app.core.deps import get_db
-from app.services import ipam as svc
+from app.api.schemas import IPCreate, IPUpdate, IPOut, BulkFormat, ImportReport, Page
+from app.core.deps import get_db, get_read_db
+from app.core.pagination import Cursor, EstimateTotal, IncludeTotal, Limit, Offset
+from app.core.responses import ModelResponse
+from app.services import bulk, ipam as svc
 
 router = APIRouter(prefix="/v1/ips", tags=["ips"])
 
@@ -10,8 +12,14 @@ router = APIRouter(prefix="/v1/ips", tags=["ips"])
 async def create_ip(body: IPCreate, db: AsyncSession = Depends(get_db)):
     return await svc.create_ip(db, body)
 
+@router.post(":import", response_model=ImportReport)
+async def import_ips(request: Request, format: BulkFormat | None = None, db: AsyncSession = Depends(get_db)):
+    """Stream NDJSON or CSV rows shaped like IPCreate; see ImportReport for per-row errors."""
+    fmt = bulk.resolve_format(request.headers.get("content-type"), format)
+    return await bulk.import_ips(db, request.stream(), fmt)
+
 @router.get("/{ip_id}", response_model=IPOut)
-async def get_ip(ip_id: str, db: AsyncSession = Depends(get_db)):
+async def get_ip(ip_id: str, db: AsyncSession = Depends(get_read_db)):
     return await svc.get_ip(db, ip_id)
 
 @router.get("", response_model=Page[IPOut])
@@ -20,11 +28,18 @@ async def list_ips(
     prefix_id: str | None = None,
     status: str | None = None,
     address: str | None = None,
-    limit: int = 50,
-    offset: int = 0,
-    db: AsyncSession = Depends(get_db),
+    within: str | None = None,
+    limit: Limit = 50,
+    offset: Offset = 0,
+    cursor: Cursor = None,
+    include_total: IncludeTotal = True,
+    estimate_total: EstimateTotal = False,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return await svc.list_ips(db, vrf_id=vrf_id, prefix_id=prefix_id, status=status, address=address, limit=limit, offset=offset)
+    return ModelResponse(await svc.list_ips(
+        db, vrf_id=vrf_id, prefix_id=prefix_id, status=status, address=address, within=within,
+        limit=limit, offset=offset, cursor=cursor, include_total=include_total, estimate_total=estimate_total,
+    ))
 
 @router.patch("/{ip_id}", response_model=IPOut)
 async def update_ip(ip_id: str, body: IPUpdate, db: AsyncSession = Depends(get_db)):
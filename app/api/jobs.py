@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.schemas import DeleteJobOut
+from app.core.deps import get_read_db
+from app.services import cascade
+
+router = APIRouter(prefix="/v1/jobs", tags=["jobs"])
+
+@router.get("/{job_id}", response_model=DeleteJobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_read_db)):
+    """Progress of a background VRF or tenant delete."""
+    return await cascade.get_job(db, job_id)
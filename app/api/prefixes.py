@@ -1,14 +1,21 @@
 # app/api/routers/prefixes.py
 from __future__ import annotations
-from fastapi import APIRouter, Depends
+import uuid
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.schemas import (
-    PrefixCreate, PrefixUpdate, PrefixOut, CarveChildrenIn, FreeSpaceOut, NextIPOut, Page,
+    PrefixCreate, PrefixUpdate, PrefixOut, CarveChildrenIn, FreeSpaceOut, FreeBlocksPage, NextIPOut, NextIPBatchIn, Page,
+    BulkFormat, ImportReport, PrefixUtilizationOut, PrefixTreeNode,
 )
-from app.core.deps import get_db
+from app.core.deps import get_db, get_read_db
 from app.core.idempotency import IdemKey
-from app.services import ipam as svc
+from app.core.pagination import Cursor, EstimateTotal, IncludeTotal, Limit, Offset
+from app.core.responses import ModelResponse
+from app.core.settings import settings
+from app.services import bulk, ipam as svc, tree, utilization
 
 router = APIRouter(prefix="/v1/prefixes", tags=["prefixes"])
 
@@ -16,8 +23,14 @@ router = APIRouter(prefix="/v1/prefixes", tags=["prefixes"])
 async def create_prefix(body: PrefixCreate, db: AsyncSession = Depends(get_db), idem: IdemKey = None):
     return await svc.create_prefix(db, body, idem=idem)
 
+@router.post(":import", response_model=ImportReport)
+async def import_prefixes(request: Request, format: BulkFormat | None = None, db: AsyncSession = Depends(get_db)):
+    """Stream NDJSON or CSV rows shaped like PrefixCreate; see ImportReport for per-row errors."""
+    fmt = bulk.resolve_format(request.headers.get("content-type"), format)
+    return await bulk.import_prefixes(db, request.stream(), fmt)
+
 @router.get("/{prefix_id}", response_model=PrefixOut)
-async def get_prefix(prefix_id: str, db: AsyncSession = Depends(get_db)):
+async def get_prefix(prefix_id: str, db: AsyncSession = Depends(get_read_db)):
     return await svc.get_prefix(db, prefix_id)
 
 @router.patch("/{prefix_id}", response_model=PrefixOut)
@@ -33,20 +46,62 @@ async def list_prefixes(
     vrf_id: str | None = None,
     status: str | None = None,
     cidr_contains: str | None = None,
-    limit: int = 50,
-    offset: int = 0,
-    db: AsyncSession = Depends(get_db),
+    cidr_overlaps: str | None = None,
+    limit: Limit = 50,
+    offset: Offset = 0,
+    cursor: Cursor = None,
+    include_total: IncludeTotal = True,
+    estimate_total: EstimateTotal = False,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return await svc.list_prefixes(db, vrf_id=vrf_id, status=status, cidr_contains=cidr_contains, limit=limit, offset=offset)
+    return ModelResponse(await svc.list_prefixes(
+        db, vrf_id=vrf_id, status=status, cidr_contains=cidr_contains, cidr_overlaps=cidr_overlaps,
+        limit=limit, offset=offset, cursor=cursor, include_total=include_total, estimate_total=estimate_total,
+    ))
 
 @router.post("/{prefix_id}/children", response_model=list[PrefixOut], status_code=201)
 async def carve_children(prefix_id: str, body: CarveChildrenIn, db: AsyncSession = Depends(get_db), idem: IdemKey = None):
     return await svc.carve_children(db, prefix_id, body, idem=idem)
 
 @router.get("/{prefix_id}/free-space", response_model=list[FreeSpaceOut])
-async def free_space(prefix_id: str, mask: int, db: AsyncSession = Depends(get_db)):
+async def free_space(prefix_id: str, mask: int, db: AsyncSession = Depends(get_read_db)):
     return await svc.free_space(db, prefix_id, mask)
 
+@router.get("/{prefix_id}/free-blocks", response_model=FreeBlocksPage)
+async def free_blocks(
+    prefix_id: str,
+    mask: int | None = None,
+    limit: Limit = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await svc.free_blocks(db, prefix_id, mask=mask, limit=limit, cursor=cursor)
+
 @router.post("/{prefix_id}/ips/next", response_model=NextIPOut, status_code=201)
 async def next_ip(prefix_id: str, db: AsyncSession = Depends(get_db), idem: IdemKey = None):
     return await svc.allocate_next_ip(db, prefix_id, idem=idem)
+
+@router.post("/{prefix_id}/ips/next:batch", response_model=list[NextIPOut], status_code=201)
+async def next_ips(prefix_id: str, body: NextIPBatchIn, db: AsyncSession = Depends(get_db), idem: IdemKey = None):
+    return await svc.allocate_next_ips(db, prefix_id, body, idem=idem)
+
+@router.get("/{prefix_id}/utilization", response_model=PrefixUtilizationOut)
+async def prefix_utilization(prefix_id: str, db: AsyncSession = Depends(get_read_db)):
+    """Read from the prefix's maintained counters; no IP or child scan."""
+    return await utilization.get_prefix_utilization(db, prefix_id)
+
+@router.get("/{prefix_id}/tree", response_model=PrefixTreeNode)
+async def prefix_tree(
+    prefix_id: str,
+    depth: int | None = Query(
+        default=None, ge=0, le=settings.tree_max_depth,
+        description="Levels below the prefix; omit for all, down to tree_max_depth (deeper nodes are flagged `truncated`).",
+    ),
+    stream: bool = Query(default=False, description="NDJSON rows (parents first) instead of one nested document."),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """The prefix's subtree along parent_id, fetched with one recursive query."""
+    if stream:
+        await svc.get_prefix(db, prefix_id)  # 404 before the stream starts
+        return StreamingResponse(tree.stream_prefix_tree(uuid.UUID(prefix_id), depth), media_type="application/x-ndjson")
+    return await tree.get_prefix_tree(db, prefix_id, depth)
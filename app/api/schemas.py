@@ -44,9 +44,11 @@ T = TypeVar("T")
 
 class Page(GenericModel, Generic[T]):
     items: list[T]
-    total: int
+    total: Optional[int] = None  # null when include_total=false
+    total_estimated: bool = False
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 
 class ErrorResponse(APIModel):
@@ -155,7 +157,9 @@ class PrefixOut(ORMModel):
 
 class IPCreate(APIModel):
     vrf_id: uuid.UUID
-    prefix_id: uuid.UUID
+    prefix_id: Optional[uuid.UUID] = Field(
+        default=None, description="Omit to use the most specific prefix in the VRF containing the address.",
+    )
     address: str = Field(description="Canonical IP address (IPv4 or IPv6)")
     status: IPStatus = IPStatus.active
     note: Optional[str] = Field(default="", max_length=512)
@@ -189,6 +193,16 @@ class IPOut(ORMModel):
 # Actions / utilities
 # =====================
 
+class LookupIn(APIModel):
+    ips: list[str] = Field(min_length=1, max_length=10_000)
+
+
+class LookupOut(APIModel):
+    ip: str
+    prefix_id: Optional[uuid.UUID] = Field(default=None, description="Most specific prefix containing ip; null if none.")
+    cidr: Optional[str] = None
+
+
 class CarveChildrenIn(APIModel):
     mask: int = Field(ge=0, le=128)
     count: int = Field(default=1, ge=1, le=4096)
@@ -199,6 +213,188 @@ class FreeSpaceOut(APIModel):
     cidr: str
 
 
+class FreeBlocksPage(APIModel):
+    items: list[FreeSpaceOut]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Pass back as `cursor` to fetch the next page; null when exhausted.",
+    )
+
+
 class NextIPOut(APIModel):
     id: uuid.UUID
     address: str
+
+
+class NextIPBatchIn(APIModel):
+    count: int = Field(ge=1, le=4096)
+    contiguous: bool = Field(default=False, description="Return consecutive addresses or fail with 409.")
+
+
+class PrefixTreeRow(PrefixOut):
+    depth: int = Field(description="Levels below the requested root (0 = the root).")
+    truncated: bool = Field(
+        default=False, description="Has children below tree_max_depth that were left out (only when depth is omitted).",
+    )
+
+
+class PrefixTreeNode(PrefixTreeRow):
+    children: list["PrefixTreeNode"] = Field(default_factory=list)
+
+
+# =====================
+# Utilization
+# =====================
+
+class PrefixUtilizationOut(APIModel):
+    prefix_id: uuid.UUID
+    cidr: str
+    total_addresses: int
+    host_capacity: int = Field(description="Assignable hosts, as counted by next-IP allocation.")
+    ip_count: int
+    ip_utilization: float = Field(description="ip_count / host_capacity")
+    child_count: int = Field(description="Direct child prefixes (carved from this one).")
+    child_addresses: int = Field(description="Addresses covered by direct child prefixes.")
+    child_utilization: float = Field(description="child_addresses / total_addresses")
+
+
+class VrfUtilizationOut(APIModel):
+    vrf_id: uuid.UUID
+    prefix_count: int
+    ip_count: int = Field(description="Sum of the prefixes' ip_count; no address or coverage ratio at VRF level.")
+    prefixes_by_status: dict[str, int]
+
+
+class RepairReport(APIModel):
+    scanned: int
+    fixed: int
+
+
+# =====================
+# Subnet calculator
+# =====================
+
+CalcItems = list[str]  # addresses ("10.0.0.1") or CIDRs ("10.0.0.0/24"), IPv4 and IPv6 mixed
+
+
+class CalcInfoIn(APIModel):
+    items: CalcItems = Field(min_length=1, max_length=10_000)
+    strict: bool = Field(default=False, description="Reject CIDRs with host bits set instead of masking them off.")
+
+
+class CalcInfoOut(APIModel):
+    cidr: str
+    version: Literal[4, 6]
+    network: str
+    broadcast: str
+    netmask: str
+    prefixlen: int
+    num_addresses: int
+    first_host: str
+    last_host: str
+    host_count: int
+
+
+class CalcSplitIn(APIModel):
+    cidr: str
+    new_prefix: int = Field(ge=0, le=128)
+    limit: int = Field(default=4096, ge=1, le=65_536)
+
+
+class CalcSummarizeIn(APIModel):
+    items: CalcItems = Field(min_length=1, max_length=100_000)
+
+
+class CalcContainsIn(APIModel):
+    networks: CalcItems = Field(min_length=1, max_length=10_000)
+    items: CalcItems = Field(min_length=1, max_length=10_000)
+
+
+class CalcContainsOut(APIModel):
+    matches: list[list[int]] = Field(description="Per item, indexes into `networks` that contain it.")
+
+
+class CalcOverlapsIn(APIModel):
+    items: CalcItems = Field(min_length=1, max_length=3_000)
+
+
+class CalcOverlapsOut(APIModel):
+    pairs: list[tuple[int, int]] = Field(description="Index pairs (i < j) of overlapping items.")
+
+
+# =====================
+# Admin
+# =====================
+
+class SlowQueryOut(APIModel):
+    at: datetime
+    duration_ms: float
+    statement: str
+    params: dict | list | str | None = Field(default=None, description="Bind parameter types only; values are never kept.")
+    plan: Optional[list | dict] = Field(default=None, description="EXPLAIN (FORMAT JSON) output, when sampled.")
+
+
+# =====================
+# Bulk import / export
+# =====================
+
+BulkFormat = Literal["ndjson", "csv"]
+
+
+class ImportRowError(APIModel):
+    line: int
+    error: str
+
+
+class ImportReport(APIModel):
+    rows: int
+    imported: int
+    failed: int
+    errors: list[ImportRowError]
+    errors_truncated: bool = False
+    seconds: float
+    rows_per_second: float
+
+
+# =====================
+# Change feed
+# =====================
+
+ChangeKind = Literal["tenant", "vrf", "prefix", "ip"]
+ChangeOp = Literal["create", "update", "delete"]
+
+
+class ChangeOut(APIModel):
+    token: str = Field(description="Position of this change; pass as `since` to resume after it.")
+    kind: ChangeKind
+    op: ChangeOp
+    id: uuid.UUID
+    vrf_id: Optional[uuid.UUID] = None
+    data: Optional[dict] = Field(
+        default=None,
+        description="The entity as its GET would return it right after the change; null on delete. "
+                    "Deleting a VRF also removes its prefixes and IPs without a row for each.",
+    )
+    created_at: datetime
+
+
+class ChangesPage(APIModel):
+    items: list[ChangeOut]
+    next_since: str = Field(description="Pass back as `since`; it moves past filtered-out changes too.")
+    has_more: bool = Field(description="More changes are ready now; fetch again without waiting.")
+
+
+# =====================
+# Background jobs
+# =====================
+
+class DeleteJobOut(ORMModel):
+    id: uuid.UUID
+    kind: Literal["vrf", "tenant"]
+    target_id: uuid.UUID
+    state: Literal["running", "done", "failed"]
+    total: int = Field(description="Prefixes and IPs to delete, counted when the job started.")
+    deleted: int = Field(description="Prefixes and IPs deleted so far.")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.schemas import TenantCreate, TenantUpdate, TenantOut, Page
-from app.core.deps import get_db
+from app.api.schemas import TenantCreate, TenantUpdate, TenantOut, DeleteJobOut, Page
+from app.core.deps import get_db, get_read_db
+from app.core.pagination import Cursor, EstimateTotal, IncludeTotal, Limit, Offset
+from app.core.responses import ModelResponse
 from app.services import ipam as svc
 
 router = APIRouter(prefix="/v1/tenants", tags=["tenants"])
@@ -13,13 +15,24 @@ async def create_tenant(body: TenantCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{tenant_id}", response_model=TenantOut)
-async def get_tenant(tenant_id: str, db: AsyncSession = Depends(get_db)):
+async def get_tenant(tenant_id: str, db: AsyncSession = Depends(get_read_db)):
     return await svc.get_tenant(db, tenant_id)
 
 
 @router.get("", response_model=Page[TenantOut])
-async def list_tenants(q: str | None = None, limit: int = 50, offset: int = 0, db: AsyncSession = Depends(get_db)):
-    return await svc.list_tenants(db, q=q, limit=limit, offset=offset)
+async def list_tenants(
+    q: str | None = None,
+    limit: Limit = 50,
+    offset: Offset = 0,
+    cursor: Cursor = None,
+    include_total: IncludeTotal = True,
+    estimate_total: EstimateTotal = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return ModelResponse(await svc.list_tenants(
+        db, q=q, limit=limit, offset=offset,
+        cursor=cursor, include_total=include_total, estimate_total=estimate_total,
+    ))
 
 
 @router.patch("/{tenant_id}", response_model=TenantOut)
@@ -27,6 +40,9 @@ async def update_tenant(tenant_id: str, body: TenantUpdate, db: AsyncSession = D
     return await svc.update_tenant(db, tenant_id, body)
 
 
-@router.delete("/{tenant_id}", status_code=204)
+@router.delete("/{tenant_id}", status_code=204, responses={202: {"model": DeleteJobOut}})
 async def delete_tenant(tenant_id: str, db: AsyncSession = Depends(get_db)):
-    await svc.delete_tenant(db, tenant_id)
+    """204 once deleted; a large tenant returns 202 with a job to poll at its Location instead."""
+    job = await svc.delete_tenant(db, tenant_id)
+    if job is not None:
+        return ModelResponse(job, status_code=202, headers={"Location": f"/v1/jobs/{job.id}"})
@@ -1,8 +1,13 @@
+import uuid
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.schemas import VrfCreate, VrfUpdate, VrfOut, Page
-from app.core.deps import get_db
-from app.services import ipam as svc
+from app.api.schemas import VrfCreate, VrfUpdate, VrfOut, VrfUtilizationOut, BulkFormat, LookupIn, LookupOut, DeleteJobOut, Page
+from app.core.deps import get_db, get_read_db
+from app.core.pagination import Cursor, EstimateTotal, IncludeTotal, Limit, Offset
+from app.core.responses import ModelResponse
+from app.services import bulk, ipam as svc, lpm, utilization
 
 router = APIRouter(prefix="/v1/vrfs", tags=["vrfs"])
 
@@ -11,17 +16,53 @@ async def create_vrf(body: VrfCreate, db: AsyncSession = Depends(get_db)):
     return await svc.create_vrf(db, body)
 
 @router.get("/{vrf_id}", response_model=VrfOut)
-async def get_vrf(vrf_id: str, db: AsyncSession = Depends(get_db)):
+async def get_vrf(vrf_id: str, db: AsyncSession = Depends(get_read_db)):
     return await svc.get_vrf(db, vrf_id)
 
 @router.get("", response_model=Page[VrfOut])
-async def list_vrfs(tenant_id: str | None = None, q: str | None = None, limit: int = 50, offset: int = 0, db: AsyncSession = Depends(get_db)):
-    return await svc.list_vrfs(db, tenant_id=tenant_id, q=q, limit=limit, offset=offset)
+async def list_vrfs(
+    tenant_id: str | None = None,
+    q: str | None = None,
+    limit: Limit = 50,
+    offset: Offset = 0,
+    cursor: Cursor = None,
+    include_total: IncludeTotal = True,
+    estimate_total: EstimateTotal = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return ModelResponse(await svc.list_vrfs(
+        db, tenant_id=tenant_id, q=q, limit=limit, offset=offset,
+        cursor=cursor, include_total=include_total, estimate_total=estimate_total,
+    ))
 
 @router.patch("/{vrf_id}", response_model=VrfOut)
 async def update_vrf(vrf_id: str, body: VrfUpdate, db: AsyncSession = Depends(get_db)):
     return await svc.update_vrf(db, vrf_id, body)
 
-@router.delete("/{vrf_id}", status_code=204)
+@router.delete("/{vrf_id}", status_code=204, responses={202: {"model": DeleteJobOut}})
 async def delete_vrf(vrf_id: str, db: AsyncSession = Depends(get_db)):
-    await svc.delete_vrf(db, vrf_id)
+    """204 once deleted; a large VRF returns 202 with a job to poll at its Location instead."""
+    job = await svc.delete_vrf(db, vrf_id)
+    if job is not None:
+        return ModelResponse(job, status_code=202, headers={"Location": f"/v1/jobs/{job.id}"})
+
+@router.get("/{vrf_id}/export")
+async def export_vrf(vrf_id: str, format: BulkFormat = "ndjson", db: AsyncSession = Depends(get_db)):
+    """Stream the VRF's full address plan (prefixes, then IPs) as NDJSON or CSV."""
+    await svc.get_vrf(db, vrf_id)  # 404 before the stream starts
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(bulk.export_vrf(uuid.UUID(vrf_id), format), media_type=media_type)
+
+@router.get("/{vrf_id}/utilization", response_model=VrfUtilizationOut)
+async def vrf_utilization(vrf_id: str, db: AsyncSession = Depends(get_read_db)):
+    """Prefix and IP counts only: one aggregate over the VRF's prefix rows, no IP scan."""
+    return await utilization.get_vrf_utilization(db, vrf_id)
+
+@router.get("/{vrf_id}/lookup", response_model=LookupOut)
+async def lookup(vrf_id: str, ip: str, db: AsyncSession = Depends(get_read_db)):
+    """Most specific prefix in the VRF containing ``ip``."""
+    return (await lpm.lookup(db, vrf_id, [ip]))[0]
+
+@router.post("/{vrf_id}/lookup", response_model=list[LookupOut])
+async def lookup_batch(vrf_id: str, body: LookupIn, db: AsyncSession = Depends(get_read_db)):
+    return await lpm.lookup(db, vrf_id, body.ips)
@@ -1,13 +1,26 @@
 # app/core/deps.py
 from typing import AsyncIterator
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession, create_async_engine
 
-from app.core.settings import settings  # your pydantic-settings
+from fastapi import Request
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.core.settings import settings
+from app.db.db import engine, make_engine
+from app.db.replica import WRITE_TOKEN, ReplicaRouter
 
-engine = create_async_engine(settings.db_url, pool_pre_ping=True)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+replica_router = ReplicaRouter(
+    SessionLocal, make_engine(settings.db_replica_url, name="replica") if settings.db_replica_url else None,
+)
+replica_router.track_commits(engine)
 
 
 async def get_db() -> AsyncIterator[AsyncSession]:
     async with SessionLocal() as session:
         yield session
+
+
+async def get_read_db(request: Request) -> AsyncIterator[AsyncSession]:
+    """Read-only session: the replica when it's up and has the caller's last write, else the primary."""
+    async with await replica_router.session(request.headers.get(WRITE_TOKEN)) as session:
+        yield session
@@ -8,6 +8,16 @@ class Conflict(HTTPException):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail={"error":"conflict","message":message,"details":details})
 
 
+class Forbidden(HTTPException):
+    def __init__(self, message: str):
+        super().__init__(status_code=status.HTTP_403_FORBIDDEN, detail={"error":"forbidden","message":message})
+
+
+class Gone(HTTPException):
+    def __init__(self, message: str):
+        super().__init__(status_code=status.HTTP_410_GONE, detail={"error":"gone","message":message})
+
+
 class NotFound(HTTPException):
     def __init__(self, message: str):
         super().__init__(status_code=status.HTTP_404_NOT_FOUND, detail={"error":"not_found","message":message})
@@ -1,5 +1,244 @@
 # app/core/idempotency.py
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Annotated, Any, Awaitable, Callable, Optional, TypeVar
+
 from fastapi import Header
-from typing import Annotated, Optional
+from pydantic import TypeAdapter
+from pydantic_core import to_jsonable_python
+from sqlalchemy import delete, event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.deps import SessionLocal
+from app.core.errors import Conflict, ValidationErr
+from app.core.settings import settings
+from app.db import models as m
+
+# IdempotencyRecord.key holds "<operation>:<key>" in 320 characters; leave room for the operation
+MAX_KEY_LENGTH = 255
+
+IdemKey = Annotated[Optional[str], Header(
+    alias="Idempotency-Key", max_length=MAX_KEY_LENGTH, description="Optional key to make POST idempotent",
+)]
+
+T = TypeVar("T")
+
+
+def _fingerprint(op: str, args: tuple, kwargs: dict) -> str:
+    raw = json.dumps([op, to_jsonable_python(args), to_jsonable_python(kwargs)], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Records the response of the first call per key and replays it on repeats.
+
+    Lookups go through an in-process LRU (bounded, TTL'd) before the shared
+    ``idempotency_record`` table. A request claims a key by inserting a
+    pending row; duplicates, here or on another replica, wait for that
+    claim to complete instead of executing a second time.
+
+    The owner's first commit on the request session also flips the claim to
+    "committed", in that same transaction. The response is only known after
+    the call returns, so a worker dying before ``_complete`` leaves either a
+    pending claim (nothing was written: safe to take over and run again) or
+    a committed one (the write happened: never re-executed, a 409 instead).
+    """
+
+    def __init__(self, ttl_s: int, max_entries: int):
+        self.ttl = timedelta(seconds=ttl_s)
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, tuple[str, str, float]] = OrderedDict()  # key -> (fingerprint, payload, expires)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._next_purge = 0.0
+
+    async def run(
+        self, db: AsyncSession, key: str, fingerprint: str, adapter: TypeAdapter, call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        deadline = time.monotonic() + settings.idempotency_wait_s
+        while True:
+            hit = self._cached(key)
+            if hit is not None:
+                return self._replay(hit, fingerprint, adapter)
+
+            fut = self._inflight.get(key)
+            if fut is None:
+                state, found = await self._claim(key, fingerprint)
+                if state == "done":
+                    self._remember(key, *found)
+                    return self._replay(found, fingerprint, adapter)
+                if state == "owner":
+                    return await self._execute(db, key, fingerprint, adapter, call)
+                if state == "lost":
+                    raise Conflict(
+                        "the request with this Idempotency-Key was applied but its response was lost; "
+                        "read the resource back instead of retrying"
+                    )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Conflict("a request with this Idempotency-Key is still in progress")
+            if fut is not None:
+                # same-process duplicate: wake up when the owner finishes, then re-check
+                await asyncio.wait([fut], timeout=remaining)
+            else:
+                await asyncio.sleep(min(settings.idempotency_poll_ms / 1000, remaining))
+
+    async def _execute(
+        self, db: AsyncSession, key: str, fingerprint: str, adapter: TypeAdapter, call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        committed = False
+
+        def mark_committed(session) -> None:
+            nonlocal committed
+            if not committed:
+                session.execute(
+                    update(m.IdempotencyRecord)
+                    .where(m.IdempotencyRecord.key == key, m.IdempotencyRecord.state == "pending")
+                    .values(state="committed")
+                    .execution_options(synchronize_session=False)
+                )
+                committed = True
+
+        event.listen(db.sync_session, "before_commit", mark_committed)
+        try:
+            try:
+                result = await call()
+            except BaseException:
+                # failures that wrote nothing are not recorded; the next attempt runs for real
+                await self._release(key)
+                raise
+            finally:
+                event.remove(db.sync_session, "before_commit", mark_committed)
+            payload = json.dumps(adapter.dump_python(result, mode="json"))
+            await self._complete(key, payload)
+            self._remember(key, fingerprint, payload)
+            return result
+        finally:
+            del self._inflight[key]
+            fut.set_result(None)
+
+    # -- in-process LRU --
+
+    def _cached(self, key: str) -> Optional[tuple[str, str]]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return entry[0], entry[1]
+
+    def _remember(self, key: str, fingerprint: str, payload: str) -> None:
+        self._lru[key] = (fingerprint, payload, time.monotonic() + self.ttl.total_seconds())
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _replay(found: tuple[str, str], fingerprint: str, adapter: TypeAdapter) -> Any:
+        if found[0] != fingerprint:
+            raise ValidationErr("Idempotency-Key was already used for a different request")
+        return adapter.validate_python(json.loads(found[1]))
+
+    # -- shared table --
+
+    async def _claim(self, key: str, fingerprint: str) -> tuple[str, Optional[tuple[str, str]]]:
+        """Return ("owner", None), ("done", (fingerprint, payload)), ("pending", None) or ("lost", None)."""
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=settings.idempotency_lease_s)
+        async with SessionLocal() as s:
+            await self._maybe_purge(s, now)
+            s.add(m.IdempotencyRecord(key=key, fingerprint=fingerprint, locked_until=lease, expires_at=now + self.ttl))
+            try:
+                await s.commit()
+                return "owner", None
+            except IntegrityError:
+                await s.rollback()
+
+            # take over expired records and claims abandoned by a crashed worker before it wrote
+            taken = (await s.execute(
+                update(m.IdempotencyRecord)
+                .where(
+                    m.IdempotencyRecord.key == key,
+                    (m.IdempotencyRecord.expires_at < now)
+                    | ((m.IdempotencyRecord.state == "pending") & (m.IdempotencyRecord.locked_until < now)),
+                )
+                .values(fingerprint=fingerprint, state="pending", response=None, locked_until=lease, expires_at=now + self.ttl)
+                .returning(m.IdempotencyRecord.key)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            await s.commit()
+            if taken:
+                return "owner", None
+
+            row = await s.get(m.IdempotencyRecord, key)
+            if row is not None and row.state == "done":
+                return "done", (row.fingerprint, row.response or "null")
+            if row is not None and row.state == "committed" and row.locked_until < now:
+                return "lost", None
+            return "pending", None
+
+    async def _complete(self, key: str, payload: str) -> None:
+        async with SessionLocal() as s:
+            await s.execute(
+                update(m.IdempotencyRecord)
+                .where(m.IdempotencyRecord.key == key)
+                .values(state="done", response=payload, expires_at=datetime.utcnow() + self.ttl)
+                .execution_options(synchronize_session=False)
+            )
+            await s.commit()
+
+    async def _release(self, key: str) -> None:
+        async with SessionLocal() as s:
+            await s.execute(delete(m.IdempotencyRecord).where(
+                m.IdempotencyRecord.key == key, m.IdempotencyRecord.state == "pending",
+            ))
+            await s.commit()
+
+    async def _maybe_purge(self, s, now: datetime) -> None:
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + settings.idempotency_purge_interval_s
+        await s.execute(delete(m.IdempotencyRecord).where(m.IdempotencyRecord.expires_at < now))
+        await s.commit()
+
+
+idem_store = IdempotencyStore(settings.idempotency_ttl_s, settings.idempotency_cache_size)
+
+
+def idempotent(out_type: Any) -> Callable:
+    """Make a service call replayable via its ``idem`` keyword argument.
+
+    The request fingerprint covers every argument except the session, so
+    reusing a key with a different body is rejected rather than replayed.
+    """
+    adapter = TypeAdapter(out_type)
 
-IdemKey = Annotated[Optional[str], Header(alias="Idempotency-Key", description="Optional key to make POST idempotent")]
+    def deco(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(db, *args, idem: Optional[str] = None, **kwargs) -> T:
+            if not idem:
+                return await fn(db, *args, idem=None, **kwargs)
+            if len(idem) > MAX_KEY_LENGTH:
+                raise ValidationErr(f"Idempotency-Key exceeds {MAX_KEY_LENGTH} characters")
+            op = fn.__name__
+            return await idem_store.run(
+                db,
+                f"{op}:{idem}",
+                _fingerprint(op, args, kwargs),
+                adapter,
+                lambda: fn(db, *args, idem=idem, **kwargs),
+            )
+        return wrapper
+    return deco
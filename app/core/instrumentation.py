@@ -0,0 +1,68 @@
+# app/core/instrumentation.py
+from __future__ import annotations
+
+import functools
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import db_queries_per_call, db_rows_per_call, service_seconds
+
+T = TypeVar("T")
+
+
+class _CallStats:
+    __slots__ = ("queries", "rows")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+
+_current: ContextVar[Optional[_CallStats]] = ContextVar("subnetter_call_stats", default=None)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    # rowcount is the SELECT/RETURNING row count on asyncpg; -1 where the driver doesn't know
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+def instrumented(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Record latency, DB round trips and rows returned for one service call.
+
+    Labels are the function name and ok/error only, so cardinality is fixed
+    by the code, not by request data. A nested instrumented call (and any
+    task it spawns) counts toward itself and, once it returns, toward every
+    enclosing one, so an outer call's numbers cover all the work it did.
+    """
+    op = fn.__name__.lstrip("_")
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs) -> T:
+        parent = _current.get()
+        stats = _CallStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            _current.reset(token)
+            if parent is not None:
+                parent.queries += stats.queries
+                parent.rows += stats.rows
+            service_seconds.labels(op=op, outcome=outcome).observe(time.perf_counter() - start)
+            db_queries_per_call.labels(op=op).observe(stats.queries)
+            db_rows_per_call.labels(op=op).observe(stats.rows)
+    return wrapper
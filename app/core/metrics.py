@@ -0,0 +1,104 @@
+# app/core/metrics.py
+from prometheus_client import Counter, Gauge, Histogram
+
+lock_wait_seconds = Histogram(
+    "subnetter_lock_wait_seconds",
+    "Time spent acquiring per-prefix / per-VRF write locks",
+    ["lock"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+lock_retries_total = Counter(
+    "subnetter_lock_retries_total",
+    "Service calls retried after a lock timeout, deadlock or serialization failure",
+    ["op", "reason"],
+)
+lock_giveups_total = Counter(
+    "subnetter_lock_giveups_total",
+    "Service calls that exhausted their lock retries",
+    ["op"],
+)
+entity_cache_requests_total = Counter(
+    "subnetter_entity_cache_requests_total",
+    "Tenant/VRF/Prefix cache lookups",
+    ["kind", "result"],
+)
+coalesced_batch_size = Histogram(
+    "subnetter_coalesced_batch_size",
+    "Requests served per coalesced allocation transaction",
+    ["op"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+service_seconds = Histogram(
+    "subnetter_service_seconds",
+    "Latency of service-layer calls",
+    ["op", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+db_queries_per_call = Histogram(
+    "subnetter_db_queries_per_call",
+    "Database round trips per service call",
+    ["op"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 12, 20, 50, 100, 500),
+)
+db_rows_per_call = Histogram(
+    "subnetter_db_rows_per_call",
+    "Rows returned by the database per service call",
+    ["op"],
+    buckets=(0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+index_rebuild_rows = Histogram(
+    "subnetter_index_rebuild_rows",
+    "Rows scanned to rebuild an in-process allocator or overlap index",
+    ["index"],
+    buckets=(0, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+db_pool_checked_out = Gauge(
+    "subnetter_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+)
+db_pool_open = Gauge(
+    "subnetter_db_pool_open",
+    "Connections currently open (idle in the pool plus checked out)",
+    ["pool"],
+)
+db_pool_capacity = Gauge(
+    "subnetter_db_pool_capacity",
+    "Configured pool_size + max_overflow",
+    ["pool"],
+)
+db_pool_wait_seconds = Histogram(
+    "subnetter_db_pool_wait_seconds",
+    "Time to get a usable connection from the pool, including connect and pre-ping",
+    ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+db_pool_timeouts_total = Counter(
+    "subnetter_db_pool_timeouts_total",
+    "Checkouts that gave up after db_pool_timeout_s",
+    ["pool"],
+)
+startup_seconds = Gauge(
+    "subnetter_startup_seconds",
+    "Duration of each startup phase of this worker",
+    ["phase"],
+)
+schema_bootstrap_total = Counter(
+    "subnetter_schema_bootstrap_total",
+    "Schema bootstrap outcomes at worker startup",
+    ["result"],
+)
+read_routing_total = Counter(
+    "subnetter_read_routing_total",
+    "Read-only sessions by the database they were routed to, and why",
+    ["target", "reason"],
+)
+change_feed_streams = Gauge(
+    "subnetter_change_feed_streams",
+    "Open change-feed SSE streams in this worker",
+)
+cascade_delete_rows_total = Counter(
+    "subnetter_cascade_delete_rows_total",
+    "Rows removed by VRF and tenant deletes",
+    ["table"],
+)
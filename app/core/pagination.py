@@ -1,6 +1,28 @@
 # app/core/pagination.py
+import base64
+import uuid
+from datetime import datetime
 from fastapi import Query
 from typing import Annotated
 
+from app.core.errors import ValidationErr
+
 Limit = Annotated[int, Query(ge=1, le=200, description="items per page")]
 Offset = Annotated[int, Query(ge=0, description="offset for pagination")]
+Cursor = Annotated[str | None, Query(description="opaque keyset cursor from a previous page's next_cursor")]
+IncludeTotal = Annotated[bool, Query(description="set false to skip counting matching rows")]
+EstimateTotal = Annotated[bool, Query(description="use the planner's row estimate instead of count(*)")]
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, _, id_ = raw.partition("|")
+        return datetime.fromisoformat(ts), uuid.UUID(id_)
+    except ValueError as e:
+        raise ValidationErr(f"invalid cursor: {e}")
@@ -0,0 +1,17 @@
+# app/core/responses.py
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+class ModelResponse(Response):
+    """JSON rendered straight from a pydantic model by its compiled serializer.
+
+    Returning one from an endpoint skips FastAPI's response_model round trip
+    (dump to dict, re-validate, serialize, json.dumps), so the model must
+    already be the route's declared response type. The bytes are the same.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
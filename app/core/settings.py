@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -5,6 +7,55 @@ class Settings(BaseSettings):
     app_env: str = "dev"
     db_url: str = "postgresql+asyncpg://127.0.0.1:5432/subnetter"
     jwt_secret: str = "dev-not-secret"
+    admin_token: str | None = None  # required as X-Admin-Token on /v1/admin
+    admin_open: bool = False  # serve /v1/admin without a token while admin_token is unset; local use only
+    # auto: create tables only when the recorded schema version differs; check: refuse to
+    # start on a mismatch (run `python -m app.db.bootstrap` first); off: touch nothing
+    schema_bootstrap: Literal["auto", "check", "off"] = "auto"
+    db_replica_url: str | None = None  # streaming read replica for GET routes; unset = all on primary
+    db_replica_retry_s: float = 5.0  # after a replica connect failure, reads stay on the primary this long
+    db_echo: bool = False  # log every statement; dev only, it is expensive
+    # per worker: total connections = workers x (db_pool_size + db_max_overflow)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30.0
+    db_pool_recycle_s: int = 1800  # -1 keeps connections forever
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # asyncpg prepared statements per connection; 0 behind pgbouncer
+    slow_query_ms: float = 200.0
+    slow_query_explain_sample: float = 0.0  # share of slow queries to EXPLAIN, 0..1
+    slow_query_explain_timeout_ms: int = 5000
+    slow_query_buffer_size: int = 100
+    prefix_index_max_vrfs: int = 1024
+    allocator_cache_max_prefixes: int = 4096
+    import_chunk_size: int = 1000
+    import_max_errors: int = 1000
+    export_batch_size: int = 1000
+    tree_max_depth: int = 64
+    tree_max_nodes: int = 10_000  # nested tree responses; larger subtrees must stream
+    lock_timeout_ms: int = 2000
+    lock_retries: int = 3
+    lock_retry_backoff_ms: int = 25
+    idempotency_ttl_s: int = 24 * 3600
+    idempotency_cache_size: int = 10_000
+    idempotency_wait_s: float = 30.0
+    idempotency_lease_s: float = 60.0
+    idempotency_poll_ms: int = 50
+    idempotency_purge_interval_s: float = 300.0
+    entity_cache_size: int = 10_000
+    entity_cache_ttl_s: float = 30.0
+    entity_cache_notify: bool = False  # cross-replica invalidation via Postgres LISTEN/NOTIFY
+    next_ip_coalesce: bool = True
+    next_ip_coalesce_window_ms: float = 0.0  # extra wait to let a burst gather; 0 = pure group commit
+    next_ip_coalesce_max_batch: int = 256
+    change_feed_page_size: int = 500  # most changes per /v1/changes page or SSE read
+    change_feed_poll_ms: int = 500  # per worker, while SSE streams are open
+    change_feed_heartbeat_s: float = 15.0  # SSE comment line on idle streams, for proxies
+    change_log_retention_s: int = 7 * 24 * 3600  # older tokens get 410 and must re-list
+    change_log_purge_interval_s: float = 300.0
+    cascade_delete_chunk_size: int = 5000  # rows per transaction when deleting a VRF or tenant
+    cascade_delete_sync_max_rows: int = 10_000  # larger VRF/tenant deletes return 202 and run as a job
+    cascade_delete_lease_s: float = 300.0  # a running job without progress this long is resumed at startup
     model_config = SettingsConfigDict(env_prefix="SUBNETTER_", env_file=".env", extra="ignore")
 
 
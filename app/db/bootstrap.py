@@ -0,0 +1,166 @@
+# app/db/bootstrap.py
+"""Schema bootstrap: create tables once, then record a version so later boots skip it.
+
+Run once per deploy, before the API starts (init container, release step):
+
+    python -m app.db.bootstrap            # create missing tables, record the version
+    python -m app.db.bootstrap --check    # exit 1 unless the recorded version is current
+
+The version is a digest of the models' Postgres DDL, so any model change
+yields a new one. ``create_all`` only adds missing tables, so before a new
+version is recorded every existing table is compared with its model; a
+missing column or index, or a network column still stored as text, stops
+the bootstrap with the statements to run (ops/db/upgrade.sql has them for
+databases created before the counters and rev columns).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import sys
+from typing import Optional
+
+from sqlmodel import SQLModel, delete, select
+from sqlalchemy import exc, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from app.db import models as m
+from app.db.types import _NetType
+
+log = logging.getLogger(__name__)
+
+_LOCK_KEY = 0x5B_4E_77_E2  # pg_advisory_xact_lock key: one bootstrapper at a time
+
+
+class SchemaDrift(RuntimeError):
+    """Existing tables lack what the models need; ``statements`` bring them up to date."""
+
+    def __init__(self, statements: list[str]):
+        self.statements = statements
+        super().__init__(
+            "existing tables differ from the models; run these, then bootstrap again:\n"
+            + "\n".join(f"  {s};" for s in statements)
+        )
+
+
+def schema_version() -> str:
+    dialect = postgresql.dialect()
+    ddl = []
+    for table in SQLModel.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl += sorted(str(CreateIndex(ix).compile(dialect=dialect)) for ix in table.indexes)
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()[:16]
+
+
+async def recorded_version(engine: AsyncEngine) -> Optional[str]:
+    """The recorded version; None when there is none yet, table included. One query, no introspection."""
+    try:
+        async with engine.connect() as conn:
+            return (await conn.execute(select(m.SchemaVersion.version).where(m.SchemaVersion.id == 1))).scalar_one_or_none()
+    except exc.DBAPIError:
+        return None
+
+
+async def create_schema(engine: AsyncEngine) -> bool:
+    """Create missing tables and record the version; False if it was already current.
+
+    Raises ``SchemaDrift`` (and records nothing) if an existing table is behind its model.
+    """
+    version = schema_version()
+    async with engine.begin() as conn:
+        await _lock(conn)
+        # re-read under the lock: a concurrent bootstrapper may have finished
+        if await _version_in(conn) == version:
+            return False
+        await conn.run_sync(SQLModel.metadata.create_all)
+        drift = await conn.run_sync(_drift)
+        if drift:
+            raise SchemaDrift(drift)
+        await conn.execute(delete(m.SchemaVersion))
+        await conn.execute(m.SchemaVersion.__table__.insert().values(id=1, version=version))
+    log.info("schema created, version %s", version)
+    return True
+
+
+async def bootstrap(engine: AsyncEngine, mode: str) -> str:
+    """Startup hook for ``settings.schema_bootstrap``; returns the outcome for metrics."""
+    if mode == "off":
+        return "skipped"
+    version = schema_version()
+    if await recorded_version(engine) == version:
+        return "current"
+    if mode == "check":
+        raise RuntimeError(
+            f"database schema is not at version {version}; run `python -m app.db.bootstrap` before starting the API"
+        )
+    return "created" if await create_schema(engine) else "current"
+
+
+def _drift(conn: Connection) -> list[str]:
+    """DDL for columns, indexes and column types the live tables lack; one inspector pass."""
+    insp = inspect(conn)
+    dialect = conn.dialect
+    out = []
+    for table in SQLModel.metadata.sorted_tables:
+        live = {c["name"]: c for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name not in live:
+                ddl = str(CreateColumn(col).compile(dialect=dialect))
+                default = col.default.arg if col.default is not None and col.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {default!r}"
+                out.append(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            elif (
+                dialect.name == "postgresql" and isinstance(col.type, _NetType)
+                and not isinstance(live[col.name]["type"], col.type.pg_type)
+            ):
+                pg = col.type.pg_type.__visit_name__.lower()
+                out.append(f"ALTER TABLE {table.name} ALTER COLUMN {col.name} TYPE {pg} USING {col.name}::{pg}")
+        indexes = {ix["name"] for ix in insp.get_indexes(table.name)}
+        out += [str(CreateIndex(ix).compile(dialect=dialect)) for ix in table.indexes if ix.name not in indexes]
+    return out
+
+
+async def _lock(conn: AsyncConnection) -> None:
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+
+
+async def _version_in(conn: AsyncConnection) -> Optional[str]:
+    # SAVEPOINT so a missing table doesn't abort the surrounding transaction
+    try:
+        async with conn.begin_nested():
+            return (await conn.execute(select(m.SchemaVersion.version).where(m.SchemaVersion.id == 1))).scalar_one_or_none()
+    except exc.DBAPIError:
+        return None
+
+
+async def _main(check: bool) -> int:
+    from app.db.db import engine
+
+    try:
+        if check:
+            current = await recorded_version(engine) == schema_version()
+            print("schema is current" if current else "schema is out of date")
+            return 0 if current else 1
+        try:
+            created = await create_schema(engine)
+        except SchemaDrift as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"schema {'created' if created else 'already current'} at version {schema_version()}")
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.db.bootstrap", description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only report whether the recorded version is current")
+    logging.basicConfig()
+    sys.exit(asyncio.run(_main(parser.parse_args().check)))
@@ -1,11 +1,74 @@
-from sqlmodel import SQLModel
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import (
+    db_pool_capacity, db_pool_checked_out, db_pool_open, db_pool_timeouts_total, db_pool_wait_seconds,
+)
 from app.core.settings import settings
+from app.db.slowlog import slow_queries
+
+
+class _MeteredPool(AsyncAdaptedQueuePool):
+    """QueuePool that reports checkout wait time and timeouts, labelled by pool name."""
+
+    def __init__(self, *args, name: str = "primary", **kw):
+        super().__init__(*args, **kw)
+        self.name = name
+
+    def recreate(self) -> "_MeteredPool":
+        # dispose() rebuilds the pool through here; keep the name
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            db_pool_timeouts_total.labels(pool=self.name).inc()
+            raise
+        finally:
+            db_pool_wait_seconds.labels(pool=self.name).observe(time.perf_counter() - started)
+
 
-engine: AsyncEngine = create_async_engine(settings.db_url, echo=True)
+def make_engine(url: str | None = None, name: str = "primary") -> AsyncEngine:
+    """The one place engines are built: pool sizing, statement cache and metrics from settings."""
+    url = url or settings.db_url
+    kw: dict = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    backend = make_url(url).get_backend_name()
+    if backend == "postgresql":
+        kw["connect_args"] = {
+            # asyncpg's own cache, plus the dialect's per-connection cache of prepared statements
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+        }
+    if backend == "postgresql" or (backend == "sqlite" and make_url(url).database not in (None, "", ":memory:")):
+        kw.update(
+            poolclass=_MeteredPool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_s,
+            pool_recycle=settings.db_pool_recycle_s,
+        )
+    engine = create_async_engine(url, **kw)
+    pool = engine.sync_engine.pool
+    if isinstance(pool, _MeteredPool):
+        pool.name = name
+        # read the live pool at scrape time: dispose() swaps engine.pool
+        db_pool_checked_out.labels(pool=name).set_function(lambda: engine.sync_engine.pool.checkedout())
+        db_pool_open.labels(pool=name).set_function(
+            lambda: engine.sync_engine.pool.checkedout() + engine.sync_engine.pool.checkedin()
+        )
+        db_pool_capacity.labels(pool=name).set(settings.db_pool_size + settings.db_max_overflow)
+    slow_queries.install(engine)
+    return engine
 
 
-async def init_db() -> None:
-    async with engine.begin() as conn:
-        # this runs CREATE TABLE IF NOT EXISTS for all models
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+engine: AsyncEngine = make_engine()
@@ -6,10 +6,15 @@ from typing import Optional
 from uuid import UUID, uuid4
 
 from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import JSON, BigInteger, Column, Index, Integer, Numeric, text
 from sqlalchemy.orm import relationship as sa_relationship  # 👈 explicit SA relationship
 
+from app.db.types import CidrType, InetType
+
 
 class Tenant(SQLModel, table=True):
+    __table_args__ = (Index("ix_tenant_created_at_id", "created_at", "id"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     name: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -22,10 +27,13 @@ class Tenant(SQLModel, table=True):
 
 
 class VRF(SQLModel, table=True):
+    __table_args__ = (Index("ix_vrf_created_at_id", "created_at", "id"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     tenant_id: UUID = Field(foreign_key="tenant.id")
     name: str
     rd: Optional[str] = Field(default=None, index=True, max_length=128)  # <-- added
+    prefix_rev: int = 0  # bumped on every prefix change (see services/radix.py, services/lpm.py)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # many-to-one Tenant
@@ -42,12 +50,24 @@ class VRF(SQLModel, table=True):
 
 
 class Prefix(SQLModel, table=True):
+    __table_args__ = (
+        # GiST/inet_ops backs the <<=, >>= and && containment/overlap filters
+        Index("ix_prefix_cidr_gist", "cidr", postgresql_using="gist", postgresql_ops={"cidr": "inet_ops"}),
+        # keyset pagination order
+        Index("ix_prefix_created_at_id", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    vrf_id: UUID = Field(foreign_key="vrf.id")
-    cidr: str
+    vrf_id: UUID = Field(foreign_key="vrf.id", index=True)
+    cidr: str = Field(sa_type=CidrType)
     status: str  # "container" | "active" | "reserved"
     description: str = ""
-    parent_id: Optional[UUID] = Field(default=None, foreign_key="prefix.id")
+    parent_id: Optional[UUID] = Field(default=None, foreign_key="prefix.id", index=True)
+    ip_rev: int = 0  # bumped on every IP write in this prefix (see services/allocator.py)
+    # utilization counters, kept in step by the writers (see services/utilization.py)
+    ip_count: int = 0
+    child_count: int = 0
+    child_addresses: int = Field(default=0, sa_type=Numeric(39, 0))  # an IPv6 /0 needs 2**128
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # many-to-one VRF
@@ -68,10 +88,78 @@ class Prefix(SQLModel, table=True):
 
 
 class IPAddress(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_ipaddress_vrf_id_address", "vrf_id", "address"),
+        Index("ix_ipaddress_address_gist", "address", postgresql_using="gist", postgresql_ops={"address": "inet_ops"}),
+        Index("ix_ipaddress_created_at_id", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     vrf_id: UUID = Field(foreign_key="vrf.id")
-    prefix_id: UUID = Field(foreign_key="prefix.id")
-    address: str
+    prefix_id: UUID = Field(foreign_key="prefix.id", index=True)
+    address: str = Field(sa_type=InetType)
     status: str = "active"  # or "reserved"
     note: str = ""
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    __tablename__ = "idempotency_record"
+
+    key: str = Field(primary_key=True, max_length=320)  # "<operation>:<Idempotency-Key>"
+    fingerprint: str
+    state: str = "pending"  # "pending" | "committed" (written, response not yet stored) | "done"
+    response: Optional[str] = None  # serialized JSON of the original response
+    locked_until: datetime  # a pending claim older than this is abandoned
+    expires_at: datetime = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"
+
+    id: int = Field(default=1, primary_key=True)  # single row
+    version: str  # fingerprint of the models' DDL (see db/bootstrap.py)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ChangeLog(SQLModel, table=True):
+    __tablename__ = "change_log"
+    # feed order; txid < the oldest running transaction marks the settled part (see services/changes.py)
+    __table_args__ = (
+        Index("ix_change_log_txid_seq", "txid", "seq"),
+        Index("ix_change_log_vrf_id_txid_seq", "vrf_id", "txid", "seq"),
+    )
+
+    seq: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    )
+    txid: int = Field(default=0, sa_type=BigInteger)  # writing transaction's pg_current_xact_id(); 0 off Postgres
+    kind: str  # "tenant" | "vrf" | "prefix" | "ip"
+    op: str  # "create" | "update" | "delete"
+    entity_id: UUID
+    vrf_id: Optional[UUID] = None  # no FK: rows outlive their VRF
+    data: Optional[dict] = Field(default=None, sa_type=JSON)  # the entity's *Out after the change; null on delete
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class DeleteJob(SQLModel, table=True):
+    __tablename__ = "delete_job"
+    # at most one running job per target, whichever worker gets there first
+    __table_args__ = (
+        Index(
+            "uq_delete_job_running", "kind", "target_id", unique=True,
+            postgresql_where=text("state = 'running'"), sqlite_where=text("state = 'running'"),
+        ),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    kind: str  # "vrf" | "tenant"
+    target_id: UUID = Field(index=True)
+    state: str = "running"  # "running" | "done" | "failed"
+    total: int = 0  # prefixes + IPs at start, from the utilization counters
+    deleted: int = 0  # prefixes + IPs removed so far
+    error: Optional[str] = None
+    heartbeat_at: datetime = Field(default_factory=datetime.utcnow)  # bumped per chunk; stale = worker died
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
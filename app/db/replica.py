@@ -0,0 +1,154 @@
+# app/db/replica.py
+from __future__ import annotations
+
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.metrics import read_routing_total
+from app.core.settings import settings
+
+log = logging.getLogger(__name__)
+
+# Carries the primary's WAL position after a write; echo it on later reads to see that write.
+WRITE_TOKEN = "X-Write-Token"
+_LSN = re.compile(r"[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}")
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class _Commits:
+    """Whether the current request has committed a write on the primary."""
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+_request_commits: ContextVar[Optional[_Commits]] = ContextVar("subnetter_request_commits", default=None)
+
+
+def request_commits() -> Optional[_Commits]:
+    """The calling request's flag, for writes committed on its behalf by another task."""
+    return _request_commits.get()
+
+
+class ReplicaRouter:
+    """Hands out read-only sessions on the replica, or on the primary when it can't serve.
+
+    A read goes to the primary when no replica is configured, when the
+    replica failed to connect within the last ``db_replica_retry_s``, or
+    when the request's write token is ahead of what the replica has replayed.
+    Sessions it creates carry ``info["replica"] = True``, so process-local
+    caches that aren't rev-stamped can decline to fill from them.
+    """
+
+    def __init__(self, primary: async_sessionmaker, engine: Optional[AsyncEngine]):
+        self.primary = primary
+        self.engine = engine
+        self.replica = (
+            async_sessionmaker(engine, expire_on_commit=False, info={"replica": True}) if engine is not None else None
+        )
+        self._down_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica is not None
+
+    async def session(self, token: Optional[str]) -> AsyncSession:
+        if self.replica is None:
+            return self._on_primary("no_replica")
+        if token is not None and not _LSN.fullmatch(token):
+            return self._on_primary("bad_token")
+        if time.monotonic() < self._down_until:
+            return self._on_primary("unavailable")
+
+        db = self.replica()
+        try:
+            if token is None:
+                await db.connection()  # check out now, so a dead replica falls back here
+            else:
+                caught_up = (await db.execute(
+                    text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"), {"lsn": token}
+                )).scalar()
+                if not caught_up:
+                    await db.close()
+                    return self._on_primary("lagging")
+        except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+            await db.close()
+            self._down_until = time.monotonic() + settings.db_replica_retry_s
+            log.warning("read replica unavailable, using the primary for %.0fs: %s", settings.db_replica_retry_s, e)
+            return self._on_primary("unavailable")
+        read_routing_total.labels(target="replica", reason="ok").inc()
+        return db
+
+    def track_commits(self, engine: AsyncEngine) -> None:
+        """Flag requests that commit an INSERT/UPDATE/DELETE on ``engine`` (the primary)."""
+        if self.replica is None:
+            return
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _wrote(conn, cursor, statement, parameters, context, executemany):
+            if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+                conn.info["replica_wrote"] = True
+
+        @event.listens_for(sync_engine, "commit")
+        def _commit(conn):
+            commits = _request_commits.get()
+            if conn.info.pop("replica_wrote", False) and commits is not None:
+                commits.wrote = True
+
+        @event.listens_for(sync_engine, "rollback")
+        def _rollback(conn):
+            conn.info.pop("replica_wrote", None)
+
+    async def write_token(self) -> Optional[str]:
+        """The primary's current WAL position: everything committed so far is at or before it."""
+        async with self.primary() as db:
+            if db.bind.dialect.name != "postgresql":
+                return None
+            return (await db.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar_one()
+
+    def _on_primary(self, reason: str) -> AsyncSession:
+        read_routing_total.labels(target="primary", reason=reason).inc()
+        return self.primary()
+
+
+class WriteTokenMiddleware:
+    """ASGI middleware adding ``X-Write-Token`` to successful non-GET responses when a replica is in use.
+
+    Only requests that committed a write get one (see ``ReplicaRouter.track_commits``),
+    so the WAL position is read once per write, not once per POST.
+    """
+
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _READ_METHODS or not self.router.enabled:
+            return await self.app(scope, receive, send)
+
+        commits = _Commits()
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and commits.wrote:
+                try:
+                    token = await self.router.write_token()
+                except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+                    log.warning("cannot read the primary WAL position for %s: %s", WRITE_TOKEN, e)
+                    token = None
+                if token:
+                    message["headers"] = [*message.get("headers", ()), (WRITE_TOKEN.lower().encode(), token.encode())]
+            await send(message)
+
+        reset = _request_commits.set(commits)
+        try:
+            await self.app(scope, receive, send_with_token)
+        finally:
+            _request_commits.reset(reset)
@@ -0,0 +1,130 @@
+# app/db/slowlog.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+
+log = logging.getLogger("subnetter.slow_query")
+
+_ROW_LOCK = re.compile(r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b|\bINTO\b", re.I)
+_CALL = re.compile(r"([A-Za-z_][\w.]*)\s*\(")
+# what may precede "(" in a statement EXPLAIN ANALYZE is allowed to run: SQL keywords and
+# side-effect-free functions. Anything else (nextval, pg_advisory_xact_lock, ...) gets a plain EXPLAIN.
+_ANALYZE_CALLS = frozenset({
+    "select", "from", "where", "and", "or", "not", "in", "any", "all", "exists", "values", "as", "on",
+    "join", "over", "filter", "cast", "case", "when", "then", "else", "by", "having", "union", "except",
+    "intersect", "is", "like", "between",
+    "count", "sum", "min", "max", "avg", "coalesce", "nullif", "greatest", "least", "lower", "upper",
+    "length", "array_agg", "string_agg", "bool_or", "bool_and", "pg_snapshot_xmin", "pg_current_snapshot",
+})
+
+
+def _redact(parameters: Any, executemany: bool) -> Any:
+    """Keep the shape of the bind parameters, never the values."""
+    if executemany:
+        return {"rows": len(parameters)}
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+def _read_only(statement: str) -> bool:
+    """True for a SELECT that takes no row locks, writes nothing and calls only known-safe functions."""
+    if statement.lstrip()[:6].upper() != "SELECT" or _ROW_LOCK.search(statement):
+        return False
+    return all(name.lower() in _ANALYZE_CALLS for name in _CALL.findall(statement))
+
+
+class SlowQueryLog:
+    """Ring buffer of statements slower than ``slow_query_ms``.
+
+    A sampled share of them get an EXPLAIN captured on a separate
+    connection, inside a transaction that is always rolled back. ANALYZE
+    (which re-runs the statement) is only used for read-only SELECTs.
+    """
+
+    def __init__(self, size: int):
+        self.entries: deque[dict] = deque(maxlen=size)
+        self._explaining = False
+        self._tasks: set[asyncio.Task] = set()
+
+    def install(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _start(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slowlog_start", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _stop(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["slowlog_start"].pop()
+            ms = (time.perf_counter() - started) * 1000
+            if ms >= settings.slow_query_ms:
+                self._record(engine, statement, parameters, executemany, ms)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _failed(ctx):
+            if ctx.connection is not None and ctx.connection.info.get("slowlog_start"):
+                ctx.connection.info["slowlog_start"].pop()
+
+    def _record(self, engine: AsyncEngine, statement: str, parameters: Any, executemany: bool, ms: float) -> None:
+        entry = {
+            "at": datetime.now(timezone.utc),
+            "duration_ms": round(ms, 2),
+            "statement": statement,
+            "params": _redact(parameters, executemany),
+            "plan": None,
+        }
+        self.entries.append(entry)
+        log.warning("slow query (%.1f ms): %s params=%s", ms, statement, entry["params"])
+        if (
+            engine.dialect.name == "postgresql"
+            and not executemany
+            and not self._explaining  # one capture at a time keeps the overhead bounded
+            and random.random() < settings.slow_query_explain_sample
+            and not statement.lstrip().upper().startswith(("EXPLAIN", "SET", "BEGIN", "COMMIT", "ROLLBACK"))
+        ):
+            self._explaining = True
+            task = asyncio.get_running_loop().create_task(self._explain(engine, entry, parameters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, engine: AsyncEngine, entry: dict, parameters: Any) -> None:
+        statement = entry["statement"]
+        opts = "ANALYZE, BUFFERS, FORMAT JSON" if _read_only(statement) else "FORMAT JSON"
+        timeout_ms = int(settings.slow_query_explain_timeout_ms)
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+                await conn.execute(text(f"SET LOCAL lock_timeout = {timeout_ms}"))
+                result = await conn.exec_driver_sql(f"EXPLAIN ({opts}) {statement}", parameters)
+                entry["plan"] = result.scalar_one()
+                await conn.rollback()
+        except Exception as e:  # best effort: never let diagnostics fail a request
+            entry["plan"] = {"error": str(e)}
+        finally:
+            self._explaining = False
+
+    def snapshot(self, limit: Optional[int] = None) -> list[dict]:
+        """Newest first."""
+        items = list(reversed(self.entries))
+        return items[:limit] if limit else items
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+slow_queries = SlowQueryLog(settings.slow_query_buffer_size)
@@ -0,0 +1,44 @@
+# app/db/types.py
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+
+class _NetType(TypeDecorator):
+    """Native Postgres network type that reads and writes canonical strings.
+
+    asyncpg decodes inet/cidr into ``ipaddress`` objects; the rest of the app
+    (schemas, services, the radix index) works with strings, so convert at the
+    boundary. Other dialects fall back to a plain string column.
+    """
+
+    impl = String
+    cache_ok = True
+    pg_type: Any = None
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(self.pg_type())
+        return dialect.type_descriptor(String())
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else str(value)
+
+    def process_literal_param(self, value, dialect):
+        # used by literal_binds compiles (e.g. EXPLAIN-based count estimates)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else str(value)
+
+
+class CidrType(_NetType):
+    pg_type = postgresql.CIDR
+
+
+class InetType(_NetType):
+    pg_type = postgresql.INET
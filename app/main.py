@@ -1,47 +1,71 @@
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from starlette.middleware import Middleware
 from starlette_exporter import PrometheusMiddleware, handle_metrics
-from prometheus_client import Counter, Histogram
 
-from app.api import tenants, vrfs, prefixes, ips
-from app.db.db import init_db
+import asyncio
+import contextlib
+
+from app.api import admin, calc, changes, jobs, tenants, vrfs, prefixes, ips
+from app.core.deps import replica_router
+from app.core.metrics import schema_bootstrap_total, startup_seconds
+from app.core.settings import settings
+from app.db.bootstrap import bootstrap
+from app.db.db import engine
+from app.db.replica import WriteTokenMiddleware
+from app.services.cascade import watch_jobs
+from app.services.changes import purge_forever
+from app.services.entities import listen_for_invalidations
 
 app = FastAPI(
     title="Subnetter API",
     version="1.0",
-    middleware=[Middleware(PrometheusMiddleware, group_paths=True)]
+    middleware=[
+        Middleware(PrometheusMiddleware, group_paths=True),
+        Middleware(WriteTokenMiddleware, router=replica_router),
+    ]
 )
 
 app.add_route("/metrics", handle_metrics)
 
-subnet_calc_total = Counter("subnetter_calc_total", "Total subnet calculations", ["cidr"])
-subnet_calc_errors = Counter("subnetter_calc_errors", "Subnet calc errors")
-subnet_calc_seconds = Histogram("subnetter_calc_seconds", "Latency of subnet calc")
-
-
 app.include_router(tenants.router)
 app.include_router(vrfs.router)
 app.include_router(prefixes.router)
 app.include_router(ips.router)
+app.include_router(admin.router)
+app.include_router(calc.router)
+app.include_router(changes.router)
+app.include_router(jobs.router)
 
 
 
 @app.on_event("startup")
 async def on_startup():
-    await init_db()
+    started = time.perf_counter()
+    startup_seconds.labels(phase="import").set(started - _import_started)
+    result = await bootstrap(engine, settings.schema_bootstrap)
+    schema_bootstrap_total.labels(result=result).inc()
+    startup_seconds.labels(phase="schema").set(time.perf_counter() - started)
+    if settings.entity_cache_notify:
+        app.state.cache_listener = asyncio.create_task(listen_for_invalidations())
+    app.state.change_purger = asyncio.create_task(purge_forever())
+    app.state.job_watcher = asyncio.create_task(watch_jobs())
+    startup_seconds.labels(phase="total").set(time.perf_counter() - _import_started)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for name in ("cache_listener", "change_purger", "job_watcher"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
 
 
 @app.get("/healthz")
 async def healthz(): return {"ok": True}
 
-
-@app.get("/subnet")
-def subnet(cidr: str):
-    with subnet_calc_seconds.time():
-        try:
-            # ... your calc ...
-            subnet_calc_total.labels(cidr=cidr).inc()
-            return {"ok": True}
-        except Exception:
-            subnet_calc_errors.inc()
-            raise
\ No newline at end of file
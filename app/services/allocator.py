@@ -0,0 +1,211 @@
+# app/services/allocator.py
+from __future__ import annotations
+
+import ipaddress
+import uuid
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlmodel import select
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.errors import NotFound
+from app.core.metrics import index_rebuild_rows
+from app.core.settings import settings
+from app.db import models as m
+from app.services.entities import entity_cache
+from app.services.locks import locking
+from app.services.ranges import to_addr
+
+
+async def bump_ip_rev(db: AsyncSession, prefix_id: uuid.UUID, ip_delta: int = 0) -> int:
+    """Bump ``Prefix.ip_rev`` (and move ``ip_count`` by ``ip_delta``); return the new rev.
+
+    Row-locks the prefix until commit (the equivalent of SELECT ... FOR UPDATE
+    on the parent), serializing allocate_next_ip, create_ip and delete_ip so
+    two workers can never hand out the same address.
+    """
+    async with locking(db, "prefix"):
+        rev = (await db.execute(
+            update(m.Prefix)
+            .where(m.Prefix.id == prefix_id)
+            .values(ip_rev=m.Prefix.ip_rev + 1, ip_count=m.Prefix.ip_count + ip_delta)
+            .returning(m.Prefix.ip_rev)
+            .execution_options(synchronize_session=False)
+        )).scalar_one_or_none()
+    if rev is None:
+        # callers may hold a cached snapshot of a prefix deleted elsewhere
+        entity_cache.invalidate("prefix", prefix_id, deleted=True)
+        raise NotFound("prefix not found")
+    return rev
+
+
+def host_bounds(net: ipaddress._BaseNetwork) -> tuple[int, int]:  # type: ignore[name-defined]
+    """Inclusive [first, last] host range as ints, matching ``net.hosts()``."""
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.max_prefixlen - net.prefixlen <= 1:
+        return first, last  # /31, /32, /127, /128: every address is a host
+    if net.version == 4:
+        return first + 1, last - 1
+    return first + 1, last  # IPv6 skips only the subnet-router anycast
+
+
+class FreeRanges:
+    """Sorted, non-overlapping inclusive ranges of free host addresses."""
+
+    def __init__(self, lo: int, hi: int, taken: Iterable[int] = ()):
+        self.lo, self.hi = lo, hi
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        cur = lo
+        for x in sorted(set(taken)):
+            if x < lo or x > hi:
+                continue
+            if x > cur:
+                self.starts.append(cur)
+                self.ends.append(x - 1)
+            cur = x + 1
+        if cur <= hi:
+            self.starts.append(cur)
+            self.ends.append(hi)
+
+    def lowest(self) -> Optional[int]:
+        return self.starts[0] if self.starts else None
+
+    def lowest_n(self, n: int) -> list[int]:
+        """The ``n`` lowest free addresses (fewer if the ranges run out)."""
+        out: list[int] = []
+        for s, e in zip(self.starts, self.ends):
+            out.extend(range(s, min(e, s + n - len(out) - 1) + 1))
+            if len(out) == n:
+                break
+        return out
+
+    def first_run(self, n: int) -> Optional[int]:
+        """Start of the lowest run of ``n`` consecutive free addresses, or None."""
+        for s, e in zip(self.starts, self.ends):
+            if e - s + 1 >= n:
+                return s
+        return None
+
+    def take(self, x: int) -> bool:
+        i = bisect_right(self.starts, x) - 1
+        if i < 0 or x > self.ends[i]:
+            return False
+        s, e = self.starts[i], self.ends[i]
+        if s == e:
+            del self.starts[i], self.ends[i]
+        elif x == s:
+            self.starts[i] = x + 1
+        elif x == e:
+            self.ends[i] = x - 1
+        else:
+            self.ends[i] = x - 1
+            self.starts.insert(i + 1, x + 1)
+            self.ends.insert(i + 1, e)
+        return True
+
+    def release(self, x: int) -> bool:
+        if x < self.lo or x > self.hi:
+            return False
+        i = bisect_right(self.starts, x) - 1
+        if i >= 0 and x <= self.ends[i]:
+            return False
+        join_left = i >= 0 and self.ends[i] == x - 1
+        join_right = i + 1 < len(self.starts) and self.starts[i + 1] == x + 1
+        if join_left and join_right:
+            self.ends[i] = self.ends[i + 1]
+            del self.starts[i + 1], self.ends[i + 1]
+        elif join_left:
+            self.ends[i] = x
+        elif join_right:
+            self.starts[i + 1] = x
+        else:
+            self.starts.insert(i + 1, x)
+            self.ends.insert(i + 1, x)
+        return True
+
+
+class HostAllocator:
+    """Free-host tracker for one prefix, stamped with the prefix's ``ip_rev``."""
+
+    def __init__(self, net: ipaddress._BaseNetwork, rev: int, taken: Iterable[int]):  # type: ignore[name-defined]
+        self.version = net.version
+        self.rev = rev
+        self.free = FreeRanges(*host_bounds(net), taken)
+
+    def lowest_free(self) -> Optional[str]:
+        x = self.free.lowest()
+        if x is None:
+            return None
+        return to_addr(x, self.version)
+
+    def lowest_free_n(self, n: int, contiguous: bool = False) -> list[str]:
+        """Up to ``n`` lowest free hosts; with ``contiguous``, exactly ``n`` consecutive ones or none."""
+        if contiguous:
+            start = self.free.first_run(n)
+            return [] if start is None else [to_addr(x, self.version) for x in range(start, start + n)]
+        return [to_addr(x, self.version) for x in self.free.lowest_n(n)]
+
+
+class HostAllocatorCache:
+    """Process-local, LRU-bounded map of prefix id -> HostAllocator.
+
+    Mirrors ``radix.PrefixIndexCache``: IP writers bump ``Prefix.ip_rev`` in
+    their transaction, and an allocator is reused only while its rev matches.
+    """
+
+    def __init__(self, max_prefixes: int):
+        self.max_prefixes = max_prefixes
+        self._allocs: OrderedDict[uuid.UUID, HostAllocator] = OrderedDict()
+
+    async def load(
+        self,
+        db: AsyncSession,
+        prefix_id: uuid.UUID,
+        net: ipaddress._BaseNetwork,  # type: ignore[name-defined]
+        rev: int,
+    ) -> HostAllocator:
+        """Return the allocator for ``prefix_id`` as of ``rev``, rebuilding from the DB if stale."""
+        alloc = self._allocs.get(prefix_id)
+        if alloc is not None and alloc.rev == rev:
+            self._allocs.move_to_end(prefix_id)
+            return alloc
+        taken = (await db.execute(
+            select(m.IPAddress.address).where(m.IPAddress.prefix_id == prefix_id)
+        )).scalars().all()
+        index_rebuild_rows.labels(index="hosts").observe(len(taken))
+        alloc = HostAllocator(net, rev, (int(ipaddress.ip_address(a)) for a in taken))
+        self._allocs[prefix_id] = alloc
+        self._allocs.move_to_end(prefix_id)
+        while len(self._allocs) > self.max_prefixes:
+            self._allocs.popitem(last=False)
+        return alloc
+
+    def apply(
+        self,
+        prefix_id: uuid.UUID,
+        rev: int,
+        taken: Iterable[str] = (),
+        freed: Iterable[str] = (),
+    ) -> None:
+        """Apply a committed change that moved the prefix from ``rev - 1`` to ``rev``."""
+        alloc = self._allocs.get(prefix_id)
+        if alloc is None or alloc.rev >= rev:
+            return
+        if alloc.rev != rev - 1:
+            self.invalidate(prefix_id)
+            return
+        for a in freed:
+            alloc.free.release(int(ipaddress.ip_address(a)))
+        for a in taken:
+            alloc.free.take(int(ipaddress.ip_address(a)))
+        alloc.rev = rev
+
+    def invalidate(self, prefix_id: uuid.UUID) -> None:
+        self._allocs.pop(prefix_id, None)
+
+
+host_allocator = HostAllocatorCache(settings.allocator_cache_max_prefixes)
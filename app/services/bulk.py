@@ -0,0 +1,388 @@
+# app/services/bulk.py
+from __future__ import annotations
+
+import csv
+import io
+import ipaddress
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional
+
+from pydantic import BaseModel, ValidationError
+from sqlmodel import select
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import BulkFormat, ImportReport, ImportRowError, IPCreate, IPOut, PrefixCreate, PrefixOut
+from app.core.deps import SessionLocal
+from app.core.errors import ValidationErr
+from app.core.instrumentation import instrumented
+from app.core.settings import settings
+from app.db import models as m
+from app.services import changes
+from app.services.allocator import host_allocator
+from app.services.entities import entity_cache
+from app.services.locks import locking, with_lock_retry
+from app.services.lpm import VrfLpmTable, lpm_cache
+from app.services.radix import OVERLAP_STATUSES, VrfPrefixIndex, bump_prefix_rev, prefix_index
+from app.services.utilization import add_child_counts, add_ip_counts
+
+_MAX_LINE = 64 * 1024
+
+
+# -----------------
+# parsing
+# -----------------
+
+def resolve_format(content_type: str | None, explicit: BulkFormat | None) -> BulkFormat:
+    if explicit:
+        return explicit
+    ct = (content_type or "").split(";")[0].strip().lower()
+    if ct in {"text/csv", "application/csv"}:
+        return "csv"
+    if ct in {"application/x-ndjson", "application/ndjson", "application/jsonl", ""}:
+        return "ndjson"
+    raise ValidationErr(f"unsupported content type {ct!r}; use NDJSON or CSV")
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Split a byte stream into numbered lines, holding at most one partial line."""
+    buf = b""
+    n = 0
+    async for chunk in stream:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            n += 1
+            yield n, line.rstrip(b"\r")
+        if len(buf) > _MAX_LINE:
+            raise ValidationErr(f"line {n + 1} exceeds {_MAX_LINE} bytes")
+    if buf.strip():
+        yield n + 1, buf.rstrip(b"\r")
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+class _Report:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.imported = 0
+        self.errors: list[ImportRowError] = []
+        self.failed = 0
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < settings.import_max_errors:
+            self.errors.append(ImportRowError(line=line, error=error))
+
+    def out(self) -> ImportReport:
+        secs = time.perf_counter() - self.started
+        return ImportReport(
+            rows=self.rows,
+            imported=self.imported,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda e: e.line),
+            errors_truncated=self.failed > len(self.errors),
+            seconds=round(secs, 3),
+            rows_per_second=round(self.rows / secs, 1) if secs else 0.0,
+        )
+
+async def _chunks(
+    stream: AsyncIterator[bytes], fmt: BulkFormat, model: type[BaseModel], report: _Report,
+) -> AsyncIterator[list[tuple[int, BaseModel]]]:
+    """Yield validated rows in chunks of ``import_chunk_size``; bad rows go to the report."""
+    header: Optional[list[str]] = None
+    chunk: list[tuple[int, BaseModel]] = []
+    async for n, raw in _lines(stream):
+        if not raw.strip():
+            continue
+        try:
+            text = raw.decode("utf-8")
+            if fmt == "csv":
+                values = next(csv.reader([text]))
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                # empty cells fall back to schema defaults
+                data = {k: v for k, v in zip(header, values) if v != ""}
+            else:
+                data = json.loads(text)
+        except (ValueError, csv.Error) as e:
+            report.rows += 1
+            report.fail(n, f"unparseable row: {e}")
+            continue
+        report.rows += 1
+        try:
+            chunk.append((n, model.model_validate(data)))
+        except ValidationError as e:
+            report.fail(n, _error_text(e))
+        if len(chunk) >= settings.import_chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _existing_vrfs(db: AsyncSession, vrf_ids: set[uuid.UUID]) -> set[uuid.UUID]:
+    return set((await db.execute(select(m.VRF.id).where(m.VRF.id.in_(vrf_ids)))).scalars().all())
+
+
+# -----------------
+# IPs
+# -----------------
+
+async def _resolve_prefixes(db: AsyncSession, rows: list[tuple[int, IPCreate]], vrfs: set[uuid.UUID]) -> list[Optional[uuid.UUID]]:
+    """Each row's prefix_id, or its longest-prefix match when omitted."""
+    tables = {
+        vid: await lpm_cache.current(db, vid)
+        for vid in sorted({r.vrf_id for _, r in rows if r.prefix_id is None} & vrfs)
+    }
+    return [
+        r.prefix_id if r.prefix_id is not None
+        else tables[r.vrf_id].lookup(ipaddress.ip_address(r.address)) if tables.get(r.vrf_id)
+        else None
+        for _, r in rows
+    ]
+
+@with_lock_retry
+async def _import_ip_chunk(db: AsyncSession, rows: list[tuple[int, IPCreate]], report: _Report) -> None:
+    vrfs = await _existing_vrfs(db, {r.vrf_id for _, r in rows})
+    pids = await _resolve_prefixes(db, rows, vrfs)
+    # lock every touched prefix in id order, so concurrent importers can't deadlock, then bump
+    # ip_rev on them like create_ip does
+    touched = {p for p in pids if p is not None}
+    async with locking(db, "prefix"):
+        await db.execute(select(m.Prefix.id).where(m.Prefix.id.in_(touched)).order_by(m.Prefix.id).with_for_update())
+        locked = (await db.execute(
+            update(m.Prefix)
+            .where(m.Prefix.id.in_(touched))
+            .values(ip_rev=m.Prefix.ip_rev + 1)
+            .returning(m.Prefix.id, m.Prefix.ip_rev, m.Prefix.cidr, m.Prefix.vrf_id)
+            .execution_options(synchronize_session=False)
+        )).all()
+    nets = {pid: (ipaddress.ip_network(cidr), vid) for pid, _, cidr, vid in locked}
+    existing = set((await db.execute(
+        select(m.IPAddress.vrf_id, m.IPAddress.address).where(
+            m.IPAddress.vrf_id.in_(vrfs), m.IPAddress.address.in_({r.address for _, r in rows}),
+        )
+    )).all())
+
+    values = []
+    failed: list[tuple[int, str]] = []  # reported after commit, so a retried attempt doesn't count twice
+    taken: dict[uuid.UUID, list[str]] = {}
+    for (n, r), pid in zip(rows, pids):
+        net, vid = nets.get(pid, (None, None))
+        if r.vrf_id not in vrfs:
+            failed.append((n, "vrf_id does not exist"))
+        elif r.prefix_id is None and pid is None:
+            failed.append((n, f"no prefix in the VRF contains {r.address}"))
+        elif net is None:
+            failed.append((n, "prefix_id does not exist"))
+        elif vid != r.vrf_id:
+            failed.append((n, "prefix_id belongs to another VRF"))
+        elif ipaddress.ip_address(r.address) not in net:
+            failed.append((n, f"{r.address} not in {net}"))
+        elif (r.vrf_id, r.address) in existing:
+            failed.append((n, f"IP {r.address} already exists in VRF"))
+        else:
+            existing.add((r.vrf_id, r.address))
+            taken.setdefault(pid, []).append(r.address)
+            values.append(m.IPAddress(
+                vrf_id=r.vrf_id, prefix_id=pid, address=r.address,
+                status=r.status.value, note=r.note or "",
+            ).model_dump())
+
+    if values:
+        await db.execute(insert(m.IPAddress), values)
+        await add_ip_counts(db, {pid: len(addrs) for pid, addrs in taken.items()})
+        await changes.record_many(db, [("ip", "create", v["id"], v["vrf_id"], changes.snapshot(IPOut, v)) for v in values])
+    await db.commit()
+    report.imported += len(values)
+    for n, error in failed:
+        report.fail(n, error)
+    for pid, rev, _, _ in locked:
+        host_allocator.apply(pid, rev, taken=taken.get(pid, ()))
+
+@instrumented
+async def import_ips(db: AsyncSession, stream: AsyncIterator[bytes], fmt: BulkFormat) -> ImportReport:
+    report = _Report()
+    async for rows in _chunks(stream, fmt, IPCreate, report):
+        await _import_ip_chunk(db, rows, report)
+    return report.out()
+
+
+# -----------------
+# Prefixes
+# -----------------
+
+async def _reparent_many(db: AsyncSession, moved: dict[uuid.UUID, uuid.UUID]) -> list[PrefixOut]:
+    """Move committed prefixes under their new parents, one UPDATE per parent; returns them as changed."""
+    by_parent: dict[uuid.UUID, list[uuid.UUID]] = {}
+    for cid, pid in moved.items():
+        by_parent.setdefault(pid, []).append(cid)
+    fields = list(PrefixOut.model_fields)
+    out = []
+    for pid, cids in by_parent.items():
+        rows = (await db.execute(
+            update(m.Prefix).where(m.Prefix.id.in_(cids)).values(parent_id=pid)
+            .returning(*(getattr(m.Prefix, f) for f in fields))
+            .execution_options(synchronize_session=False)
+        )).all()
+        out += [PrefixOut.model_validate(dict(zip(fields, r))) for r in rows]
+    return out
+
+@with_lock_retry
+async def _import_prefix_chunk(db: AsyncSession, rows: list[tuple[int, PrefixCreate]], report: _Report) -> None:
+    revs: dict[uuid.UUID, int] = {}
+    for vid in sorted({r.vrf_id for _, r in rows}):  # fixed lock order across importers
+        try:
+            revs[vid] = await bump_prefix_rev(db, vid)
+        except ValidationErr:
+            pass  # missing, or deleted mid-stream: its rows fail below
+    indexes = {vid: await prefix_index.load(db, vid, rev - 1) for vid, rev in revs.items()}
+    tables = {vid: await lpm_cache.load(db, vid, rev - 1) for vid, rev in revs.items()}
+    # rows accepted earlier in this chunk, plus committed prefixes they adopted; the cached
+    # tables stay untouched until commit
+    pending = {vid: VrfPrefixIndex(0) for vid in revs}
+    pending_lpm = {vid: VrfLpmTable(0) for vid in revs}
+    moved: dict[uuid.UUID, dict[uuid.UUID, uuid.UUID]] = {vid: {} for vid in revs}  # committed id -> new parent
+
+    new: dict[uuid.UUID, dict] = {}  # id -> row, in line order
+    added: dict[uuid.UUID, list] = {vid: [] for vid in revs}
+    kids: dict[uuid.UUID, tuple[int, int]] = {}  # counter deltas of committed parents
+    failed: list[tuple[int, str]] = []  # reported after commit, so a retried attempt doesn't count twice
+
+    def count(pid: uuid.UUID, n: int, addrs: int) -> None:
+        if pid in new:
+            new[pid]["child_count"] += n
+            new[pid]["child_addresses"] += addrs
+        else:
+            c, a = kids.get(pid, (0, 0))
+            kids[pid] = (c + n, a + addrs)
+
+    for n, r in rows:
+        if r.vrf_id not in revs:
+            failed.append((n, "vrf_id does not exist"))
+            continue
+        vid, net = r.vrf_id, ipaddress.ip_network(r.cidr)
+        table, plpm, vmoved = tables[vid], pending_lpm[vid], moved[vid]
+        if r.status.value in OVERLAP_STATUSES:
+            hit = indexes[vid].find_overlap(net) or pending[vid].find_overlap(net)
+            if hit:
+                failed.append((n, f"prefix {r.cidr} overlaps existing {hit}"))
+                continue
+            pending[vid].add(net)
+            added[vid].append(net)
+        # nest under the deeper of the committed and in-chunk matches (in-chunk wins a tie, being
+        # newer), adopting that parent's children that fall inside, as create_prefix does
+        key, plen = int(net.network_address), net.prefixlen
+        hits = [h for h in (plpm.match(net.version, key, plen), table.match(net.version, key, plen)) if h]
+        parent_id = max(hits, key=lambda h: h[0])[1] if hits else None
+        adopted = [c for c in table.children_within(parent_id, net) if c not in vmoved]
+        adopted += plpm.children_within(parent_id, net)
+        nets = {c: ipaddress.ip_network(plpm.cidr(c) if c in plpm.entries else table.cidr(c)) for c in adopted}
+        adopted_addresses = sum(a.num_addresses for a in nets.values())
+
+        row = m.Prefix(
+            vrf_id=vid, cidr=r.cidr, status=r.status.value, description=r.description or "", parent_id=parent_id,
+        ).model_dump()
+        new[row["id"]] = row
+        plpm.add(row["id"], net, parent_id)
+        for c, cnet in nets.items():
+            if c in new:
+                new[c]["parent_id"] = row["id"]
+                plpm.reparent(c, row["id"])
+            else:
+                if c in plpm.entries:
+                    plpm.reparent(c, row["id"])
+                else:
+                    plpm.add(c, cnet, row["id"])
+                vmoved[c] = row["id"]
+        count(row["id"], len(adopted), adopted_addresses)
+        if parent_id is not None:
+            count(parent_id, 1 - len(adopted), net.num_addresses - adopted_addresses)
+
+    values = list(new.values())
+    reparented: list[PrefixOut] = []
+    if values:
+        # parents before children: a parent is shorter, or the same CIDR on an earlier line
+        await db.execute(insert(m.Prefix), sorted(values, key=lambda v: ipaddress.ip_network(v["cidr"]).prefixlen))
+        for vid in revs:
+            reparented += await _reparent_many(db, moved[vid])
+        await add_child_counts(db, {pid: d for pid, d in kids.items() if d != (0, 0)})
+        for p in reparented:
+            await entity_cache.publish(db, "prefix", p.id)
+        await changes.record_many(db, [
+            *(("prefix", "create", v["id"], v["vrf_id"], changes.snapshot(PrefixOut, v)) for v in values),
+            *(("prefix", "update", p.id, p.vrf_id, p) for p in reparented),
+        ])
+    await db.commit()
+    report.imported += len(values)
+    for n, error in failed:
+        report.fail(n, error)
+    for p in reparented:
+        entity_cache.invalidate("prefix", p.id)
+    for vid, rev in revs.items():
+        prefix_index.apply(vid, rev, added=added[vid])
+        lpm_cache.apply(
+            vid, rev,
+            added=[(v["id"], ipaddress.ip_network(v["cidr"]), v["parent_id"]) for v in values if v["vrf_id"] == vid],
+            reparented=moved[vid],
+        )
+
+@instrumented
+async def import_prefixes(db: AsyncSession, stream: AsyncIterator[bytes], fmt: BulkFormat) -> ImportReport:
+    report = _Report()
+    async for rows in _chunks(stream, fmt, PrefixCreate, report):
+        await _import_prefix_chunk(db, rows, report)
+    return report.out()
+
+
+# -----------------
+# Export
+# -----------------
+
+_PREFIX_COLS = (m.Prefix.id, m.Prefix.vrf_id, m.Prefix.cidr, m.Prefix.status, m.Prefix.description,
+                m.Prefix.parent_id, m.Prefix.created_at)
+_IP_COLS = (m.IPAddress.id, m.IPAddress.vrf_id, m.IPAddress.prefix_id, m.IPAddress.address, m.IPAddress.status,
+            m.IPAddress.note, m.IPAddress.created_at)
+_CSV_HEADER = ["type", "id", "vrf_id", "prefix_id", "parent_id", "cidr", "address", "status", "description",
+               "note", "created_at"]
+
+def _json_default(v: Any) -> str:
+    return v.isoformat() if isinstance(v, datetime) else str(v)
+
+def _encode(kind: str, rows: list, fmt: BulkFormat) -> bytes:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({"type": kind, **row._asdict()}, default=_json_default) + "\n" for row in rows
+        ).encode()
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    for row in rows:
+        d = {k: ("" if v is None else v.isoformat() if isinstance(v, datetime) else v) for k, v in row._asdict().items()}
+        w.writerow([kind if col == "type" else d.get(col, "") for col in _CSV_HEADER])
+    return buf.getvalue().encode()
+
+async def export_vrf(vrf_id: uuid.UUID, fmt: BulkFormat) -> AsyncIterator[bytes]:
+    """Stream every prefix and IP of a VRF from one REPEATABLE READ snapshot.
+
+    Rows come off a server-side cursor ``export_batch_size`` at a time, so
+    memory stays flat however large the VRF is. Runs on its own session:
+    the request's session is gone by the time the body streams.
+    """
+    if fmt == "csv":
+        yield (",".join(_CSV_HEADER) + "\r\n").encode()
+    async with SessionLocal() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+        for kind, stmt in (
+            ("prefix", select(*_PREFIX_COLS).where(m.Prefix.vrf_id == vrf_id).order_by(m.Prefix.cidr)),
+            ("ip", select(*_IP_COLS).where(m.IPAddress.vrf_id == vrf_id).order_by(m.IPAddress.address)),
+        ):
+            result = await db.stream(stmt.execution_options(yield_per=settings.export_batch_size))
+            async for part in result.partitions():
+                yield _encode(kind, part, fmt)
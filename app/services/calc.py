@@ -0,0 +1,265 @@
+# app/services/calc.py
+from __future__ import annotations
+
+import ipaddress
+import socket
+
+import numpy as np
+
+from app.api.schemas import CalcInfoOut
+from app.core.errors import ValidationErr
+from app.services.ranges import cidr_blocks, to_cidr
+
+# contains/overlaps build an items x networks boolean matrix
+MAX_CELLS = 10_000_000
+
+_BITS = {4: 32, 6: 128}
+_U64 = (1 << 64) - 1
+
+
+# -----------------
+# parsing
+# -----------------
+
+def _parse_one(s: str) -> tuple[int, int, int]:
+    """(version, address int, prefixlen) for 'addr' or 'addr/len'; no ipaddress objects."""
+    addr, sep, plen = s.strip().partition("/")
+    if ":" in addr:
+        version, packed = 6, socket.inet_pton(socket.AF_INET6, addr)
+    else:
+        version, packed = 4, socket.inet_pton(socket.AF_INET, addr)
+    bits = _BITS[version]
+    if not sep:
+        return version, int.from_bytes(packed), bits
+    if not plen.isdigit() or int(plen) > bits:
+        raise ValueError(f"invalid prefix length {plen!r}")
+    return version, int.from_bytes(packed), int(plen)
+
+
+class _Batch:
+    """Parsed networks as parallel arrays; addresses are (hi, lo) uint64 pairs.
+
+    IPv4 lives in the low word (the uint32 range), so one code path covers
+    both families; ``version`` keeps them from ever matching each other.
+    """
+
+    def __init__(self, items: list[str], strict: bool):
+        parsed = []
+        for i, s in enumerate(items):
+            try:
+                parsed.append(_parse_one(s))
+            except (OSError, ValueError) as e:
+                raise ValidationErr(f"item {i}: invalid address or CIDR {s!r}", details={"index": i, "error": str(e)})
+        n = len(parsed)
+        self.version = np.fromiter((p[0] for p in parsed), dtype=np.uint8, count=n)
+        self.plen = np.fromiter((p[2] for p in parsed), dtype=np.int64, count=n)
+        hi = np.fromiter((p[1] >> 64 for p in parsed), dtype=np.uint64, count=n)
+        lo = np.fromiter((p[1] & _U64 for p in parsed), dtype=np.uint64, count=n)
+
+        host = np.where(self.version == 4, 32, 128) - self.plen  # host bits per item
+        mask_hi, mask_lo = _low_bits(np.clip(host - 64, 0, 64)), _low_bits(np.clip(host, 0, 64))
+        dirty = np.nonzero(((hi & mask_hi) | (lo & mask_lo)) != 0)[0]
+        if strict and len(dirty):
+            i = int(dirty[0])
+            raise ValidationErr(f"item {i}: {items[i]!r} has host bits set", details={"index": i})
+        self.start_hi, self.start_lo = hi & ~mask_hi, lo & ~mask_lo
+        self.end_hi, self.end_lo = self.start_hi | mask_hi, self.start_lo | mask_lo
+
+    def __len__(self) -> int:
+        return len(self.plen)
+
+    def start(self, i: int) -> int:
+        return (int(self.start_hi[i]) << 64) | int(self.start_lo[i])
+
+    def end(self, i: int) -> int:
+        return (int(self.end_hi[i]) << 64) | int(self.end_lo[i])
+
+
+def _low_bits(n):
+    """uint64 array with the low ``n`` bits set, for n in [0, 64]."""
+    n = n.astype(np.uint64)
+    ones = np.uint64(_U64)
+    return np.where(n >= 64, ones, (np.uint64(1) << np.minimum(n, 63)) - np.uint64(1))
+
+
+def _le(ah, al, bh, bl):
+    """Elementwise a <= b over 128-bit (hi, lo) pairs; broadcasts."""
+    return (ah < bh) | ((ah == bh) & (al <= bl))
+
+
+# -----------------
+# operations
+# -----------------
+
+def info(items: list[str], strict: bool = False) -> list[CalcInfoOut]:
+    """Network, broadcast, netmask and host range/count for every item.
+
+    Host ranges match allocator.host_bounds / net.hosts(): all addresses for
+    a /31, /32, /127 or /128, IPv4 minus network and broadcast, IPv6 minus
+    the subnet-router anycast address.
+    """
+    b = _Batch(items, strict)
+    v4 = b.version == 4
+    host = np.where(v4, 32, 128) - b.plen
+    wide = host > 1
+    one = np.uint64(1)
+    # start is aligned and end all ones below the prefix, so +1 / -1 never carry out of the low word
+    first_lo = np.where(wide, b.start_lo + one, b.start_lo)
+    last_lo = np.where(wide & v4, b.end_lo - one, b.end_lo)
+    mask_hi = np.where(v4, np.uint64(0), ~(b.start_hi ^ b.end_hi))
+    mask_lo = np.where(v4, np.uint64(0xFFFFFFFF), ~np.uint64(0)) & ~(b.start_lo ^ b.end_lo)
+
+    versions, plens, hosts = b.version.tolist(), b.plen.tolist(), host.tolist()
+    network = _addrs(versions, b.start_hi, b.start_lo)
+    broadcast = _addrs(versions, b.end_hi, b.end_lo)
+    netmask = _addrs(versions, mask_hi, mask_lo)
+    first = _addrs(versions, b.start_hi, first_lo)
+    last = _addrs(versions, b.end_hi, last_lo)
+    out = []
+    for i, (version, plen, h) in enumerate(zip(versions, plens, hosts)):
+        size = 1 << h
+        out.append(CalcInfoOut(
+            cidr=f"{network[i]}/{plen}",
+            version=version,
+            network=network[i],
+            broadcast=broadcast[i],
+            netmask=netmask[i],
+            prefixlen=plen,
+            num_addresses=size,
+            first_host=first[i],
+            last_host=last[i],
+            host_count=size if h <= 1 else size - 2 if version == 4 else size - 1,
+        ))
+    return out
+
+
+def split(cidr: str, new_prefix: int, limit: int) -> list[str]:
+    """Every /new_prefix subnet of ``cidr``, in order; refuses more than ``limit``."""
+    version, net, plen = _parse_one_or_422(cidr)
+    bits = _BITS[version]
+    if not plen <= new_prefix <= bits:
+        raise ValidationErr(f"new_prefix must be between {plen} and {bits}")
+    count = 1 << (new_prefix - plen)
+    if count > limit:
+        raise ValidationErr(f"split yields {count} subnets; limit is {limit}", details={"count": count})
+    net &= ~((1 << (bits - plen)) - 1)
+    shift = bits - new_prefix
+    idx = np.arange(count, dtype=np.uint64)
+    # net is aligned to 2**(bits - plen), so OR-ing the offsets in never carries
+    if shift >= 64:
+        hi, lo = idx << np.uint64(shift - 64), np.zeros(count, dtype=np.uint64)
+    else:
+        lo_bits = 64 - shift
+        hi = idx >> np.uint64(lo_bits) if lo_bits < 64 else np.zeros(count, dtype=np.uint64)
+        lo = (idx & np.uint64((1 << lo_bits) - 1 if lo_bits < 64 else _U64)) << np.uint64(shift)
+    hi |= np.uint64(net >> 64)
+    lo |= np.uint64(net & _U64)
+    return [to_cidr((int(h) << 64) | int(l), new_prefix, version) for h, l in zip(hi.tolist(), lo.tolist())]
+
+
+def summarize(items: list[str]) -> list[str]:
+    """Collapse items into the fewest covering CIDRs (IPv4 first, then IPv6)."""
+    b = _Batch(items, strict=False)
+    out: list[str] = []
+    for version in (4, 6):
+        sel = np.nonzero(b.version == version)[0]
+        if not len(sel):
+            continue
+        order = sel[np.lexsort((b.start_lo[sel], b.start_hi[sel]))]
+        if version == 4:
+            ranges = _merge_v4(b.start_lo[order], b.end_lo[order])
+        else:
+            ranges = _merge_v6(b.start_hi[order], b.start_lo[order], b.end_hi[order], b.end_lo[order])
+        for s, e in ranges:
+            out += [to_cidr(k, p, version) for k, p in cidr_blocks(s, e, _BITS[version])]
+    return out
+
+
+def _merge_v4(starts, ends) -> list[tuple[int, int]]:
+    # sorted by start: a new run begins where a start clears everything before it
+    reach = np.maximum.accumulate(ends)
+    new = np.empty(len(starts), dtype=bool)
+    new[0] = True
+    new[1:] = starts[1:] > reach[:-1] + np.uint64(1)
+    firsts = np.nonzero(new)[0]
+    lasts = np.append(firsts[1:] - 1, len(starts) - 1)
+    return list(zip(starts[firsts].tolist(), reach[lasts].tolist()))
+
+
+def _merge_v6(start_hi, start_lo, end_hi, end_lo) -> list[tuple[int, int]]:
+    """``_merge_v4`` over (hi, lo) pairs; the running max goes through each end's rank."""
+    n = len(start_hi)
+    by_end = np.lexsort((end_lo, end_hi))
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_end] = np.arange(n)
+    reach = by_end[np.maximum.accumulate(rank)]  # index of the furthest end so far
+    reach_hi, reach_lo = end_hi[reach], end_lo[reach]
+    # reach + 1, carrying into hi; nothing clears a reach of all ones
+    top = (reach_hi == np.uint64(_U64)) & (reach_lo == np.uint64(_U64))
+    next_lo = reach_lo + np.uint64(1)
+    next_hi = reach_hi + (next_lo == 0).astype(np.uint64)
+    new = np.empty(n, dtype=bool)
+    new[0] = True
+    new[1:] = ~top[:-1] & ~_le(start_hi[1:], start_lo[1:], next_hi[:-1], next_lo[:-1])
+    firsts = np.nonzero(new)[0]
+    lasts = np.append(firsts[1:] - 1, n - 1)
+    return [
+        ((sh << 64) | sl, (rh << 64) | rl)
+        for sh, sl, rh, rl in zip(
+            start_hi[firsts].tolist(), start_lo[firsts].tolist(), reach_hi[lasts].tolist(), reach_lo[lasts].tolist(),
+        )
+    ]
+
+
+def contains(networks: list[str], items: list[str]) -> list[list[int]]:
+    """For each item, the indexes of the networks that contain it."""
+    _check_cells(len(networks), len(items))
+    n, it = _Batch(networks, strict=False), _Batch(items, strict=False)
+    hit = (
+        (it.version[:, None] == n.version[None, :])
+        & _le(n.start_hi[None, :], n.start_lo[None, :], it.start_hi[:, None], it.start_lo[:, None])
+        & _le(it.end_hi[:, None], it.end_lo[:, None], n.end_hi[None, :], n.end_lo[None, :])
+    )
+    rows, cols = np.nonzero(hit)
+    out: list[list[int]] = [[] for _ in range(len(it))]
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        out[r].append(c)
+    return out
+
+
+def overlaps(items: list[str]) -> list[tuple[int, int]]:
+    """Every pair (i, j), i < j, of overlapping items: the upper triangle of the overlap matrix."""
+    _check_cells(len(items), len(items))
+    b = _Batch(items, strict=False)
+    hit = (
+        (b.version[:, None] == b.version[None, :])
+        & _le(b.start_hi[:, None], b.start_lo[:, None], b.end_hi[None, :], b.end_lo[None, :])
+        & _le(b.start_hi[None, :], b.start_lo[None, :], b.end_hi[:, None], b.end_lo[:, None])
+    )
+    rows, cols = np.nonzero(np.triu(hit, k=1))
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+# -----------------
+# helpers
+# -----------------
+
+def _parse_one_or_422(s: str) -> tuple[int, int, int]:
+    try:
+        return _parse_one(s)
+    except (OSError, ValueError) as e:
+        raise ValidationErr(f"invalid address or CIDR {s!r}", details={"error": str(e)})
+
+def _addrs(versions: list[int], hi, lo) -> list[str]:
+    """Addresses from (hi, lo) uint64 arrays, packed to bytes in one go."""
+    raw = np.stack([hi, lo], axis=1).astype(">u8").tobytes()
+    return [
+        socket.inet_ntop(socket.AF_INET, raw[16 * i + 12:16 * i + 16]) if v == 4
+        # ipaddress, not inet_ntop, as in ranges.to_addr: libc renders v4-mapped addresses differently
+        else str(ipaddress.IPv6Address(raw[16 * i:16 * i + 16]))
+        for i, v in enumerate(versions)
+    ]
+
+def _check_cells(a: int, b: int) -> None:
+    if a * b > MAX_CELLS:
+        raise ValidationErr(f"{a} x {b} comparisons exceeds {MAX_CELLS}; split the request")
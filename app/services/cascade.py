@@ -0,0 +1,329 @@
+# app/services/cascade.py
+"""Set-based deletion of a VRF or tenant and everything it owns.
+
+Rows go in chunks of ``cascade_delete_chunk_size``, one transaction each:
+the VRF's IPs first (they reference its prefixes), then its prefixes, whose
+children in later chunks are detached in the same transaction so parent_id
+never points at a deleted row. The VRF row goes last, together with
+anything a concurrent writer slipped in meanwhile, so a run that dies part
+way leaves the VRF in place and can simply run again. A tenant is its VRFs
+one by one, then the tenant row. Every deleted row gets its own change-feed
+row in the chunk that deletes it, so kind-filtered subscribers see them too.
+
+Deletes over ``cascade_delete_sync_max_rows`` return a DeleteJob at once
+and run in the background; the job row is the progress report.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import select
+from sqlalchemy import delete, exc, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import DeleteJobOut
+from app.core.deps import SessionLocal
+from app.core.errors import NotFound
+from app.core.instrumentation import instrumented
+from app.core.metrics import cascade_delete_rows_total
+from app.core.settings import settings
+from app.db import models as m
+from app.services import changes
+from app.services.allocator import host_allocator
+from app.services.entities import entity_cache
+from app.services.locks import locking, with_lock_retry
+from app.services.lpm import lpm_cache
+from app.services.radix import bump_prefix_rev, prefix_index
+from app.services.utilization import add_ip_counts
+
+log = logging.getLogger(__name__)
+
+_tasks: set[asyncio.Task] = set()  # the event loop only holds weak references to tasks
+
+
+class _Progress:
+    """Counts deleted rows into a job, inside the chunk's own transaction; a no-op without one."""
+
+    def __init__(self, job_id: Optional[uuid.UUID] = None):
+        self.job_id = job_id
+
+    async def add(self, db: AsyncSession, n: int) -> None:
+        if self.job_id is None or not n:
+            return
+        await db.execute(
+            update(m.DeleteJob)
+            .where(m.DeleteJob.id == self.job_id)
+            .values(deleted=m.DeleteJob.deleted + n, heartbeat_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _owned_rows(db: AsyncSession, vrf_ids: list[uuid.UUID]) -> int:
+    """Prefixes plus IPs under ``vrf_ids``, from the utilization counters: no scan of the IPs."""
+    if not vrf_ids:
+        return 0
+    n, ips = (await db.execute(
+        select(func.count(), func.coalesce(func.sum(m.Prefix.ip_count), 0)).where(m.Prefix.vrf_id.in_(vrf_ids))
+    )).one()
+    return n + int(ips)
+
+async def _vrf_ids(db: AsyncSession, tenant_id: uuid.UUID) -> list[uuid.UUID]:
+    return list((await db.execute(select(m.VRF.id).where(m.VRF.tenant_id == tenant_id))).scalars().all())
+
+async def _delete_ips(db: AsyncSession, where) -> list[uuid.UUID]:
+    return list((await db.execute(
+        delete(m.IPAddress).where(where).returning(m.IPAddress.id).execution_options(synchronize_session=False)
+    )).scalars().all())
+
+
+# -----------------
+# chunks
+# -----------------
+
+@with_lock_retry
+async def _delete_ip_chunk(db: AsyncSession, vrf_id: uuid.UUID, progress: _Progress) -> int:
+    rows = (await db.execute(
+        select(m.IPAddress.id, m.IPAddress.prefix_id)
+        .where(m.IPAddress.vrf_id == vrf_id)
+        .limit(settings.cascade_delete_chunk_size)
+    )).all()
+    if not rows:
+        await db.commit()
+        return 0
+    # lock the prefixes in id order, as bulk import does, then delete; counters and ip_rev
+    # move exactly as delete_ip moves them
+    async with locking(db, "prefix"):
+        await db.execute(
+            select(m.Prefix.id).where(m.Prefix.id.in_({pid for _, pid in rows})).order_by(m.Prefix.id).with_for_update()
+        )
+    deleted = (await db.execute(
+        delete(m.IPAddress).where(m.IPAddress.id.in_([id for id, _ in rows]))
+        .returning(m.IPAddress.id, m.IPAddress.prefix_id, m.IPAddress.address)
+        .execution_options(synchronize_session=False)
+    )).all()
+    freed: dict[uuid.UUID, list[str]] = {}
+    for _, pid, address in deleted:
+        freed.setdefault(pid, []).append(address)
+    await add_ip_counts(db, {pid: -len(addrs) for pid, addrs in freed.items()})
+    revs = (await db.execute(
+        update(m.Prefix).where(m.Prefix.id.in_(freed)).values(ip_rev=m.Prefix.ip_rev + 1)
+        .returning(m.Prefix.id, m.Prefix.ip_rev)
+        .execution_options(synchronize_session=False)
+    )).all() if freed else []
+    await progress.add(db, len(deleted))
+    await changes.record_many(db, [("ip", "delete", id, vrf_id, None) for id, _, _ in deleted])
+    await db.commit()
+    for pid, rev in revs:
+        host_allocator.apply(pid, rev, freed=freed[pid])
+    cascade_delete_rows_total.labels(table="ipaddress").inc(len(deleted))
+    return len(rows)
+
+@with_lock_retry
+async def _delete_prefix_chunk(db: AsyncSession, vrf_id: uuid.UUID, progress: _Progress) -> int:
+    ids = (await db.execute(
+        select(m.Prefix.id).where(m.Prefix.vrf_id == vrf_id).limit(settings.cascade_delete_chunk_size)
+    )).scalars().all()
+    if not ids:
+        await db.commit()
+        return 0
+    await bump_prefix_rev(db, vrf_id)  # serializes with prefix writers; their cached indexes go stale
+    # IPs created since the IP pass, then children left for later chunks
+    ips = await _delete_ips(db, m.IPAddress.prefix_id.in_(ids))
+    await db.execute(
+        update(m.Prefix).where(m.Prefix.parent_id.in_(ids)).values(parent_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(delete(m.Prefix).where(m.Prefix.id.in_(ids)).execution_options(synchronize_session=False))
+    await progress.add(db, len(ids) + len(ips))
+    await changes.record_many(db, [
+        *(("ip", "delete", id, vrf_id, None) for id in ips),
+        *(("prefix", "delete", id, vrf_id, None) for id in ids),
+    ])
+    await db.commit()
+    for id in ids:
+        entity_cache.invalidate("prefix", id)
+        host_allocator.invalidate(id)
+    prefix_index.invalidate(vrf_id)
+    lpm_cache.invalidate(vrf_id)
+    cascade_delete_rows_total.labels(table="prefix").inc(len(ids))
+    return len(ids)
+
+@with_lock_retry
+async def _delete_vrf_row(db: AsyncSession, vrf_id: uuid.UUID, progress: _Progress) -> bool:
+    """Delete the VRF with whatever is still under it; False if it was already gone."""
+    async with locking(db, "vrf"):
+        found = (await db.execute(select(m.VRF.id).where(m.VRF.id == vrf_id).with_for_update())).scalar_one_or_none()
+    if found is None:
+        await db.commit()
+        return False
+    ips = await _delete_ips(db, m.IPAddress.vrf_id == vrf_id)
+    await db.execute(
+        update(m.Prefix).where(m.Prefix.vrf_id == vrf_id).values(parent_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    pids = (await db.execute(
+        delete(m.Prefix).where(m.Prefix.vrf_id == vrf_id).returning(m.Prefix.id).execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.execute(delete(m.VRF).where(m.VRF.id == vrf_id).execution_options(synchronize_session=False))
+    await progress.add(db, len(ips) + len(pids))
+    await changes.record_many(db, [
+        *(("ip", "delete", id, vrf_id, None) for id in ips),
+        *(("prefix", "delete", id, vrf_id, None) for id in pids),
+        ("vrf", "delete", vrf_id, vrf_id, None),
+    ])
+    await entity_cache.publish(db, "vrf", vrf_id, deleted=True)
+    await db.commit()
+    entity_cache.invalidate("vrf", vrf_id, deleted=True)
+    for pid in pids:
+        entity_cache.invalidate("prefix", pid)
+        host_allocator.invalidate(pid)
+    prefix_index.invalidate(vrf_id)
+    lpm_cache.invalidate(vrf_id)
+    return True
+
+@with_lock_retry
+async def _delete_tenant_row(db: AsyncSession, tenant_id: uuid.UUID) -> Optional[bool]:
+    """Delete the tenant; False if it was already gone, None if a VRF was created under it meanwhile."""
+    async with locking(db, "tenant"):
+        found = (await db.execute(
+            select(m.Tenant.id).where(m.Tenant.id == tenant_id).with_for_update()
+        )).scalar_one_or_none()
+    if found is None or await _vrf_ids(db, tenant_id):
+        await db.commit()
+        return None if found else False
+    await db.execute(delete(m.Tenant).where(m.Tenant.id == tenant_id).execution_options(synchronize_session=False))
+    await changes.record(db, "tenant", "delete", tenant_id)
+    await entity_cache.publish(db, "tenant", tenant_id, deleted=True)
+    await db.commit()
+    entity_cache.invalidate("tenant", tenant_id, deleted=True)
+    return True
+
+
+# -----------------
+# whole deletes
+# -----------------
+
+async def _delete_vrf(db: AsyncSession, vrf_id: uuid.UUID, progress: _Progress) -> bool:
+    while await _delete_ip_chunk(db, vrf_id, progress):
+        pass
+    while await _delete_prefix_chunk(db, vrf_id, progress):
+        pass
+    return await _delete_vrf_row(db, vrf_id, progress)
+
+async def _delete_tenant(db: AsyncSession, tenant_id: uuid.UUID, progress: _Progress) -> bool:
+    while True:
+        for vrf_id in await _vrf_ids(db, tenant_id):
+            await _delete_vrf(db, vrf_id, progress)
+        done = await _delete_tenant_row(db, tenant_id)
+        if done is not None:
+            return done
+
+async def delete_vrf(db: AsyncSession, vrf_id: uuid.UUID) -> Optional[DeleteJobOut]:
+    """Delete a VRF with its prefixes and IPs; None when done, or the job a large one runs as."""
+    if (await db.execute(select(m.VRF.id).where(m.VRF.id == vrf_id))).scalar_one_or_none() is None:
+        return None
+    total = await _owned_rows(db, [vrf_id])
+    if total > settings.cascade_delete_sync_max_rows:
+        return await _start_job(db, "vrf", vrf_id, total)
+    await _delete_vrf(db, vrf_id, _Progress())
+    return None
+
+async def delete_tenant(db: AsyncSession, tenant_id: uuid.UUID) -> Optional[DeleteJobOut]:
+    """Delete a tenant with its VRFs, prefixes and IPs; None when done, or the job a large one runs as."""
+    if (await db.execute(select(m.Tenant.id).where(m.Tenant.id == tenant_id))).scalar_one_or_none() is None:
+        return None
+    total = await _owned_rows(db, await _vrf_ids(db, tenant_id))
+    if total > settings.cascade_delete_sync_max_rows:
+        return await _start_job(db, "tenant", tenant_id, total)
+    await _delete_tenant(db, tenant_id, _Progress())
+    return None
+
+
+# -----------------
+# background jobs
+# -----------------
+
+async def _latest_job(db: AsyncSession, kind: str, target_id: uuid.UUID) -> Optional[m.DeleteJob]:
+    return (await db.execute(
+        select(m.DeleteJob).where(m.DeleteJob.kind == kind, m.DeleteJob.target_id == target_id)
+        .order_by(m.DeleteJob.created_at.desc()).limit(1)
+    )).scalars().first()
+
+async def _start_job(db: AsyncSession, kind: str, target_id: uuid.UUID, total: int) -> DeleteJobOut:
+    running = await _latest_job(db, kind, target_id)
+    if running is not None and running.state == "running":
+        return DeleteJobOut.model_validate(running)
+    job = m.DeleteJob(kind=kind, target_id=target_id, total=total)
+    db.add(job)
+    try:
+        await db.commit()
+    except exc.IntegrityError:
+        # another worker started one between our check and insert (uq_delete_job_running)
+        await db.rollback()
+        return DeleteJobOut.model_validate(await _latest_job(db, kind, target_id))
+    _spawn(job.id)
+    return DeleteJobOut.model_validate(job)
+
+def _spawn(job_id: uuid.UUID) -> None:
+    task = asyncio.create_task(_run_job(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def _run_job(job_id: uuid.UUID) -> None:
+    async with SessionLocal() as db:
+        job = await db.get(m.DeleteJob, job_id)
+        run = _delete_vrf if job.kind == "vrf" else _delete_tenant
+        try:
+            await run(db, job.target_id, _Progress(job_id))
+            state, error = "done", None
+        except Exception as e:  # the job row is the only place a background failure can surface
+            await db.rollback()
+            log.exception("delete job %s (%s %s) failed", job_id, job.kind, job.target_id)
+            state, error = "failed", str(e)
+        now = datetime.utcnow()
+        await db.execute(
+            update(m.DeleteJob).where(m.DeleteJob.id == job_id)
+            .values(state=state, error=error, heartbeat_at=now, finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+async def resume_jobs() -> int:
+    """Take over running jobs whose worker stopped making progress; deleting is safe to repeat."""
+    now = datetime.utcnow()
+    async with SessionLocal() as db:
+        ids = (await db.execute(
+            update(m.DeleteJob)
+            .where(
+                m.DeleteJob.state == "running",
+                m.DeleteJob.heartbeat_at < now - timedelta(seconds=settings.cascade_delete_lease_s),
+            )
+            .values(heartbeat_at=now)
+            .returning(m.DeleteJob.id)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await db.commit()
+    for job_id in ids:
+        log.warning("resuming abandoned delete job %s", job_id)
+        _spawn(job_id)
+    return len(ids)
+
+async def watch_jobs() -> None:
+    """Run ``resume_jobs`` every half lease (as a task)."""
+    while True:
+        try:
+            await resume_jobs()
+        except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+            log.warning("delete job watcher failed: %s", e)
+        await asyncio.sleep(settings.cascade_delete_lease_s / 2)
+
+@instrumented
+async def get_job(db: AsyncSession, job_id: str) -> DeleteJobOut:
+    row = await db.get(m.DeleteJob, uuid.UUID(job_id))
+    if not row:
+        raise NotFound("job not found")
+    return DeleteJobOut.model_validate(row)
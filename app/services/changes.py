@@ -0,0 +1,285 @@
+# app/services/changes.py
+"""Change feed: one change_log row per entity write, committed with the write.
+
+Feed order is (txid, seq), not seq alone. Sequence values are drawn at
+insert time but become visible at commit, so a reader paging on seq could
+pass 8 while 7 is still uncommitted and never see 7. Each row therefore
+carries its transaction id, and readers only return rows whose transaction
+is older than every transaction still running (the snapshot's xmin).
+Nothing can commit below that line any more, so a position, once passed,
+stays passed. The price: one long write transaction holds the feed back
+until it ends.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlalchemy import BigInteger, Text, delete, exc, func, insert, literal, true, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import ChangeOut, ChangesPage
+from app.core.deps import SessionLocal, replica_router
+from app.core.errors import Gone, ValidationErr
+from app.core.instrumentation import instrumented
+from app.core.metrics import change_feed_streams
+from app.core.settings import settings
+from app.db import models as m
+
+log = logging.getLogger(__name__)
+
+# kind, op, entity id, vrf id, entity *Out after the change (None on delete)
+Change = tuple[str, str, uuid.UUID, Optional[uuid.UUID], Optional[BaseModel]]
+Position = tuple[int, int]  # (txid, seq)
+
+_START: Position = (0, 0)
+_c = m.ChangeLog
+
+
+def _token(pos: Position) -> str:
+    return f"{pos[0]}.{pos[1]}"
+
+
+def _decode(token: str) -> Position:
+    txid, _, seq = token.partition(".")
+    try:
+        return int(txid), int(seq)
+    except ValueError:
+        raise ValidationErr(f"invalid change token {token!r}")
+
+
+def _pg(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+def _position():
+    return tuple_(_c.txid, _c.seq)
+
+
+def _settled(db: AsyncSession):
+    if _pg(db):
+        return _c.txid < func.pg_snapshot_xmin(func.pg_current_snapshot()).cast(Text).cast(BigInteger)
+    return true()  # SQLite runs one writer at a time, so seq order is already commit order
+
+
+# -----------------
+# writing
+# -----------------
+
+def snapshot(out: type[BaseModel], values: dict) -> BaseModel:
+    """``out`` from a row's ``model_dump()``, for writers that insert without an ORM round trip."""
+    return out.model_validate({f: values[f] for f in out.model_fields})
+
+async def record(
+    db: AsyncSession, kind: str, op: str, id: uuid.UUID,
+    vrf_id: Optional[uuid.UUID] = None, data: Optional[BaseModel] = None,
+) -> None:
+    await record_many(db, [(kind, op, id, vrf_id, data)])
+
+async def record_many(db: AsyncSession, changes: Iterable[Change]) -> None:
+    """Insert change rows in ``db``'s transaction, in one executemany."""
+    now = datetime.utcnow()
+    values = [
+        {
+            "kind": kind, "op": op, "entity_id": id, "vrf_id": vrf_id,
+            "data": data.model_dump(mode="json") if data is not None else None, "created_at": now,
+        }
+        for kind, op, id, vrf_id, data in changes
+    ]
+    if not values:
+        return
+    txid = func.pg_current_xact_id().cast(Text).cast(BigInteger) if _pg(db) else literal(0, BigInteger)
+    await db.execute(insert(_c.__table__).values(txid=txid), values)
+
+
+# -----------------
+# reading
+# -----------------
+
+async def _edge(db: AsyncSession, newest: bool) -> Optional[Position]:
+    order = (_c.txid.desc(), _c.seq.desc()) if newest else (_c.txid, _c.seq)
+    stmt = select(_c.txid, _c.seq).order_by(*order).limit(1)
+    if newest:
+        stmt = stmt.where(_settled(db))
+    row = (await db.execute(stmt)).one_or_none()
+    return tuple(row) if row else None
+
+async def resolve_since(db: AsyncSession, since: Optional[str]) -> Position:
+    """Turn a ``since`` argument into a position: omitted = the start, ``now`` = the head.
+
+    A token older than the oldest retained change was purged: the caller has
+    missed changes and must re-list, so that is a 410.
+    """
+    if since == "now":
+        return await _edge(db, newest=True) or _START
+    if not since:
+        return _START
+    pos = _decode(since)
+    if pos != _START:
+        oldest = await _edge(db, newest=False)
+        if oldest is not None and pos < oldest:
+            raise Gone("change token has expired; re-list and resume from since=now")
+    return pos
+
+@instrumented
+async def list_changes(
+    db: AsyncSession,
+    since: Optional[str],
+    kinds: Optional[list[str]],
+    vrf_id: Optional[str],
+    limit: int,
+) -> ChangesPage:
+    """Settled changes after ``since``, oldest first."""
+    after = await resolve_since(db, since)
+    return await _read(db, after, kinds, vrf_id, limit)
+
+async def _read(
+    db: AsyncSession, after: Position, kinds: Optional[list[str]], vrf_id: Optional[str], limit: int,
+) -> ChangesPage:
+    # fix the head first: rows at or below it are settled, and next_since may jump to it
+    head = await _edge(db, newest=True)
+    if head is None or head <= after:
+        return ChangesPage(items=[], next_since=_token(after), has_more=False)
+    stmt = (
+        select(_c.txid, _c.seq, _c.kind, _c.op, _c.entity_id, _c.vrf_id, _c.data, _c.created_at)
+        .where(_position() > after, _position() <= head)
+        .order_by(_c.txid, _c.seq)
+        .limit(limit + 1)
+    )
+    if kinds:
+        stmt = stmt.where(_c.kind.in_(kinds))
+    if vrf_id:
+        stmt = stmt.where(_c.vrf_id == uuid.UUID(vrf_id))
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [
+        ChangeOut(
+            token=_token((r.txid, r.seq)), kind=r.kind, op=r.op, id=r.entity_id,
+            vrf_id=r.vrf_id, data=r.data, created_at=r.created_at,
+        )
+        for r in rows
+    ]
+    # without more matches the scan reached the head, filtered-out rows included
+    next_pos = (rows[-1].txid, rows[-1].seq) if has_more else head
+    return ChangesPage(items=items, next_since=_token(next_pos), has_more=has_more)
+
+
+# -----------------
+# server-sent events
+# -----------------
+
+class ChangeHub:
+    """Wakes this worker's SSE streams when the feed's head moves.
+
+    One head query per ``change_feed_poll_ms`` per worker, however many
+    streams are open, and none while no stream is; each stream then reads
+    its own delta.
+    """
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.streams = 0
+        self._moved = asyncio.Event()
+        self._head: Optional[Position] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @contextlib.contextmanager
+    def subscribe(self) -> Iterator[None]:
+        self.streams += 1
+        change_feed_streams.inc()
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+        try:
+            yield
+        finally:
+            self.streams -= 1
+            change_feed_streams.dec()
+
+    def moved(self) -> asyncio.Event:
+        """Set on the next head move. Take it before reading, so a move during the read isn't missed."""
+        return self._moved
+
+    async def _poll(self) -> None:
+        try:
+            while self.streams:
+                try:
+                    async with await replica_router.session(None) as db:
+                        head = await _edge(db, newest=True)
+                except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+                    log.warning("change feed head poll failed: %s", e)
+                    head = self._head
+                if head != self._head:
+                    self._head = head
+                    moved, self._moved = self._moved, asyncio.Event()
+                    moved.set()
+                await asyncio.sleep(self.interval_s)
+        finally:
+            self._task = None
+
+
+change_hub = ChangeHub(settings.change_feed_poll_ms / 1000)
+
+
+async def stream_changes(after: Position, kinds: Optional[list[str]], vrf_id: Optional[str]) -> AsyncIterator[bytes]:
+    """Server-sent events: one ``change`` event per change, its ``id`` the change's token.
+
+    Each delta is read on a short-lived session, so an idle stream doesn't
+    pin a pooled connection; a comment line every ``change_feed_heartbeat_s``
+    keeps proxies from closing it.
+    """
+    with change_hub.subscribe():
+        while True:
+            moved = change_hub.moved()
+            async with await replica_router.session(None) as db:
+                page = await _read(db, after, kinds, vrf_id, settings.change_feed_page_size)
+            if page.items:
+                yield "".join(
+                    f"id: {c.token}\nevent: change\ndata: {c.model_dump_json()}\n\n" for c in page.items
+                ).encode()
+            after = _decode(page.next_since)
+            if page.has_more:
+                continue
+            try:
+                await asyncio.wait_for(moved.wait(), settings.change_feed_heartbeat_s)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+
+
+# -----------------
+# retention
+# -----------------
+
+async def purge_changes(db: AsyncSession) -> int:
+    """Drop changes older than ``change_log_retention_s``.
+
+    Cuts at a position, not a timestamp, so what remains is always a suffix
+    of the feed, and keeps the newest change so expired tokens stay detectable.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.change_log_retention_s)
+    first_kept = (await db.execute(
+        select(_c.txid, _c.seq).where(_c.created_at >= cutoff).order_by(_c.created_at, _c.seq).limit(1)
+    )).one_or_none() or await _edge(db, newest=True)
+    if first_kept is None:
+        return 0
+    result = await db.execute(delete(_c).where(_position() < tuple(first_kept)))
+    await db.commit()
+    return result.rowcount
+
+async def purge_forever() -> None:
+    """Run ``purge_changes`` every ``change_log_purge_interval_s`` (as a task)."""
+    while True:
+        try:
+            async with SessionLocal() as db:
+                n = await purge_changes(db)
+            if n:
+                log.info("purged %d expired changes", n)
+        except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+            log.warning("change log purge failed: %s", e)
+        await asyncio.sleep(settings.change_log_purge_interval_s)
@@ -0,0 +1,92 @@
+# app/services/coalesce.py
+from __future__ import annotations
+
+import asyncio
+from itertools import zip_longest
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.deps import SessionLocal
+from app.core.metrics import coalesced_batch_size
+from app.db.replica import request_commits
+
+T = TypeVar("T")
+
+
+class Coalescer(Generic[T]):
+    """Group commit for single-item allocations, keyed by the parent (e.g. prefix id).
+
+    Requests for a key queue up while that key's previous batch is in
+    flight; a per-key drain task then serves up to ``max_batch`` of them
+    with one ``run(db, key, n)`` call on its own session and fans the
+    results back out. An idle key is served straight away, so coalescing
+    only adds latency under contention (plus ``window_s``, if set, to let a
+    burst gather). ``run`` may return fewer than ``n`` items; the waiters
+    left over get ``exhausted()``. The drain task runs in the first
+    waiter's context, so each waiter flags its own request as having
+    written once its item is committed.
+    """
+
+    def __init__(
+        self,
+        op: str,
+        run: Callable[[AsyncSession, str, int], Awaitable[list[T]]],
+        exhausted: Callable[[], Exception],
+        window_s: float,
+        max_batch: int,
+    ):
+        self.op = op
+        self.run = run
+        self.exhausted = exhausted
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._queues: dict[str, list[asyncio.Future]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, key: str) -> T:
+        commits = request_commits()
+        fut = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            self._queues[key] = [fut]
+            task = asyncio.create_task(self._drain(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            queue.append(fut)
+        result = await fut
+        if commits is not None:
+            commits.wrote = True
+        return result
+
+    async def _drain(self, key: str) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                if self.window_s:
+                    await asyncio.sleep(self.window_s)
+                batch = [f for f in queue[:self.max_batch] if not f.done()]
+                del queue[:self.max_batch]
+                if batch:
+                    await self._serve(key, batch)
+        finally:
+            del self._queues[key]
+
+    async def _serve(self, key: str, batch: list[asyncio.Future]) -> None:
+        coalesced_batch_size.labels(op=self.op).observe(len(batch))
+        try:
+            async with SessionLocal() as db:
+                results = await self.run(db, key, len(batch))
+        except Exception as e:
+            for f in batch:
+                if not f.done():
+                    f.set_exception(e)
+            return
+        for f, r in zip_longest(batch, results):
+            if f is None or f.done():
+                continue  # waiter gave up; its item stays allocated, as with a dropped response
+            if r is None:
+                f.set_exception(self.exhausted())
+            else:
+                f.set_result(r)
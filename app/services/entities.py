@@ -0,0 +1,141 @@
+# app/services/entities.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import PrefixOut, TenantOut, VrfOut
+from app.core.metrics import entity_cache_requests_total
+from app.core.settings import settings
+from app.db import models as m
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "subnetter_entity_cache"
+
+# kind -> (table model, snapshot schema)
+KINDS: dict[str, tuple[type, type[BaseModel]]] = {
+    "tenant": (m.Tenant, TenantOut),
+    "vrf": (m.VRF, VrfOut),
+    "prefix": (m.Prefix, PrefixOut),
+}
+
+
+class EntityCache:
+    """Process-local, LRU+TTL-bounded read-through cache of Tenant/VRF/Prefix rows.
+
+    Entries are detached ``*Out`` snapshots, safe to share across sessions.
+    The update_* and delete_* services invalidate after commit; other
+    replicas hear about it over LISTEN/NOTIFY when ``entity_cache_notify``
+    is on, and otherwise converge within ``entity_cache_ttl_s``.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[tuple[str, uuid.UUID], tuple[float, BaseModel]] = OrderedDict()
+        self._gen = 0  # bumped by every invalidation; guards fills racing a write
+
+    async def get(self, db: AsyncSession, kind: str, id: uuid.UUID) -> Optional[BaseModel]:
+        key = (kind, id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            entity_cache_requests_total.labels(kind=kind, result="hit").inc()
+            return entry[1]
+        entity_cache_requests_total.labels(kind=kind, result="miss").inc()
+
+        model, out = KINDS[kind]
+        gen = self._gen
+        row = await db.get(model, id)
+        if row is None:
+            return None  # misses are not cached: the row may be created any moment
+        snap = out.model_validate(row)
+        # replica rows may predate a write this process already invalidated for
+        if gen == self._gen and not db.info.get("replica"):
+            self._entries[key] = (time.monotonic() + self.ttl_s, snap)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snap
+
+    def invalidate(self, kind: str, id: uuid.UUID, deleted: bool = False) -> None:
+        """Drop one entry; on delete also drop rows the ORM cascade touched."""
+        self._gen += 1
+        self._entries.pop((kind, id), None)
+        if not deleted:
+            return
+        if kind == "tenant":
+            # prefix snapshots don't carry tenant_id, and tenant deletes are rare
+            self._drop(lambda k, s: k[0] != "tenant")
+        elif kind == "vrf":
+            self._drop(lambda k, s: k[0] == "prefix" and s.vrf_id == id)
+        elif kind == "prefix":
+            # children survive, moved up to the grandparent
+            self._drop(lambda k, s: k[0] == "prefix" and s.parent_id == id)
+
+    def clear(self) -> None:
+        self._gen += 1
+        self._entries.clear()
+
+    def _drop(self, pred) -> None:
+        for k in [k for k, (_, s) in self._entries.items() if pred(k, s)]:
+            del self._entries[k]
+
+    # -- cross-replica invalidation --
+
+    async def publish(self, db: AsyncSession, kind: str, id: uuid.UUID, deleted: bool = False) -> None:
+        """Queue a NOTIFY in ``db``'s transaction; Postgres delivers it on commit."""
+        if not settings.entity_cache_notify or db.bind.dialect.name != "postgresql":
+            return
+        payload = json.dumps({"kind": kind, "id": str(id), "deleted": deleted})
+        await db.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": CHANNEL, "payload": payload})
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        try:
+            msg = json.loads(payload)
+            self.invalidate(msg["kind"], uuid.UUID(msg["id"]), msg.get("deleted", False))
+        except (ValueError, KeyError):
+            log.warning("ignoring malformed %s payload %r", CHANNEL, payload)
+
+
+entity_cache = EntityCache(settings.entity_cache_size, settings.entity_cache_ttl_s)
+
+
+async def listen_for_invalidations() -> None:
+    """Hold a dedicated LISTEN connection, reconnecting on loss (run as a task).
+
+    Notifications missed while disconnected cannot be replayed, so the cache
+    is cleared on every (re)connect.
+    """
+    import asyncpg  # only needed when notify is enabled
+
+    url = make_url(settings.db_url).set(drivername="postgresql")
+    dsn = url.render_as_string(hide_password=False)
+    while True:
+        lost = asyncio.Event()
+        try:
+            conn = await asyncpg.connect(dsn)
+        except (OSError, asyncpg.PostgresError) as e:
+            log.warning("entity cache listener cannot connect: %s", e)
+            await asyncio.sleep(5)
+            continue
+        try:
+            conn.add_termination_listener(lambda _c: lost.set())
+            await conn.add_listener(CHANNEL, entity_cache._on_notify)
+            entity_cache.clear()
+            await lost.wait()
+            log.warning("entity cache listener disconnected; reconnecting")
+        finally:
+            if not conn.is_closed():
+                await conn.close()
@@ -1,24 +1,41 @@
 # app/services/ipam.py
 from __future__ import annotations
 
+import functools
 import ipaddress
+import json
 import uuid
-from typing import Optional
+from itertools import islice
+from typing import Iterable, Iterator, Optional
 
+from pydantic import TypeAdapter
 from sqlmodel import select  # ✅ use sqlmodel.select
-from sqlalchemy import func
+from sqlalchemy import func, insert, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.schemas import (
     TenantCreate, TenantUpdate, TenantOut,
     VrfCreate, VrfUpdate, VrfOut,
     PrefixCreate, PrefixUpdate, PrefixOut,
-    CarveChildrenIn, FreeSpaceOut, NextIPOut,
-    IPCreate, IPUpdate, IPOut, Page,
+    CarveChildrenIn, FreeSpaceOut, FreeBlocksPage, NextIPOut, NextIPBatchIn,
+    IPCreate, IPUpdate, IPOut, Page, DeleteJobOut,
     PrefixStatus, IPStatus,
 )
 from app.core.errors import NotFound, Conflict, ValidationErr
+from app.core.idempotency import idempotent
+from app.core.instrumentation import instrumented
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.settings import settings
 from app.db import models as m
+from app.services import cascade, changes
+from app.services.allocator import bump_ip_rev, host_allocator
+from app.services.coalesce import Coalescer
+from app.services.entities import entity_cache
+from app.services.locks import with_lock_retry
+from app.services.lpm import lpm_cache
+from app.services.radix import OVERLAP_STATUSES, bump_prefix_rev, prefix_index
+from app.services.utilization import adjust_counts
+from app.services.ranges import cidr_blocks, gaps, net_range, to_addr, to_cidr
 
 
 # -----------------
@@ -37,38 +54,114 @@ def _canon_ip(v: str) -> str:
     except ValueError as e:
         raise ValidationErr(f"invalid IP address: {e}")
 
+def _canon_net(cidr: str) -> str:
+    return str(_parse_net(cidr))
+
 def _status_val(s: PrefixStatus | IPStatus | str | None) -> Optional[str]:
     if s is None:
         return None
     return s.value if hasattr(s, "value") else str(s)
 
+async def _estimate_count(db: AsyncSession, stmt) -> int:
+    # planner estimate: no scan, but can be off for skewed filters
+    sql = stmt.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    conn = await db.connection()
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+@functools.cache
+def _page_adapter(out) -> TypeAdapter:
+    return TypeAdapter(Page[out])
+
+async def _paginate(
+    db: AsyncSession,
+    stmt,
+    model,
+    out,
+    limit: int,
+    offset: int,
+    cursor: str | None,
+    include_total: bool,
+    estimate_total: bool,
+) -> Page:
+    """Run ``stmt`` newest-first as one page, keyed on (created_at, id).
+
+    With a cursor the page starts strictly after it (offset must be 0), so
+    deep pages cost the same as the first one. Only ``out``'s columns are
+    selected, as plain rows rather than ORM entities, and the whole page is
+    validated in one pass of its compiled schema.
+    """
+    total = None
+    if include_total:
+        if estimate_total:
+            total = await _estimate_count(db, stmt)
+        else:
+            total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
+
+    fields = list(out.model_fields)
+    page = stmt.with_only_columns(*(getattr(model, f) for f in fields))
+    page = page.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        if offset:
+            raise ValidationErr("use either cursor or offset, not both")
+        c_at, c_id = decode_cursor(cursor)
+        page = page.where(tuple_(model.created_at, model.id) < tuple_(c_at, c_id))
+    rows = (await db.execute(page.limit(limit + 1).offset(offset))).all()
+
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return _page_adapter(out).validate_python(
+        {
+            # dicts, not Rows: attribute lookups on a Row are the slow path for pydantic
+            "items": [dict(zip(fields, r)) for r in rows[:limit]],
+            "total": total,
+            "total_estimated": include_total and estimate_total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor,
+        },
+    )
+
 
 # -----------------
 # Tenants
 # -----------------
 
+@instrumented
 async def create_tenant(db: AsyncSession, body: TenantCreate) -> TenantOut:
     t = m.Tenant(name=body.name)
     db.add(t)
     await db.flush()
     await db.refresh(t)
+    out = TenantOut.model_validate(t)
+    await changes.record(db, "tenant", "create", t.id, data=out)
     await db.commit()  # ✅ commit
-    return TenantOut.model_validate(t)
+    return out
 
+@instrumented
 async def get_tenant(db: AsyncSession, tenant_id: str) -> TenantOut:
-    t = await db.get(m.Tenant, uuid.UUID(tenant_id))
+    t = await entity_cache.get(db, "tenant", uuid.UUID(tenant_id))
     if not t:
         raise NotFound("tenant not found")
-    return TenantOut.model_validate(t)
+    return t
 
-async def list_tenants(db: AsyncSession, q: str | None, limit: int, offset: int) -> Page[TenantOut]:
+@instrumented
+async def list_tenants(
+    db: AsyncSession,
+    q: str | None,
+    limit: int,
+    offset: int,
+    cursor: str | None = None,
+    include_total: bool = True,
+    estimate_total: bool = False,
+) -> Page[TenantOut]:
     stmt = select(m.Tenant)
     if q:
         stmt = stmt.where(m.Tenant.name.ilike(f"%{q}%"))
-    total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
-    rows = (await db.execute(stmt.order_by(m.Tenant.created_at.desc()).limit(limit).offset(offset))).scalars().all()
-    return Page[TenantOut](items=[TenantOut.model_validate(r) for r in rows], total=total, limit=limit, offset=offset)
+    return await _paginate(db, stmt, m.Tenant, TenantOut, limit, offset, cursor, include_total, estimate_total)
 
+@instrumented
 async def update_tenant(db: AsyncSession, tenant_id: str, body: TenantUpdate) -> TenantOut:
     t = await db.get(m.Tenant, uuid.UUID(tenant_id))
     if not t:
@@ -77,47 +170,62 @@ async def update_tenant(db: AsyncSession, tenant_id: str, body: TenantUpdate) ->
         t.name = body.name
     await db.flush()
     await db.refresh(t)
+    out = TenantOut.model_validate(t)
+    await changes.record(db, "tenant", "update", t.id, data=out)
+    await entity_cache.publish(db, "tenant", t.id)
     await db.commit()  # ✅
-    return TenantOut.model_validate(t)
+    entity_cache.invalidate("tenant", t.id)
+    return out
 
-async def delete_tenant(db: AsyncSession, tenant_id: str) -> None:
-    t = await db.get(m.Tenant, uuid.UUID(tenant_id))
-    if not t:
-        return
-    await db.delete(t)
-    await db.commit()  # ✅
+@instrumented
+async def delete_tenant(db: AsyncSession, tenant_id: str) -> Optional[DeleteJobOut]:
+    """Delete with every VRF, prefix and IP under it; a large tenant returns its background job."""
+    return await cascade.delete_tenant(db, uuid.UUID(tenant_id))
 
 
 # -----------------
 # VRFs
 # -----------------
 
+@instrumented
 async def create_vrf(db: AsyncSession, body: VrfCreate) -> VrfOut:
-    if not await db.get(m.Tenant, body.tenant_id):
+    if not await entity_cache.get(db, "tenant", body.tenant_id):
         raise ValidationErr("tenant_id does not exist")
     row = m.VRF(tenant_id=body.tenant_id, name=body.name, rd=body.rd)
     db.add(row)
     await db.flush()
     await db.refresh(row)
+    out = VrfOut.model_validate(row)
+    await changes.record(db, "vrf", "create", row.id, row.id, out)
     await db.commit()  # ✅
-    return VrfOut.model_validate(row)
+    return out
 
+@instrumented
 async def get_vrf(db: AsyncSession, vrf_id: str) -> VrfOut:
-    row = await db.get(m.VRF, uuid.UUID(vrf_id))
+    row = await entity_cache.get(db, "vrf", uuid.UUID(vrf_id))
     if not row:
         raise NotFound("vrf not found")
-    return VrfOut.model_validate(row)
+    return row
 
-async def list_vrfs(db: AsyncSession, tenant_id: str | None, q: str | None, limit: int, offset: int) -> Page[VrfOut]:
+@instrumented
+async def list_vrfs(
+    db: AsyncSession,
+    tenant_id: str | None,
+    q: str | None,
+    limit: int,
+    offset: int,
+    cursor: str | None = None,
+    include_total: bool = True,
+    estimate_total: bool = False,
+) -> Page[VrfOut]:
     stmt = select(m.VRF)
     if tenant_id:
         stmt = stmt.where(m.VRF.tenant_id == uuid.UUID(tenant_id))
     if q:
         stmt = stmt.where(m.VRF.name.ilike(f"%{q}%"))
-    total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
-    rows = (await db.execute(stmt.order_by(m.VRF.created_at.desc()).limit(limit).offset(offset))).scalars().all()
-    return Page[VrfOut](items=[VrfOut.model_validate(r) for r in rows], total=total, limit=limit, offset=offset)
+    return await _paginate(db, stmt, m.VRF, VrfOut, limit, offset, cursor, include_total, estimate_total)
 
+@instrumented
 async def update_vrf(db: AsyncSession, vrf_id: str, body: VrfUpdate) -> VrfOut:
     row = await db.get(m.VRF, uuid.UUID(vrf_id))
     if not row:
@@ -128,70 +236,136 @@ async def update_vrf(db: AsyncSession, vrf_id: str, body: VrfUpdate) -> VrfOut:
         row.rd = body.rd
     await db.flush()
     await db.refresh(row)
+    out = VrfOut.model_validate(row)
+    await changes.record(db, "vrf", "update", row.id, row.id, out)
+    await entity_cache.publish(db, "vrf", row.id)
     await db.commit()  # ✅
-    return VrfOut.model_validate(row)
+    entity_cache.invalidate("vrf", row.id)
+    return out
 
-async def delete_vrf(db: AsyncSession, vrf_id: str) -> None:
-    row = await db.get(m.VRF, uuid.UUID(vrf_id))
-    if not row:
-        return
-    await db.delete(row)
-    await db.commit()  # ✅
+@instrumented
+async def delete_vrf(db: AsyncSession, vrf_id: str) -> Optional[DeleteJobOut]:
+    """Delete with every prefix and IP in it; a large VRF returns its background job."""
+    return await cascade.delete_vrf(db, uuid.UUID(vrf_id))
 
 
 # -----------------
 # Prefixes
 # -----------------
 
+@instrumented
+@idempotent(PrefixOut)
+@with_lock_retry
 async def create_prefix(db: AsyncSession, body: PrefixCreate, idem: str | None) -> PrefixOut:
     new_net = _parse_net(body.cidr)
-    new_status = _status_val(body.status)
-
-    # naive overlap check inside VRF (prototype)
-    existing = (await db.execute(select(m.Prefix).where(m.Prefix.vrf_id == body.vrf_id))).scalars().all()
-    for e in existing:
-        e_net = _parse_net(e.cidr)
-        if new_status in {"active", "reserved"} and e.status in {"active", "reserved"} and new_net.overlaps(e_net):
-            raise Conflict(f"prefix {body.cidr} overlaps existing {e.cidr}")
+    new_status = _status_val(body.status) or "active"
+
+    # every prefix write bumps the rev: the LPM table covers all statuses
+    rev = await bump_prefix_rev(db, body.vrf_id)
+    if new_status in OVERLAP_STATUSES:
+        idx = await prefix_index.load(db, body.vrf_id, rev - 1)
+        hit = idx.find_overlap(new_net)
+        if hit:
+            raise Conflict(f"prefix {body.cidr} overlaps existing {hit}")
+
+    # nest under the most specific containing prefix, adopting its children that fall inside
+    table = await lpm_cache.load(db, body.vrf_id, rev - 1)
+    parent_id = table.parent_of(new_net)
+    adopted = table.children_within(parent_id, new_net)
+    adopted_addresses = sum(_parse_net(table.cidr(c)).num_addresses for c in adopted)
 
     row = m.Prefix(
         vrf_id=body.vrf_id,
         cidr=str(new_net),
-        status=new_status or "active",
+        status=new_status,
         description=body.description or "",
+        parent_id=parent_id,
+        child_count=len(adopted),
+        child_addresses=adopted_addresses,
     )
     db.add(row)
     await db.flush()
+    moved = []
+    if adopted:
+        moved = await _reparent(db, m.Prefix.id.in_(adopted), row.id)
+    if parent_id is not None:
+        await adjust_counts(
+            db, parent_id, children=1 - len(adopted), addresses=new_net.num_addresses - adopted_addresses,
+        )
+    for cid in adopted:
+        await entity_cache.publish(db, "prefix", cid)
     await db.refresh(row)
+    out = PrefixOut.model_validate(row)
+    await changes.record_many(db, [
+        ("prefix", "create", row.id, row.vrf_id, out), *(("prefix", "update", p.id, p.vrf_id, p) for p in moved),
+    ])
     await db.commit()  # ✅
-    return PrefixOut.model_validate(row)
+    for cid in adopted:
+        entity_cache.invalidate("prefix", cid)
+    prefix_index.apply(row.vrf_id, rev, added=[new_net] if new_status in OVERLAP_STATUSES else [])
+    lpm_cache.apply(row.vrf_id, rev, added=[(row.id, new_net, parent_id)], reparented={c: row.id for c in adopted})
+    return out
 
+@instrumented
 async def get_prefix(db: AsyncSession, prefix_id: str) -> PrefixOut:
-    row = await db.get(m.Prefix, uuid.UUID(prefix_id))
+    row = await entity_cache.get(db, "prefix", uuid.UUID(prefix_id))
     if not row:
         raise NotFound("prefix not found")
-    return PrefixOut.model_validate(row)
+    return row
 
+@instrumented
+@with_lock_retry
 async def update_prefix(db: AsyncSession, prefix_id: str, body: PrefixUpdate) -> PrefixOut:
     row = await db.get(m.Prefix, uuid.UUID(prefix_id))
     if not row:
         raise NotFound("prefix not found")
+    was_indexed = row.status in OVERLAP_STATUSES
     if body.status is not None:
         row.status = _status_val(body.status) or row.status
     if body.description is not None:
         row.description = body.description
+    now_indexed = row.status in OVERLAP_STATUSES
+    rev = await bump_prefix_rev(db, row.vrf_id) if was_indexed != now_indexed else None
     await db.flush()
     await db.refresh(row)
+    out = PrefixOut.model_validate(row)
+    await changes.record(db, "prefix", "update", row.id, row.vrf_id, out)
+    await entity_cache.publish(db, "prefix", row.id)
     await db.commit()  # ✅
-    return PrefixOut.model_validate(row)
+    entity_cache.invalidate("prefix", row.id)
+    if rev is not None:
+        net = _parse_net(row.cidr)
+        prefix_index.apply(row.vrf_id, rev, added=[net] if now_indexed else [], removed=[] if now_indexed else [net])
+        lpm_cache.apply(row.vrf_id, rev)
+    return out
 
+@instrumented
+@with_lock_retry
 async def delete_prefix(db: AsyncSession, prefix_id: str) -> None:
     row = await db.get(m.Prefix, uuid.UUID(prefix_id))
     if not row:
         return
+    rev = await bump_prefix_rev(db, row.vrf_id)
+    net = _parse_net(row.cidr)
+    # children move up to the grandparent rather than becoming roots
+    kids = await _reparent(db, m.Prefix.parent_id == row.id, row.parent_id)
+    if row.parent_id is not None:
+        kid_addresses = sum(_parse_net(k.cidr).num_addresses for k in kids)
+        await adjust_counts(
+            db, row.parent_id, children=len(kids) - 1, addresses=kid_addresses - net.num_addresses,
+        )
     await db.delete(row)
+    await changes.record_many(db, [
+        *(("prefix", "update", k.id, k.vrf_id, k) for k in kids), ("prefix", "delete", row.id, row.vrf_id, None),
+    ])
+    await entity_cache.publish(db, "prefix", row.id, deleted=True)
     await db.commit()  # ✅
+    entity_cache.invalidate("prefix", row.id, deleted=True)
+    host_allocator.invalidate(row.id)
+    prefix_index.apply(row.vrf_id, rev, removed=[net] if row.status in OVERLAP_STATUSES else [])
+    lpm_cache.apply(row.vrf_id, rev, removed=[row.id], reparented={k.id: row.parent_id for k in kids})
 
+@instrumented
 async def list_prefixes(
     db: AsyncSession,
     vrf_id: str | None,
@@ -199,71 +373,126 @@ async def list_prefixes(
     cidr_contains: str | None,
     limit: int,
     offset: int,
+    cidr_overlaps: str | None = None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    estimate_total: bool = False,
 ) -> Page[PrefixOut]:
     stmt = select(m.Prefix)
     if vrf_id:
         stmt = stmt.where(m.Prefix.vrf_id == uuid.UUID(vrf_id))
     if status:
         stmt = stmt.where(m.Prefix.status == _status_val(status))
-    raw_total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
-    rows = (await db.execute(stmt.order_by(m.Prefix.created_at.desc()).limit(limit).offset(offset))).scalars().all()
-
-    # Optional Python-side containment filter (prototype)
+    # containment/overlap run in SQL on the GiST-indexed cidr column
     if cidr_contains:
-        block = _parse_net(cidr_contains)
-        rows = [r for r in rows if _parse_net(r.cidr).subnet_of(block) or block.supernet_of(_parse_net(r.cidr))]
-        total = len(rows)  # make total reflect filter
-    else:
-        total = raw_total
-
-    return Page[PrefixOut](items=[PrefixOut.model_validate(r) for r in rows], total=total, limit=limit, offset=offset)
-
-async def free_space(db: AsyncSession, prefix_id: str, mask: int) -> list[FreeSpaceOut]:
-    parent = await db.get(m.Prefix, uuid.UUID(prefix_id))
+        stmt = stmt.where(m.Prefix.cidr.op("<<=")(_canon_net(cidr_contains)))
+    if cidr_overlaps:
+        stmt = stmt.where(m.Prefix.cidr.op("&&")(_canon_net(cidr_overlaps)))
+    return await _paginate(db, stmt, m.Prefix, PrefixOut, limit, offset, cursor, include_total, estimate_total)
+
+async def _reparent(db: AsyncSession, where, parent_id: Optional[uuid.UUID]) -> list[PrefixOut]:
+    """Move the prefixes matching ``where`` under ``parent_id``; returns them as changed."""
+    fields = list(PrefixOut.model_fields)
+    rows = (await db.execute(
+        update(m.Prefix).where(where).values(parent_id=parent_id)
+        .returning(*(getattr(m.Prefix, f) for f in fields))
+        .execution_options(synchronize_session=False)
+    )).all()
+    return [PrefixOut.model_validate(dict(zip(fields, r))) for r in rows]
+
+async def _get_parent(db: AsyncSession, prefix_id: str) -> PrefixOut:
+    parent = await entity_cache.get(db, "prefix", uuid.UUID(prefix_id))
     if not parent:
         raise NotFound("parent prefix not found")
-    parent_net = _parse_net(parent.cidr)
-    if mask < parent_net.prefixlen:
-        raise ValidationErr("mask must be >= parent mask")
+    return parent
 
-    # collect used child blocks at that mask
-    kids = (await db.execute(select(m.Prefix).where(m.Prefix.parent_id == parent.id))).scalars().all()
-    used = [_parse_net(k.cidr) for k in kids if _parse_net(k.cidr).prefixlen == mask]
+async def _load_free_blocks(
+    db: AsyncSession, parent: PrefixOut, mask: int | None, start: str | None = None,
+) -> tuple[ipaddress._BaseNetwork, Iterator[tuple[int, int]]]:  # type: ignore[name-defined]
+    """Parent network plus a lazy iterator of its free aligned blocks as (int, prefixlen).
 
-    out: list[FreeSpaceOut] = []
-    for cand in parent_net.subnets(new_prefix=mask):
-        if any(cand.overlaps(u) for u in used):
-            continue
-        out.append(FreeSpaceOut(cidr=str(cand)))
-    return out
-
-async def carve_children(db: AsyncSession, prefix_id: str, body: CarveChildrenIn, idem: str | None) -> list[PrefixOut]:
-    parent = await db.get(m.Prefix, uuid.UUID(prefix_id))
-    if not parent:
-        raise NotFound("parent prefix not found")
+    Free space is the parent's range minus every direct child, whatever its
+    mask. Blocks too small to hold a /mask are skipped.
+    """
     parent_net = _parse_net(parent.cidr)
-    if body.mask < parent_net.prefixlen:
+    if mask is not None and not parent_net.prefixlen <= mask <= parent_net.max_prefixlen:
         raise ValidationErr("mask must be >= parent mask")
 
-    kids = (await db.execute(select(m.Prefix).where(m.Prefix.parent_id == parent.id))).scalars().all()
-    existing = [_parse_net(k.cidr) for k in kids]
-
-    allocated: list[PrefixOut] = []
-    for cand in parent_net.subnets(new_prefix=body.mask):
-        if any(cand.overlaps(e) for e in existing):
-            continue
-        row = m.Prefix(vrf_id=parent.vrf_id, cidr=str(cand), status="active", parent_id=parent.id)
-        db.add(row)
-        await db.flush()
-        await db.refresh(row)
-        allocated.append(PrefixOut.model_validate(row))
-        if len(allocated) >= body.count:
-            break
-
-    if not allocated:
+    lo, hi = net_range(parent_net)
+    if start is not None:
+        cur = ipaddress.ip_address(_canon_ip(start))
+        if cur not in parent_net:
+            raise ValidationErr("cursor is outside the parent prefix")
+        lo = int(cur)
+
+    kids = (await db.execute(select(m.Prefix.cidr).where(m.Prefix.parent_id == parent.id))).scalars().all()
+    used = [net_range(_parse_net(k)) for k in kids]
+    bits = parent_net.max_prefixlen
+    blocks = (b for s, e in gaps(lo, hi, used) for b in cidr_blocks(s, e, bits))
+    if mask is not None:
+        blocks = (b for b in blocks if b[1] <= mask)
+    return parent_net, blocks
+
+def _slots(blocks: Iterable[tuple[int, int]], bits: int, mask: int) -> Iterator[int]:
+    """Network ints of every /mask subnet inside ``blocks``, block by block."""
+    step = 1 << (bits - mask)
+    for key, plen in blocks:
+        yield from range(key, key + (1 << (bits - plen)), step)
+
+@instrumented
+async def free_space(db: AsyncSession, prefix_id: str, mask: int) -> list[FreeSpaceOut]:
+    parent = await _get_parent(db, prefix_id)
+    parent_net, blocks = await _load_free_blocks(db, parent, mask)
+    version = parent_net.version
+    return [FreeSpaceOut(cidr=to_cidr(k, mask, version)) for k in _slots(blocks, parent_net.max_prefixlen, mask)]
+
+@instrumented
+async def free_blocks(
+    db: AsyncSession, prefix_id: str, mask: int | None, limit: int, cursor: str | None,
+) -> FreeBlocksPage:
+    parent = await _get_parent(db, prefix_id)
+    parent_net, blocks = await _load_free_blocks(db, parent, mask, start=cursor)
+    version = parent_net.version
+    page = list(islice(blocks, limit + 1))
+    items = [FreeSpaceOut(cidr=to_cidr(k, p, version)) for k, p in page[:limit]]
+    next_cursor = to_addr(page[limit][0], version) if len(page) > limit else None
+    return FreeBlocksPage(items=items, next_cursor=next_cursor)
+
+@instrumented
+@idempotent(list[PrefixOut])
+@with_lock_retry
+async def carve_children(db: AsyncSession, prefix_id: str, body: CarveChildrenIn, idem: str | None) -> list[PrefixOut]:
+    parent = await _get_parent(db, prefix_id)
+    try:
+        rev = await bump_prefix_rev(db, parent.vrf_id)  # lock before reading children
+    except ValidationErr:
+        raise NotFound("parent prefix not found")  # its VRF is gone, and the parent with it
+    # the parent may be a cached snapshot; prefix deletes take the same lock, so this check holds
+    if (await db.execute(select(m.Prefix.id).where(m.Prefix.id == parent.id))).scalar_one_or_none() is None:
+        entity_cache.invalidate("prefix", parent.id)
+        raise NotFound("parent prefix not found")
+    parent_net, blocks = await _load_free_blocks(db, parent, body.mask)
+    if body.strategy == "dense":
+        # best fit: fill the smallest (most fragmented) free blocks first
+        blocks = iter(sorted(blocks, key=lambda b: (-b[1], b[0])))
+
+    version = parent_net.version
+    slots = islice(_slots(blocks, parent_net.max_prefixlen, body.mask), body.count)
+    values = [
+        m.Prefix(vrf_id=parent.vrf_id, cidr=to_cidr(k, body.mask, version), status="active", parent_id=parent.id).model_dump()
+        for k in slots
+    ]
+    if not values:
         raise Conflict("no free sub-prefixes")
 
+    # one multi-row INSERT ... RETURNING instead of a flush/refresh per child
+    rows = (await db.scalars(insert(m.Prefix).returning(m.Prefix, sort_by_parameter_order=True), values)).all()
+    allocated = [PrefixOut.model_validate(r) for r in rows]
+    await adjust_counts(db, parent.id, children=len(rows), addresses=len(rows) << (parent_net.max_prefixlen - body.mask))
+    await changes.record_many(db, [("prefix", "create", a.id, a.vrf_id, a) for a in allocated])
     await db.commit()  # ✅ commit once after allocations
+    prefix_index.apply(parent.vrf_id, rev, added=[_parse_net(a.cidr) for a in allocated])
+    lpm_cache.apply(parent.vrf_id, rev, added=[(a.id, _parse_net(a.cidr), parent.id) for a in allocated])
     return allocated
 
 
@@ -271,12 +500,24 @@ async def carve_children(db: AsyncSession, prefix_id: str, body: CarveChildrenIn
 # IPs
 # -----------------
 
+@instrumented
+@with_lock_retry
 async def create_ip(db: AsyncSession, body: IPCreate) -> IPOut:
-    pfx = await db.get(m.Prefix, body.prefix_id)
+    ip = _canon_ip(body.address)
+    prefix_id = body.prefix_id
+    if prefix_id is None:
+        table = await lpm_cache.current(db, body.vrf_id)
+        if table is None:
+            raise ValidationErr("vrf_id does not exist")
+        prefix_id = table.lookup(ipaddress.ip_address(ip))
+        if prefix_id is None:
+            raise ValidationErr(f"no prefix in the VRF contains {ip}")
+    pfx = await entity_cache.get(db, "prefix", prefix_id)
     if not pfx:
         raise ValidationErr("prefix_id does not exist")
+    if pfx.vrf_id != body.vrf_id:
+        raise ValidationErr("prefix_id belongs to another VRF")
     net = _parse_net(pfx.cidr)
-    ip = _canon_ip(body.address)
     if ipaddress.ip_address(ip) not in net:
         raise ValidationErr(f"{ip} not in {pfx.cidr}")
 
@@ -286,9 +527,10 @@ async def create_ip(db: AsyncSession, body: IPCreate) -> IPOut:
     if dup:
         raise Conflict(f"IP {ip} already exists in VRF")
 
+    rev = await bump_ip_rev(db, pfx.id, ip_delta=1)
     row = m.IPAddress(
         vrf_id=body.vrf_id,
-        prefix_id=body.prefix_id,
+        prefix_id=pfx.id,
         address=ip,
         status=_status_val(body.status) or "active",
         note=body.note or "",
@@ -296,35 +538,83 @@ async def create_ip(db: AsyncSession, body: IPCreate) -> IPOut:
     db.add(row)
     await db.flush()
     await db.refresh(row)
+    out = IPOut.model_validate(row)
+    await changes.record(db, "ip", "create", row.id, row.vrf_id, out)
     await db.commit()  # ✅
-    return IPOut.model_validate(row)
+    host_allocator.apply(pfx.id, rev, taken=[ip])
+    return out
 
-async def allocate_next_ip(db: AsyncSession, prefix_id: str, idem: str | None) -> NextIPOut:
-    pfx = await db.get(m.Prefix, uuid.UUID(prefix_id))
+async def _allocate_hosts(
+    db: AsyncSession, prefix_id: str, count: int, contiguous: bool = False, partial: bool = False,
+) -> list[NextIPOut]:
+    """Take the ``count`` lowest free hosts of a prefix in one transaction.
+
+    With ``partial``, a prefix with fewer than ``count`` (but some) free hosts
+    hands out what it has instead of failing.
+    """
+    pfx = await entity_cache.get(db, "prefix", uuid.UUID(prefix_id))
     if not pfx:
         raise NotFound("prefix not found")
     net = _parse_net(pfx.cidr)
 
-    taken = (await db.execute(select(m.IPAddress.address).where(m.IPAddress.prefix_id == pfx.id))).scalars().all()
-    taken_set = {ipaddress.ip_address(a) for a in taken}
-
-    for host in net.hosts():  # skips network/broadcast for IPv4
-        if host not in taken_set:
-            row = m.IPAddress(vrf_id=pfx.vrf_id, prefix_id=pfx.id, address=str(host), status="active")
-            db.add(row)
-            await db.flush()
-            await db.refresh(row)
-            await db.commit()  # ✅
-            return NextIPOut(id=row.id, address=row.address)
-
-    raise Conflict("no free IPs")
+    rev = await bump_ip_rev(db, pfx.id, ip_delta=count)
+    alloc = await host_allocator.load(db, pfx.id, net, rev - 1)
+    hosts = alloc.lowest_free_n(count, contiguous)  # same order as net.hosts()
+    if not hosts:
+        raise Conflict(f"no {count} consecutive free IPs" if contiguous and count > 1 else "no free IPs")
+    if len(hosts) < count:
+        if not partial:
+            raise Conflict(f"only {len(hosts)} free IPs left", details={"free": len(hosts)})
+        await adjust_counts(db, pfx.id, ips=len(hosts) - count)  # rare: the prefix ran dry
+
+    values = [
+        m.IPAddress(vrf_id=pfx.vrf_id, prefix_id=pfx.id, address=h, status="active").model_dump()
+        for h in hosts
+    ]
+    rows = (await db.execute(
+        insert(m.IPAddress).returning(m.IPAddress.id, m.IPAddress.address, sort_by_parameter_order=True), values,
+    )).all()
+    await changes.record_many(db, [("ip", "create", v["id"], v["vrf_id"], changes.snapshot(IPOut, v)) for v in values])
+    await db.commit()  # ✅
+    host_allocator.apply(pfx.id, rev, taken=hosts)
+    return [NextIPOut(id=id, address=address) for id, address in rows]
+
+@instrumented
+@with_lock_retry
+async def _allocate_next_ip_batch(db: AsyncSession, prefix_id: str, n: int) -> list[NextIPOut]:
+    return await _allocate_hosts(db, prefix_id, n, partial=True)
+
+# concurrent next-IP calls on one prefix share a transaction instead of queueing on its row lock
+next_ip_coalescer: Coalescer[NextIPOut] = Coalescer(
+    "allocate_next_ip",
+    _allocate_next_ip_batch,
+    exhausted=lambda: Conflict("no free IPs"),
+    window_s=settings.next_ip_coalesce_window_ms / 1000,
+    max_batch=settings.next_ip_coalesce_max_batch,
+)
 
+@instrumented
+@idempotent(NextIPOut)
+async def allocate_next_ip(db: AsyncSession, prefix_id: str, idem: str | None) -> NextIPOut:
+    # a keyed call must commit on ``db``, where the idempotency claim is marked in the same transaction
+    if settings.next_ip_coalesce and not idem:
+        return await next_ip_coalescer.submit(prefix_id)
+    return (await _allocate_next_ip_batch(db, prefix_id, 1))[0]
+
+@instrumented
+@idempotent(list[NextIPOut])
+@with_lock_retry
+async def allocate_next_ips(db: AsyncSession, prefix_id: str, body: NextIPBatchIn, idem: str | None) -> list[NextIPOut]:
+    return await _allocate_hosts(db, prefix_id, body.count, body.contiguous)
+
+@instrumented
 async def get_ip(db: AsyncSession, ip_id: str) -> IPOut:
     row = await db.get(m.IPAddress, uuid.UUID(ip_id))
     if not row:
         raise NotFound("ip not found")
     return IPOut.model_validate(row)
 
+@instrumented
 async def list_ips(
     db: AsyncSession,
     vrf_id: str | None,
@@ -333,6 +623,10 @@ async def list_ips(
     address: str | None,
     limit: int,
     offset: int,
+    within: str | None = None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    estimate_total: bool = False,
 ) -> Page[IPOut]:
     stmt = select(m.IPAddress)
     if vrf_id:
@@ -343,11 +637,11 @@ async def list_ips(
         stmt = stmt.where(m.IPAddress.status == _status_val(status))
     if address:
         stmt = stmt.where(m.IPAddress.address == _canon_ip(address))
+    if within:
+        stmt = stmt.where(m.IPAddress.address.op("<<=")(_canon_net(within)))
+    return await _paginate(db, stmt, m.IPAddress, IPOut, limit, offset, cursor, include_total, estimate_total)
 
-    total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
-    rows = (await db.execute(stmt.order_by(m.IPAddress.created_at.desc()).limit(limit).offset(offset))).scalars().all()
-    return Page[IPOut](items=[IPOut.model_validate(r) for r in rows], total=total, limit=limit, offset=offset)
-
+@instrumented
 async def update_ip(db: AsyncSession, ip_id: str, body: IPUpdate) -> IPOut:
     row = await db.get(m.IPAddress, uuid.UUID(ip_id))
     if not row:
@@ -358,12 +652,19 @@ async def update_ip(db: AsyncSession, ip_id: str, body: IPUpdate) -> IPOut:
         row.note = body.note
     await db.flush()
     await db.refresh(row)
+    out = IPOut.model_validate(row)
+    await changes.record(db, "ip", "update", row.id, row.vrf_id, out)
     await db.commit()  # ✅
-    return IPOut.model_validate(row)
+    return out
 
+@instrumented
+@with_lock_retry
 async def delete_ip(db: AsyncSession, ip_id: str) -> None:
     row = await db.get(m.IPAddress, uuid.UUID(ip_id))
     if not row:
         return
+    rev = await bump_ip_rev(db, row.prefix_id, ip_delta=-1)
     await db.delete(row)
+    await changes.record(db, "ip", "delete", row.id, row.vrf_id)
     await db.commit()  # ✅
+    host_allocator.apply(row.prefix_id, rev, freed=[row.address])
@@ -0,0 +1,68 @@
+# app/services/locks.py
+from __future__ import annotations
+
+import asyncio
+import functools
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.errors import Conflict
+from app.core.metrics import lock_giveups_total, lock_retries_total, lock_wait_seconds
+from app.core.settings import settings
+
+T = TypeVar("T")
+
+# SQLSTATEs worth re-running the whole transaction for
+_RETRYABLE = {"55P03": "lock_timeout", "40P01": "deadlock", "40001": "serialization"}
+
+
+def _retry_reason(e: DBAPIError) -> Optional[str]:
+    return _RETRYABLE.get(getattr(e.orig, "sqlstate", None) or "")
+
+
+@asynccontextmanager
+async def locking(db: AsyncSession, lock: str) -> AsyncIterator[None]:
+    """Bound and time the lock-taking statement(s) run inside the block.
+
+    ``lock_timeout`` is set for the rest of the transaction, so a writer stuck
+    behind a long transaction fails fast and ``with_lock_retry`` re-runs it.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(text(f"SET LOCAL lock_timeout = {int(settings.lock_timeout_ms)}"))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        lock_wait_seconds.labels(lock=lock).observe(time.perf_counter() - start)
+
+
+def with_lock_retry(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Re-run a service call (first arg: the session) on lock timeout or deadlock.
+
+    The session is rolled back between attempts; in-process caches are only
+    touched after commit, so a failed attempt leaves nothing behind.
+    """
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs) -> T:
+        for attempt in range(settings.lock_retries + 1):
+            try:
+                return await fn(db, *args, **kwargs)
+            except DBAPIError as e:
+                reason = _retry_reason(e)
+                if reason is None:
+                    raise
+                await db.rollback()
+                if attempt == settings.lock_retries:
+                    lock_giveups_total.labels(op=fn.__name__).inc()
+                    raise Conflict("resource is busy; retry later", details={"reason": reason, "attempts": attempt + 1})
+                lock_retries_total.labels(op=fn.__name__, reason=reason).inc()
+                backoff = settings.lock_retry_backoff_ms / 1000 * (2 ** attempt)
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+        raise AssertionError("unreachable")
+    return wrapper
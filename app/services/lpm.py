@@ -0,0 +1,221 @@
+# app/services/lpm.py
+from __future__ import annotations
+
+import ipaddress
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Mapping, Optional
+
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import LookupOut
+from app.core.errors import NotFound, ValidationErr
+from app.core.instrumentation import instrumented
+from app.core.metrics import index_rebuild_rows
+from app.core.settings import settings
+from app.db import models as m
+from app.services.ranges import to_cidr
+
+_BITS = {4: 32, 6: 128}
+
+
+def _mask(version: int, plen: int) -> int:
+    bits = _BITS[version]
+    return ((1 << bits) - 1) ^ ((1 << (bits - plen)) - 1)
+
+
+async def _prefix_rev(db: AsyncSession, vrf_id: uuid.UUID) -> Optional[int]:
+    return (await db.execute(select(m.VRF.prefix_rev).where(m.VRF.id == vrf_id))).scalar_one_or_none()
+
+
+class VrfLpmTable:
+    """Longest-prefix match over every prefix of one VRF, whatever its status.
+
+    One hash table per prefix length and family; a lookup probes the lengths
+    present, longest first, so it costs at most 33 (IPv4) or 129 (IPv6)
+    dict hits. When several prefixes share a CIDR the newest wins, which is
+    the deepest one when a child was carved at its parent's own mask.
+    """
+
+    def __init__(self, rev: int):
+        self.rev = rev
+        self.tables: dict[int, dict[int, dict[int, list[uuid.UUID]]]] = {4: {}, 6: {}}  # version -> plen -> key -> ids
+        self.lengths: dict[int, list[int]] = {4: [], 6: []}  # present lengths, longest first
+        self.entries: dict[uuid.UUID, tuple[int, int, int, Optional[uuid.UUID]]] = {}  # id -> (version, key, plen, parent)
+        self.children: dict[Optional[uuid.UUID], set[uuid.UUID]] = {}
+
+    def add(self, id: uuid.UUID, net: ipaddress._BaseNetwork, parent_id: Optional[uuid.UUID]) -> None:  # type: ignore[name-defined]
+        v, key, plen = net.version, int(net.network_address), net.prefixlen
+        by_len = self.tables[v]
+        if plen not in by_len:
+            by_len[plen] = {}
+            self.lengths[v] = sorted(by_len, reverse=True)
+        by_len[plen].setdefault(key, []).append(id)
+        self.entries[id] = (v, key, plen, parent_id)
+        self.children.setdefault(parent_id, set()).add(id)
+
+    def remove(self, id: uuid.UUID) -> None:
+        entry = self.entries.pop(id, None)
+        if entry is None:
+            return
+        v, key, plen, parent_id = entry
+        by_key = self.tables[v][plen]
+        by_key[key].remove(id)
+        if not by_key[key]:
+            del by_key[key]
+            if not by_key:
+                del self.tables[v][plen]
+                self.lengths[v] = sorted(self.tables[v], reverse=True)
+        self.children.get(parent_id, set()).discard(id)
+
+    def reparent(self, id: uuid.UUID, parent_id: Optional[uuid.UUID]) -> None:
+        v, key, plen, old = self.entries[id]
+        self.children.get(old, set()).discard(id)
+        self.children.setdefault(parent_id, set()).add(id)
+        self.entries[id] = (v, key, plen, parent_id)
+
+    def match(self, version: int, addr: int, max_plen: Optional[int] = None) -> Optional[tuple[int, uuid.UUID]]:
+        """(plen, id) of the longest prefix containing ``addr``, at most ``max_plen`` long."""
+        by_len = self.tables[version]
+        for plen in self.lengths[version]:
+            if max_plen is not None and plen > max_plen:
+                continue
+            ids = by_len[plen].get(addr & _mask(version, plen))
+            if ids:
+                return plen, ids[-1]
+        return None
+
+    def lookup(self, ip: ipaddress._BaseAddress) -> Optional[uuid.UUID]:  # type: ignore[name-defined]
+        """The most specific prefix containing ``ip``."""
+        hit = self.match(ip.version, int(ip))
+        return hit[1] if hit else None
+
+    def parent_of(self, net: ipaddress._BaseNetwork) -> Optional[uuid.UUID]:  # type: ignore[name-defined]
+        """The prefix a new ``net`` nests under: the most specific one containing or equal to it."""
+        hit = self.match(net.version, int(net.network_address), net.prefixlen)
+        return hit[1] if hit else None
+
+    def children_within(self, parent_id: Optional[uuid.UUID], net: ipaddress._BaseNetwork) -> list[uuid.UUID]:  # type: ignore[name-defined]
+        """Children of ``parent_id`` that ``net`` covers, i.e. the ones a new ``net`` should adopt."""
+        v, key, plen = net.version, int(net.network_address), net.prefixlen
+        mask = _mask(v, plen)
+        out = []
+        for cid in self.children.get(parent_id, ()):
+            cv, ckey, cplen, _ = self.entries[cid]
+            if cv == v and cplen >= plen and ckey & mask == key:
+                out.append(cid)
+        return out
+
+    def cidr(self, id: uuid.UUID) -> str:
+        v, key, plen, _ = self.entries[id]
+        return to_cidr(key, plen, v)
+
+
+class LpmCache:
+    """Process-local, LRU-bounded map of VRF id -> VrfLpmTable.
+
+    Stamped with ``VRF.prefix_rev`` exactly like ``radix.PrefixIndexCache``;
+    every prefix writer bumps that rev, and must ``apply`` after commit.
+    """
+
+    def __init__(self, max_vrfs: int):
+        self.max_vrfs = max_vrfs
+        self._tables: OrderedDict[uuid.UUID, VrfLpmTable] = OrderedDict()
+
+    async def load(self, db: AsyncSession, vrf_id: uuid.UUID, rev: int) -> VrfLpmTable:
+        """Return the table for ``vrf_id`` as of ``rev``, rebuilding from the DB if stale.
+
+        For writers holding the VRF lock (``bump_prefix_rev``), loading before they write.
+        """
+        table = self._tables.get(vrf_id)
+        if table is not None and table.rev == rev:
+            self._tables.move_to_end(vrf_id)
+            return table
+        table = await self._build(db, vrf_id, rev)
+        self._store(vrf_id, table)
+        return table
+
+    async def current(self, db: AsyncSession, vrf_id: uuid.UUID) -> Optional[VrfLpmTable]:
+        """Lock-free read of the VRF's committed table; None if the VRF doesn't exist.
+
+        A rebuild is cached only if ``prefix_rev`` didn't move while it ran,
+        since without the lock the rows may belong to a later rev.
+        """
+        rev = await _prefix_rev(db, vrf_id)
+        if rev is None:
+            return None
+        table = self._tables.get(vrf_id)
+        if table is not None and table.rev == rev:
+            self._tables.move_to_end(vrf_id)
+            return table
+        table = await self._build(db, vrf_id, rev)
+        if await _prefix_rev(db, vrf_id) == rev:
+            self._store(vrf_id, table)
+        return table
+
+    async def _build(self, db: AsyncSession, vrf_id: uuid.UUID, rev: int) -> VrfLpmTable:
+        rows = (await db.execute(
+            select(m.Prefix.id, m.Prefix.cidr, m.Prefix.parent_id)
+            .where(m.Prefix.vrf_id == vrf_id)
+            .order_by(m.Prefix.created_at, m.Prefix.id)
+        )).all()
+        index_rebuild_rows.labels(index="lpm").observe(len(rows))
+        table = VrfLpmTable(rev)
+        for id, cidr, parent_id in rows:
+            table.add(id, ipaddress.ip_network(cidr), parent_id)
+        return table
+
+    def apply(
+        self,
+        vrf_id: uuid.UUID,
+        rev: int,
+        added: Iterable[tuple[uuid.UUID, ipaddress._BaseNetwork, Optional[uuid.UUID]]] = (),  # type: ignore[name-defined]
+        removed: Iterable[uuid.UUID] = (),
+        reparented: Mapping[uuid.UUID, Optional[uuid.UUID]] | None = None,
+    ) -> None:
+        """Apply a committed change that moved the VRF from ``rev - 1`` to ``rev``."""
+        table = self._tables.get(vrf_id)
+        if table is None or table.rev >= rev:
+            return
+        if table.rev != rev - 1:
+            self.invalidate(vrf_id)
+            return
+        for id in removed:
+            table.remove(id)
+        for id, net, parent_id in added:
+            table.add(id, net, parent_id)
+        for id, parent_id in (reparented or {}).items():
+            table.reparent(id, parent_id)
+        table.rev = rev
+
+    def invalidate(self, vrf_id: uuid.UUID) -> None:
+        self._tables.pop(vrf_id, None)
+
+    def _store(self, vrf_id: uuid.UUID, table: VrfLpmTable) -> None:
+        self._tables[vrf_id] = table
+        self._tables.move_to_end(vrf_id)
+        while len(self._tables) > self.max_vrfs:
+            self._tables.popitem(last=False)
+
+
+lpm_cache = LpmCache(settings.prefix_index_max_vrfs)
+
+
+@instrumented
+async def lookup(db: AsyncSession, vrf_id: str, ips: list[str]) -> list[LookupOut]:
+    """Longest-prefix match for each address, in request order."""
+    addrs = []
+    for i, s in enumerate(ips):
+        try:
+            addrs.append(ipaddress.ip_address(s.strip()))
+        except ValueError as e:
+            raise ValidationErr(f"item {i}: invalid IP address {s!r}", details={"index": i, "error": str(e)})
+    table = await lpm_cache.current(db, uuid.UUID(vrf_id))
+    if table is None:
+        raise NotFound("vrf not found")
+    out = []
+    for ip in addrs:
+        pid = table.lookup(ip)
+        out.append(LookupOut(ip=str(ip), prefix_id=pid, cidr=table.cidr(pid) if pid else None))
+    return out
@@ -0,0 +1,253 @@
+# app/services/radix.py
+from __future__ import annotations
+
+import ipaddress
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlmodel import select
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.errors import ValidationErr
+from app.core.metrics import index_rebuild_rows
+from app.core.settings import settings
+from app.db import models as m
+from app.services.locks import locking
+from app.services.ranges import to_cidr
+
+# prefixes in these states may not overlap each other inside a VRF
+OVERLAP_STATUSES = frozenset({"active", "reserved"})
+
+
+async def bump_prefix_rev(db: AsyncSession, vrf_id: uuid.UUID) -> int:
+    """Bump ``VRF.prefix_rev`` and return the new value.
+
+    Row-locks the VRF until commit, serializing overlap-relevant prefix writers.
+    """
+    async with locking(db, "vrf"):
+        rev = (await db.execute(
+            update(m.VRF)
+            .where(m.VRF.id == vrf_id)
+            .values(prefix_rev=m.VRF.prefix_rev + 1)
+            .returning(m.VRF.prefix_rev)
+            .execution_options(synchronize_session=False)
+        )).scalar_one_or_none()
+    if rev is None:
+        raise ValidationErr("vrf_id does not exist")
+    return rev
+
+
+class _Node:
+    __slots__ = ("key", "plen", "here", "total", "kids")
+
+    def __init__(self, key: int, plen: int):
+        self.key = key      # network address as int, host bits zeroed
+        self.plen = plen
+        self.here = 0       # entries stored exactly at this prefix
+        self.total = 0      # entries in this subtree (including here)
+        self.kids: list[Optional[_Node]] = [None, None]
+
+
+class PrefixTrie:
+    """Path-compressed binary radix trie over one address family.
+
+    Entries are counted, so the same CIDR may be stored more than once (a
+    carved child can share space with its active parent). Every operation
+    walks at most one node per prefix bit.
+    """
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = _Node(0, 0)
+
+    def __len__(self) -> int:
+        return self.root.total
+
+    def _bit(self, key: int, i: int) -> int:
+        return (key >> (self.bits - 1 - i)) & 1
+
+    def _common(self, a: int, b: int, limit: int) -> int:
+        x = a ^ b
+        if not x:
+            return limit
+        return min(self.bits - x.bit_length(), limit)
+
+    def _mask(self, key: int, plen: int) -> int:
+        return key & ~((1 << (self.bits - plen)) - 1)
+
+    def insert(self, key: int, plen: int) -> None:
+        node = self.root
+        path = [node]
+        while node.plen != plen:
+            b = self._bit(key, node.plen)
+            child = node.kids[b]
+            if child is None:
+                leaf = _Node(key, plen)
+                leaf.here = leaf.total = 1
+                node.kids[b] = leaf
+                break
+            c = self._common(child.key, key, min(child.plen, plen))
+            if c == child.plen:
+                node = child
+                path.append(node)
+                continue
+            if c == plen:
+                # new entry sits between node and child
+                mid = _Node(key, plen)
+                mid.here = 1
+            else:
+                mid = _Node(self._mask(key, c), c)
+                leaf = _Node(key, plen)
+                leaf.here = leaf.total = 1
+                mid.kids[self._bit(key, c)] = leaf
+            mid.kids[self._bit(child.key, c)] = child
+            mid.total = child.total + 1
+            node.kids[b] = mid
+            break
+        else:
+            node.here += 1
+            node.total += 1
+            path.pop()
+        for n in path:
+            n.total += 1
+
+    def remove(self, key: int, plen: int) -> bool:
+        node = self.root
+        path: list[tuple[_Node, int]] = []
+        while node.plen != plen:
+            b = self._bit(key, node.plen)
+            child = node.kids[b]
+            if child is None or self._common(child.key, key, min(child.plen, plen)) < child.plen:
+                return False
+            path.append((node, b))
+            node = child
+        if node.here == 0:
+            return False
+        node.here -= 1
+        node.total -= 1
+        for n, _ in path:
+            n.total -= 1
+        if path and node.here == 0:
+            parent, b = path[-1]
+            live = [k for k in node.kids if k is not None]
+            if not live:
+                parent.kids[b] = None
+            elif len(live) == 1:
+                parent.kids[b] = live[0]
+            # parent may now be a pass-through node with a single child
+            if len(path) > 1 and parent.here == 0:
+                live = [k for k in parent.kids if k is not None]
+                if len(live) <= 1:
+                    grand, gb = path[-2]
+                    grand.kids[gb] = live[0] if live else None
+        return True
+
+    def find_overlap(self, key: int, plen: int) -> Optional[tuple[int, int]]:
+        """Return (key, plen) of some stored entry overlapping the query, or None."""
+        node = self.root
+        while True:
+            if node.here:
+                return node.key, node.plen
+            if node.plen >= plen:
+                return self._any_entry(node) if node.total else None
+            child = node.kids[self._bit(key, node.plen)]
+            if child is None:
+                return None
+            limit = min(child.plen, plen)
+            if self._common(child.key, key, limit) < limit:
+                return None
+            node = child
+
+    def _any_entry(self, node: _Node) -> tuple[int, int]:
+        while not node.here:
+            node = next(k for k in node.kids if k is not None and k.total)
+        return node.key, node.plen
+
+
+def _to_key(net: ipaddress._BaseNetwork) -> tuple[int, int, int]:  # type: ignore[name-defined]
+    return net.version, int(net.network_address), net.prefixlen
+
+
+class VrfPrefixIndex:
+    """Overlap index for one VRF: active/reserved prefixes, one trie per family."""
+
+    def __init__(self, rev: int):
+        self.rev = rev
+        self.tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+
+    def add(self, net: ipaddress._BaseNetwork) -> None:  # type: ignore[name-defined]
+        version, key, plen = _to_key(net)
+        self.tries[version].insert(key, plen)
+
+    def discard(self, net: ipaddress._BaseNetwork) -> None:  # type: ignore[name-defined]
+        version, key, plen = _to_key(net)
+        self.tries[version].remove(key, plen)
+
+    def find_overlap(self, net: ipaddress._BaseNetwork) -> Optional[str]:  # type: ignore[name-defined]
+        version, key, plen = _to_key(net)
+        hit = self.tries[version].find_overlap(key, plen)
+        return to_cidr(*hit, version) if hit else None
+
+
+class PrefixIndexCache:
+    """Process-local, LRU-bounded map of VRF id -> VrfPrefixIndex.
+
+    Each index is stamped with the VRF's ``prefix_rev``. Writers bump that
+    column in the same transaction as their prefix change, so an index built
+    by this worker is reused only while no other worker has committed since.
+    """
+
+    def __init__(self, max_vrfs: int):
+        self.max_vrfs = max_vrfs
+        self._indexes: OrderedDict[uuid.UUID, VrfPrefixIndex] = OrderedDict()
+
+    async def load(self, db: AsyncSession, vrf_id: uuid.UUID, rev: int) -> VrfPrefixIndex:
+        """Return the index for ``vrf_id`` as of ``rev``, rebuilding from the DB if stale."""
+        idx = self._indexes.get(vrf_id)
+        if idx is not None and idx.rev == rev:
+            self._indexes.move_to_end(vrf_id)
+            return idx
+        cidrs = (await db.execute(
+            select(m.Prefix.cidr).where(m.Prefix.vrf_id == vrf_id, m.Prefix.status.in_(OVERLAP_STATUSES))
+        )).scalars().all()
+        index_rebuild_rows.labels(index="prefixes").observe(len(cidrs))
+        idx = VrfPrefixIndex(rev)
+        for c in cidrs:
+            idx.add(ipaddress.ip_network(c))
+        self._store(vrf_id, idx)
+        return idx
+
+    def apply(
+        self,
+        vrf_id: uuid.UUID,
+        rev: int,
+        added: Iterable[ipaddress._BaseNetwork] = (),  # type: ignore[name-defined]
+        removed: Iterable[ipaddress._BaseNetwork] = (),  # type: ignore[name-defined]
+    ) -> None:
+        """Apply a committed change that moved the VRF from ``rev - 1`` to ``rev``."""
+        idx = self._indexes.get(vrf_id)
+        if idx is None or idx.rev >= rev:
+            return
+        if idx.rev != rev - 1:
+            # missed someone else's commit; rebuild lazily on next use
+            self.invalidate(vrf_id)
+            return
+        for net in removed:
+            idx.discard(net)
+        for net in added:
+            idx.add(net)
+        idx.rev = rev
+
+    def invalidate(self, vrf_id: uuid.UUID) -> None:
+        self._indexes.pop(vrf_id, None)
+
+    def _store(self, vrf_id: uuid.UUID, idx: VrfPrefixIndex) -> None:
+        self._indexes[vrf_id] = idx
+        self._indexes.move_to_end(vrf_id)
+        while len(self._indexes) > self.max_vrfs:
+            self._indexes.popitem(last=False)
+
+
+prefix_index = PrefixIndexCache(settings.prefix_index_max_vrfs)
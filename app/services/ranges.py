@@ -0,0 +1,56 @@
+# app/services/ranges.py
+from __future__ import annotations
+
+import ipaddress
+import socket
+from typing import Iterable, Iterator
+
+
+def net_range(net: ipaddress._BaseNetwork) -> tuple[int, int]:  # type: ignore[name-defined]
+    """Inclusive [first, last] address range of a network as ints."""
+    return int(net.network_address), int(net.broadcast_address)
+
+
+def gaps(lo: int, hi: int, used: Iterable[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """Yield the inclusive sub-ranges of [lo, hi] not covered by any ``used`` range.
+
+    ``used`` may overlap and be in any order; anything outside [lo, hi] is ignored.
+    """
+    cur = lo
+    for s, e in sorted(used):
+        if e < cur:
+            continue
+        if s > hi:
+            break
+        if s > cur:
+            yield cur, s - 1
+        cur = e + 1
+        if cur > hi:
+            return
+    if cur <= hi:
+        yield cur, hi
+
+
+def cidr_blocks(start: int, end: int, bits: int) -> Iterator[tuple[int, int]]:
+    """Split [start, end] into the largest aligned blocks, as (network int, prefixlen).
+
+    Greedy from the left, so restarting at any emitted block's start yields the
+    same remaining blocks.
+    """
+    while start <= end:
+        # largest power of two that start is aligned to and that still fits
+        align = (start & -start) if start else 1 << bits
+        size = min(align, 1 << ((end - start + 1).bit_length() - 1))
+        yield start, bits - (size.bit_length() - 1)
+        start += size
+
+
+def to_addr(key: int, version: int) -> str:
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, key.to_bytes(4))  # ~5x faster than IPv4Address
+    # ipaddress, not inet_ntop: libc renders e.g. v4-mapped addresses differently
+    return str(ipaddress.IPv6Address(key))
+
+
+def to_cidr(key: int, plen: int, version: int) -> str:
+    return f"{to_addr(key, version)}/{plen}"
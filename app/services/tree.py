@@ -0,0 +1,80 @@
+# app/services/tree.py
+from __future__ import annotations
+
+import json
+import uuid
+from typing import AsyncIterator, Optional
+
+from sqlmodel import select
+from sqlalchemy import and_, exists, literal
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import PrefixTreeNode, PrefixTreeRow
+from app.core.deps import SessionLocal
+from app.core.errors import NotFound, ValidationErr
+from app.core.instrumentation import instrumented
+from app.core.settings import settings
+from app.db import models as m
+
+_COLS = (m.Prefix.id, m.Prefix.vrf_id, m.Prefix.cidr, m.Prefix.status, m.Prefix.description,
+         m.Prefix.parent_id, m.Prefix.created_at)
+
+
+def _subtree(root_id: uuid.UUID, depth: Optional[int]):
+    """One recursive CTE for the subtree under ``root_id``, parents before children.
+
+    Rows come out breadth-first, ordered by (depth, cidr), so every node
+    follows its parent. ``depth`` bounds the recursion (0 = just the root);
+    without one it stops at ``tree_max_depth``, which also stops a parent_id
+    cycle from recursing forever, and nodes there that have children are
+    flagged ``truncated`` rather than silently cut.
+    """
+    if depth is not None and depth > settings.tree_max_depth:
+        raise ValidationErr(f"depth must be at most {settings.tree_max_depth}")
+    limit = depth if depth is not None else settings.tree_max_depth
+    tree = select(*_COLS, literal(0).label("depth")).where(m.Prefix.id == root_id).cte("subtree", recursive=True)
+    tree = tree.union_all(
+        select(*_COLS, (tree.c.depth + 1).label("depth"))
+        .join(tree, m.Prefix.parent_id == tree.c.id)
+        .where(tree.c.depth < limit)
+    )
+    if depth is None:
+        child = aliased(m.Prefix)
+        truncated = and_(tree.c.depth == limit, exists().where(child.parent_id == tree.c.id))
+    else:
+        truncated = literal(False)
+    return select(tree, truncated.label("truncated")).order_by(tree.c.depth, tree.c.cidr)
+
+
+@instrumented
+async def get_prefix_tree(db: AsyncSession, prefix_id: str, depth: Optional[int]) -> PrefixTreeNode:
+    """The subtree as nested nodes, built from a single query."""
+    rows = (await db.execute(_subtree(uuid.UUID(prefix_id), depth).limit(settings.tree_max_nodes + 1))).all()
+    if not rows:
+        raise NotFound("prefix not found")
+    if len(rows) > settings.tree_max_nodes:
+        raise ValidationErr(
+            f"subtree has more than {settings.tree_max_nodes} prefixes; lower depth or use stream=true",
+        )
+    nodes: dict[uuid.UUID, PrefixTreeNode] = {}
+    for r in rows:
+        node = PrefixTreeNode.model_validate(r._asdict())
+        nodes[node.id] = node
+        if r.depth:
+            nodes[r.parent_id].children.append(node)  # parent came earlier: rows are breadth-first
+    return nodes[rows[0].id]
+
+
+async def stream_prefix_tree(prefix_id: uuid.UUID, depth: Optional[int]) -> AsyncIterator[bytes]:
+    """NDJSON, one PrefixTreeRow per line, parents before children.
+
+    Streams off a server-side cursor on its own session (the request's is
+    closed by the time the body is sent), so memory stays flat for any size.
+    """
+    async with SessionLocal() as db:
+        result = await db.stream(_subtree(prefix_id, depth).execution_options(yield_per=settings.export_batch_size))
+        async for part in result.partitions():
+            yield "".join(
+                PrefixTreeRow.model_validate(r._asdict()).model_dump_json() + "\n" for r in part
+            ).encode()
@@ -0,0 +1,171 @@
+# app/services/utilization.py
+from __future__ import annotations
+
+import ipaddress
+import uuid
+from decimal import Decimal
+from typing import Optional
+
+from sqlmodel import select
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import PrefixUtilizationOut, RepairReport, VrfUtilizationOut
+from app.core.errors import NotFound
+from app.core.instrumentation import instrumented
+from app.db import models as m
+from app.services.allocator import host_bounds
+from app.services.locks import locking
+
+# Prefix.ip_count / child_count / child_addresses are maintained by the writers:
+#   create_ip, delete_ip, allocate_next_ip(s)  -> ip_count (in bump_ip_rev's UPDATE)
+#   carve_children, delete_prefix              -> child_count, child_addresses of the parent
+#   create_prefix                              -> all three, of the new prefix and its parent
+#   bulk IP / prefix import                    -> ip_count / child counters, one executemany per chunk
+# Only direct children (parent_id) count; repair_utilization fixes any drift.
+
+
+async def adjust_counts(
+    db: AsyncSession, prefix_id: uuid.UUID, ips: int = 0, children: int = 0, addresses: int = 0,
+) -> None:
+    """Move a prefix's counters inside the caller's transaction."""
+    await db.execute(
+        update(m.Prefix)
+        .where(m.Prefix.id == prefix_id)
+        .values(
+            ip_count=m.Prefix.ip_count + ips,
+            child_count=m.Prefix.child_count + children,
+            child_addresses=m.Prefix.child_addresses + Decimal(addresses),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def add_ip_counts(db: AsyncSession, deltas: dict[uuid.UUID, int]) -> None:
+    """``adjust_counts(ips=...)`` for many prefixes in one executemany."""
+    if not deltas:
+        return
+    t = m.Prefix.__table__  # Core UPDATE: the ORM form would want a primary key per row
+    await db.execute(
+        update(t).where(t.c.id == bindparam("pid")).values(ip_count=t.c.ip_count + bindparam("n")),
+        [{"pid": pid, "n": n} for pid, n in deltas.items()],
+    )
+
+async def add_child_counts(db: AsyncSession, deltas: dict[uuid.UUID, tuple[int, int]]) -> None:
+    """``adjust_counts(children=..., addresses=...)`` for many prefixes in one executemany."""
+    if not deltas:
+        return
+    t = m.Prefix.__table__
+    await db.execute(
+        update(t).where(t.c.id == bindparam("pid")).values(
+            child_count=t.c.child_count + bindparam("n"),
+            child_addresses=t.c.child_addresses + bindparam("a", type_=t.c.child_addresses.type),
+        ),
+        [{"pid": pid, "n": n, "a": Decimal(a)} for pid, (n, a) in deltas.items()],
+    )
+
+
+def _ratio(part: int, whole: int) -> float:
+    return round(part / whole, 6) if whole else 0.0
+
+@instrumented
+async def get_prefix_utilization(db: AsyncSession, prefix_id: str) -> PrefixUtilizationOut:
+    row = (await db.execute(
+        select(m.Prefix.cidr, m.Prefix.ip_count, m.Prefix.child_count, m.Prefix.child_addresses)
+        .where(m.Prefix.id == uuid.UUID(prefix_id))
+    )).one_or_none()
+    if row is None:
+        raise NotFound("prefix not found")
+    cidr, ips, children, covered = row
+    net = ipaddress.ip_network(cidr)
+    first, last = host_bounds(net)
+    capacity = last - first + 1
+    covered = int(covered)
+    return PrefixUtilizationOut(
+        prefix_id=uuid.UUID(prefix_id),
+        cidr=cidr,
+        total_addresses=net.num_addresses,
+        host_capacity=capacity,
+        ip_count=ips,
+        ip_utilization=_ratio(ips, capacity),
+        child_count=children,
+        child_addresses=covered,
+        child_utilization=_ratio(covered, net.num_addresses),
+    )
+
+@instrumented
+async def get_vrf_utilization(db: AsyncSession, vrf_id: str) -> VrfUtilizationOut:
+    """Prefix and IP counts for the VRF, summed from its prefix rows.
+
+    O(prefixes in the VRF), not O(1): there is no VRF-level counter, since
+    one would put every IP write in the VRF behind a single row lock. It
+    reports no covered or address utilization; read those per prefix.
+    """
+    vid = uuid.UUID(vrf_id)
+    if not await db.get(m.VRF, vid):
+        raise NotFound("vrf not found")
+    rows = (await db.execute(
+        select(m.Prefix.status, func.count(), func.coalesce(func.sum(m.Prefix.ip_count), 0))
+        .where(m.Prefix.vrf_id == vid)
+        .group_by(m.Prefix.status)
+    )).all()
+    return VrfUtilizationOut(
+        vrf_id=vid,
+        prefix_count=sum(n for _, n, _ in rows),
+        ip_count=sum(int(ips) for _, _, ips in rows),
+        prefixes_by_status={status: n for status, n, _ in rows},
+    )
+
+@instrumented
+async def repair_utilization(
+    db: AsyncSession, vrf_id: Optional[str] = None, batch_size: int = 500,
+) -> RepairReport:
+    """Recompute every prefix's counters from scratch, ``batch_size`` prefixes per transaction.
+
+    Each batch row-locks its prefixes first, so writers that touch them wait
+    rather than race the recount.
+    """
+    scanned = fixed = 0
+    after: Optional[uuid.UUID] = None
+    while True:
+        stmt = select(m.Prefix.id).order_by(m.Prefix.id).limit(batch_size)
+        if vrf_id:
+            stmt = stmt.where(m.Prefix.vrf_id == uuid.UUID(vrf_id))
+        if after is not None:
+            stmt = stmt.where(m.Prefix.id > after)
+        async with locking(db, "prefix"):
+            ids = (await db.execute(stmt.with_for_update())).scalars().all()
+        if not ids:
+            break
+        after = ids[-1]
+
+        stored = {
+            pid: (ips, kids, int(covered))
+            for pid, ips, kids, covered in (await db.execute(
+                select(m.Prefix.id, m.Prefix.ip_count, m.Prefix.child_count, m.Prefix.child_addresses)
+                .where(m.Prefix.id.in_(ids))
+            )).all()
+        }
+        ips = dict((await db.execute(
+            select(m.IPAddress.prefix_id, func.count()).where(m.IPAddress.prefix_id.in_(ids)).group_by(m.IPAddress.prefix_id)
+        )).all())
+        kids: dict[uuid.UUID, list[int]] = {}
+        for parent_id, cidr in (await db.execute(
+            select(m.Prefix.parent_id, m.Prefix.cidr).where(m.Prefix.parent_id.in_(ids))
+        )).all():
+            k = kids.setdefault(parent_id, [0, 0])
+            k[0] += 1
+            k[1] += ipaddress.ip_network(cidr).num_addresses
+
+        for pid in ids:
+            actual = (ips.get(pid, 0), *kids.get(pid, (0, 0)))
+            if stored[pid] != actual:
+                fixed += 1
+                await db.execute(
+                    update(m.Prefix)
+                    .where(m.Prefix.id == pid)
+                    .values(ip_count=actual[0], child_count=actual[1], child_addresses=Decimal(actual[2]))
+                    .execution_options(synchronize_session=False)
+                )
+        await db.commit()
+        scanned += len(ids)
+    return RepairReport(scanned=scanned, fixed=fixed)
@@ -0,0 +1,36 @@
+-- Bring a database created before the rev columns, utilization counters and
+-- native network types up to the current models. Run it once, then start the
+-- app (or `python -m app.db.bootstrap`) to record the new schema version;
+-- the bootstrap refuses to record it while any of this is missing.
+BEGIN;
+
+-- network columns were text; the gist indexes below need cidr/inet
+ALTER TABLE prefix ALTER COLUMN cidr TYPE cidr USING cidr::cidr;
+ALTER TABLE ipaddress ALTER COLUMN address TYPE inet USING address::inet;
+
+-- cache stamps: the prefix index/LPM cache per VRF, the host allocator per prefix
+ALTER TABLE vrf ADD COLUMN prefix_rev INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE prefix ADD COLUMN ip_rev INTEGER NOT NULL DEFAULT 0;
+
+-- utilization counters; start at zero, backfilled below
+ALTER TABLE prefix ADD COLUMN ip_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE prefix ADD COLUMN child_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE prefix ADD COLUMN child_addresses NUMERIC(39, 0) NOT NULL DEFAULT 0;
+
+CREATE INDEX ix_tenant_created_at_id ON tenant (created_at, id);
+CREATE INDEX ix_vrf_created_at_id ON vrf (created_at, id);
+CREATE INDEX ix_prefix_cidr_gist ON prefix USING gist (cidr inet_ops);
+CREATE INDEX ix_prefix_created_at_id ON prefix (created_at, id);
+CREATE INDEX ix_prefix_parent_id ON prefix (parent_id);
+CREATE INDEX ix_prefix_vrf_id ON prefix (vrf_id);
+CREATE INDEX ix_ipaddress_address_gist ON ipaddress USING gist (address inet_ops);
+CREATE INDEX ix_ipaddress_created_at_id ON ipaddress (created_at, id);
+CREATE INDEX ix_ipaddress_prefix_id ON ipaddress (prefix_id);
+CREATE INDEX ix_ipaddress_vrf_id_address ON ipaddress (vrf_id, address);
+
+COMMIT;
+
+-- The counters are zero until recomputed. Once the app is up, run
+--   POST /v1/admin/utilization:repair
+-- (optionally ?vrf_id=... per VRF) to fill ip_count, child_count and
+-- child_addresses from the existing rows.
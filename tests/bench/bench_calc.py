@@ -0,0 +1,99 @@
+"""Calculator throughput, numpy paths against the equivalent ipaddress loops.
+
+    python -m tests.bench.bench_calc
+
+Each row times one operation at the size of its largest request
+(app/api/schemas.py) and prints items per second for both.
+"""
+from __future__ import annotations
+
+import ipaddress
+import random
+import time
+from typing import Callable
+
+from app.api.schemas import CalcInfoOut
+from app.services import calc
+from app.services.allocator import host_bounds
+
+
+def _items(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rng.random() < 0.7:
+            plen = rng.randint(16, 32)
+            out.append(f"{ipaddress.IPv4Address(0x0A000000 | rng.getrandbits(24))}/{plen}")
+        else:
+            plen = rng.choice([48, 56, 64, 96, 128])
+            out.append(f"{ipaddress.IPv6Address((0x20010DB8 << 96) | rng.getrandbits(64) << 32)}/{plen}")
+    return out
+
+
+def _nets(items: list[str]) -> list[ipaddress._BaseNetwork]:  # type: ignore[name-defined]
+    return [ipaddress.ip_network(s, strict=False) for s in items]
+
+
+def _info(items):
+    out = []
+    for n in _nets(items):
+        first, last = host_bounds(n)
+        addr = ipaddress.IPv4Address if n.version == 4 else ipaddress.IPv6Address
+        out.append(CalcInfoOut(
+            cidr=str(n), version=n.version, network=str(n.network_address), broadcast=str(n.broadcast_address),
+            netmask=str(n.netmask), prefixlen=n.prefixlen, num_addresses=n.num_addresses,
+            first_host=str(addr(first)), last_host=str(addr(last)), host_count=last - first + 1,
+        ))
+    return out
+
+
+def _summarize(items):
+    nets = _nets(items)
+    return [str(n) for v in (4, 6) for n in ipaddress.collapse_addresses(n for n in nets if n.version == v)]
+
+
+def _contains(networks, items):
+    nets, its = _nets(networks), _nets(items)
+    return [[j for j, n in enumerate(nets) if i.version == n.version and i.subnet_of(n)] for i in its]
+
+
+def _overlaps(items):
+    nets = _nets(items)
+    return [
+        (i, j)
+        for i in range(len(nets)) for j in range(i + 1, len(nets))
+        if nets[i].version == nets[j].version and nets[i].overlaps(nets[j])
+    ]
+
+
+def _split(cidr, new_prefix, limit):
+    return [str(s) for s in ipaddress.ip_network(cidr).subnets(new_prefix=new_prefix)]
+
+
+def _time(fn: Callable, *args) -> float:
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    big, pair = _items(100_000, 1), _items(3_000, 2)
+    cases = [
+        ("info", 10_000, calc.info, _info, (big[:10_000],)),
+        ("summarize", 100_000, calc.summarize, _summarize, (big,)),
+        ("split /8 -> /24", 65_536, calc.split, _split, ("10.0.0.0/8", 24, 65_536)),
+        ("contains 1k x 1k", 1_000_000, calc.contains, _contains, (pair[:1_000], _items(1_000, 3))),
+        ("overlaps 3k", 4_498_500, calc.overlaps, _overlaps, (pair,)),
+    ]
+    print(f"{'op':<18} {'n':>10} {'numpy/s':>12} {'ipaddress/s':>12} {'speedup':>8}")
+    for name, n, fast, slow, args in cases:
+        assert fast(*args) == slow(*args)
+        tf, ts = _time(fast, *args), _time(slow, *args)
+        print(f"{name:<18} {n:>10} {n / tf:>12,.0f} {n / ts:>12,.0f} {ts / tf:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
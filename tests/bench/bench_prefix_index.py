@@ -0,0 +1,95 @@
+"""create_prefix latency as a VRF grows, through the service on a real session.
+
+    python -m tests.bench.bench_prefix_index [max_prefixes]
+
+Runs against SUBNETTER_DB_URL (create a scratch database for it). Seeds one
+VRF per family with non-overlapping /29s (IPv4) and /64s (IPv6) by bulk
+insert, then times ``ipam.create_prefix`` over a batch of new ones at each
+size: VRF lock and rev bump, overlap check, LPM nesting, insert, counters
+and change row, commit. With the rev-stamped caches warm the per-insert cost
+should stay roughly flat, however many prefixes the VRF holds. The bench's
+tenant, VRFs and change rows are removed afterwards.
+"""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import random
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, insert
+
+from app.api.schemas import PrefixCreate, TenantCreate, VrfCreate
+from app.core.deps import SessionLocal, engine
+from app.db import models as m
+from app.db.bootstrap import create_schema
+from app.services import ipam
+
+BATCH = 200
+SEED_CHUNK = 5000
+
+
+def _nets(version: int, n: int) -> list[str]:
+    if version == 4:
+        base, plen, step = int(ipaddress.IPv4Address("10.0.0.0")), 29, 1 << 3
+        make = ipaddress.IPv4Network
+    else:
+        base, plen, step = int(ipaddress.IPv6Address("2001:db8::")), 64, 1 << 64
+        make = ipaddress.IPv6Network
+    slots = random.Random(version).sample(range(n), n)  # random order, like real allocations
+    return [str(make((base + i * step, plen))) for i in slots]
+
+
+async def _seed(vrf_id: uuid.UUID, cidrs: list[str]) -> None:
+    """Bulk-insert prefixes behind the service's back; the first timed call rebuilds the caches."""
+    async with SessionLocal() as db:
+        for i in range(0, len(cidrs), SEED_CHUNK):
+            await db.execute(insert(m.Prefix), [
+                m.Prefix(vrf_id=vrf_id, cidr=c, status="active").model_dump() for c in cidrs[i:i + SEED_CHUNK]
+            ])
+        await db.commit()
+
+
+async def run(tenant_id: uuid.UUID, version: int, max_prefixes: int, vrf_ids: list[uuid.UUID]) -> None:
+    nets = _nets(version, max_prefixes + 1)
+    async with SessionLocal() as db:
+        vrf = await ipam.create_vrf(db, VrfCreate(tenant_id=tenant_id, name=f"bench-v{version}"))
+    vrf_ids.append(vrf.id)
+    size, checkpoint = 0, min(1000, max_prefixes)
+    print(f"IPv{version}  {'prefixes':>10}  {'ms/insert':>10}", flush=True)
+    while size < max_prefixes:
+        # grow to the checkpoint untimed, warm the caches with one create, then time one batch
+        await _seed(vrf.id, nets[size:checkpoint - BATCH - 1])
+        async with SessionLocal() as db:
+            await ipam.create_prefix(db, PrefixCreate(vrf_id=vrf.id, cidr=nets[checkpoint - BATCH - 1], status="active"), idem=None)
+            t0 = time.perf_counter()
+            for cidr in nets[checkpoint - BATCH:checkpoint]:
+                await ipam.create_prefix(db, PrefixCreate(vrf_id=vrf.id, cidr=cidr, status="active"), idem=None)
+            dt = time.perf_counter() - t0
+        size = checkpoint
+        print(f"      {size:>10}  {dt / BATCH * 1e3:>10.3f}", flush=True)
+        checkpoint = min(checkpoint * 10, max_prefixes)
+
+
+async def main(max_prefixes: int) -> None:
+    await create_schema(engine)
+    async with SessionLocal() as db:
+        tenant = await ipam.create_tenant(db, TenantCreate(name=f"bench-{uuid.uuid4().hex[:8]}"))
+    vrf_ids: list[uuid.UUID] = []
+    try:
+        for version in (4, 6):
+            await run(tenant.id, version, max_prefixes, vrf_ids)
+    finally:
+        async with SessionLocal() as db:
+            for table, col in ((m.Prefix, m.Prefix.vrf_id), (m.ChangeLog, m.ChangeLog.vrf_id), (m.VRF, m.VRF.id)):
+                await db.execute(delete(table).where(col.in_(vrf_ids)))
+            await db.execute(delete(m.ChangeLog).where(m.ChangeLog.entity_id == tenant.id))
+            await db.execute(delete(m.Tenant).where(m.Tenant.id == tenant.id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
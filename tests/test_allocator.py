@@ -0,0 +1,61 @@
+import ipaddress
+import random
+
+import pytest
+
+from app.services.allocator import FreeRanges, host_bounds
+
+
+@pytest.mark.parametrize("cidr", [
+    "10.0.0.0/24", "10.0.0.0/30", "10.0.0.0/31", "10.0.0.1/32",
+    "2001:db8::/120", "2001:db8::/127", "2001:db8::1/128",
+])
+def test_host_bounds_match_hosts(cidr):
+    net = ipaddress.ip_network(cidr)
+    hosts = [int(h) for h in net.hosts()]
+    assert host_bounds(net) == (hosts[0], hosts[-1])
+    assert hosts == list(range(hosts[0], hosts[-1] + 1))
+
+
+def _free(fr: FreeRanges) -> list[int]:
+    return [x for s, e in zip(fr.starts, fr.ends) for x in range(s, e + 1)]
+
+
+def test_initial_ranges():
+    fr = FreeRanges(1, 10, [3, 4, 10, 42, 0])
+    assert list(zip(fr.starts, fr.ends)) == [(1, 2), (5, 9)]
+    assert fr.lowest() == 1
+    assert fr.lowest_n(4) == [1, 2, 5, 6]
+    assert fr.first_run(3) == 5
+    assert fr.first_run(6) is None
+
+
+def test_exhausted():
+    fr = FreeRanges(1, 2, [1, 2])
+    assert fr.lowest() is None
+    assert fr.lowest_n(3) == []
+    assert not fr.take(1)
+    assert fr.release(1)
+    assert fr.lowest() == 1
+
+
+def test_take_release_match_set():
+    rng = random.Random(7)
+    lo, hi = 1, 200
+    free = set(range(lo, hi + 1)) - set(rng.sample(range(lo, hi + 1), 80))
+    fr = FreeRanges(lo, hi, set(range(lo, hi + 1)) - free)
+    for _ in range(2000):
+        x = rng.randint(lo - 2, hi + 2)
+        if rng.random() < 0.5:
+            assert fr.take(x) == (x in free)
+            free.discard(x)
+        else:
+            assert fr.release(x) == (lo <= x <= hi and x not in free)
+            if lo <= x <= hi:
+                free.add(x)
+        assert _free(fr) == sorted(free)
+        # ranges stay maximal: no two adjacent
+        assert all(e + 1 < s for e, s in zip(fr.ends, fr.starts[1:]))
+    ordered = sorted(free)
+    assert fr.lowest() == (ordered[0] if ordered else None)
+    assert fr.lowest_n(5) == ordered[:5]
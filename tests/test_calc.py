@@ -0,0 +1,123 @@
+"""calc's numpy paths against ipaddress on the same randomized inputs."""
+import ipaddress
+import random
+
+import pytest
+
+from app.core.errors import ValidationErr
+from app.services import calc
+from app.services.allocator import host_bounds
+
+
+def _random_item(rng: random.Random, host_bits: bool = True) -> str:
+    """An IPv4 or IPv6 CIDR (or bare address), clustered so that items overlap often."""
+    if rng.random() < 0.5:
+        bits, base, plen = 32, 0x0A000000, rng.randint(8, 32)
+        addr = base | rng.getrandbits(16) << rng.randint(0, 8)
+    else:
+        bits, base, plen = 128, 0x20010DB8 << 96, rng.choice([32, 48, 56, 64, 96, 120, 126, 127, 128])
+        addr = base | rng.getrandbits(48) << rng.randint(0, 80)
+    addr &= (1 << bits) - 1
+    if not host_bits:
+        addr &= ~((1 << (bits - plen)) - 1)
+    a = ipaddress.IPv4Address(addr) if bits == 32 else ipaddress.IPv6Address(addr)
+    if plen == bits and rng.random() < 0.5:
+        return str(a)
+    return f"{a}/{plen}"
+
+
+def _items(seed: int, n: int, host_bits: bool = True) -> list[str]:
+    rng = random.Random(seed)
+    return [_random_item(rng, host_bits) for _ in range(n)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_info(seed):
+    items = _items(seed, 300)
+    for item, row in zip(items, calc.info(items)):
+        net = ipaddress.ip_network(item, strict=False)
+        first, last = host_bounds(net)
+        assert row.cidr == str(net)
+        assert row.version == net.version
+        assert row.network == str(net.network_address)
+        assert row.broadcast == str(net.broadcast_address)
+        assert row.netmask == str(net.netmask)
+        assert row.prefixlen == net.prefixlen
+        assert row.num_addresses == net.num_addresses
+        addr = ipaddress.IPv4Address if net.version == 4 else ipaddress.IPv6Address
+        assert row.first_host == str(addr(first))
+        assert row.last_host == str(addr(last))
+        assert row.host_count == last - first + 1
+
+
+def test_info_strict():
+    assert calc.info(["10.0.0.0/8"], strict=True)[0].cidr == "10.0.0.0/8"
+    with pytest.raises(ValidationErr):
+        calc.info(["10.0.0.1/8"], strict=True)
+    with pytest.raises(ValidationErr):
+        calc.info(["10.0.0.0/33"])
+    with pytest.raises(ValidationErr):
+        calc.info(["not-an-ip"])
+
+
+@pytest.mark.parametrize("cidr,new_prefix", [
+    ("10.0.0.0/16", 24), ("10.0.0.0/24", 24), ("10.0.0.0/22", 32), ("0.0.0.0/0", 10),
+    ("2001:db8::/48", 60), ("2001:db8::/56", 64), ("2001:db8::/120", 128), ("::/0", 12),
+    ("2001:db8::/62", 64), ("2001:db8::/63", 66),
+])
+def test_split(cidr, new_prefix):
+    expected = [str(s) for s in ipaddress.ip_network(cidr).subnets(new_prefix=new_prefix)]
+    assert calc.split(cidr, new_prefix, limit=65_536) == expected
+
+
+def test_split_limits():
+    with pytest.raises(ValidationErr):
+        calc.split("10.0.0.0/8", 24, limit=100)
+    with pytest.raises(ValidationErr):
+        calc.split("10.0.0.0/24", 16, limit=100)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_summarize(seed):
+    items = _items(seed, 500)
+    nets = [ipaddress.ip_network(s, strict=False) for s in items]
+    expected = []
+    for v in (4, 6):
+        expected += [str(n) for n in ipaddress.collapse_addresses(n for n in nets if n.version == v)]
+    assert calc.summarize(items) == expected
+
+
+def test_summarize_ipv6_word_edges():
+    # adjacency across the 64-bit word boundary, and a run reaching the top of the space
+    assert calc.summarize(["0:0:0:0:ffff:ffff:ffff:ffff/128", "0:0:0:1::/128"]) == [
+        "::ffff:ffff:ffff:ffff/128", "0:0:0:1::/128",
+    ]
+    assert calc.summarize(["::/65", "0:0:0:0:8000::/65"]) == ["::/64"]
+    assert calc.summarize(["8000::/1", "ffff::/16", "::/1"]) == ["::/0"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contains(seed):
+    networks, items = _items(seed, 150), _items(seed + 100, 150)
+    nets = [ipaddress.ip_network(s, strict=False) for s in networks]
+    its = [ipaddress.ip_network(s, strict=False) for s in items]
+    expected = [[j for j, n in enumerate(nets) if i.version == n.version and i.subnet_of(n)] for i in its]
+    assert calc.contains(networks, items) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_overlaps(seed):
+    items = _items(seed, 300)
+    nets = [ipaddress.ip_network(s, strict=False) for s in items]
+    expected = [
+        (i, j)
+        for i in range(len(nets)) for j in range(i + 1, len(nets))
+        if nets[i].version == nets[j].version and nets[i].overlaps(nets[j])
+    ]
+    assert calc.overlaps(items) == expected
+
+
+def test_cell_cap(monkeypatch):
+    monkeypatch.setattr(calc, "MAX_CELLS", 10)
+    with pytest.raises(ValidationErr):
+        calc.overlaps(["10.0.0.0/8"] * 4)
@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.db.replica import WRITE_TOKEN, WriteTokenMiddleware, request_commits
+from app.services.coalesce import Coalescer
+
+
+class _Router:
+    enabled = True
+
+    async def write_token(self):
+        return "0/1"
+
+
+def test_every_coalesced_waiter_gets_a_write_token():
+    async def run(db, key, n):
+        await asyncio.sleep(0.01)
+        # the commit listener flags whichever request's context the drain task copied
+        request_commits().wrote = True
+        return [f"{key}-{i}" for i in range(n)]
+
+    coalescer = Coalescer("test_next", run, lambda: RuntimeError("exhausted"), window_s=0.01, max_batch=8)
+    api = FastAPI()
+
+    @api.post("/next")
+    async def next_item():
+        return {"item": await coalescer.submit("p")}
+
+    async def main():
+        transport = httpx.ASGITransport(app=WriteTokenMiddleware(api, _Router()))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await asyncio.gather(c.post("/next"), c.post("/next"))
+
+    responses = asyncio.run(main())
+    assert sorted(r.json()["item"] for r in responses) == ["p-0", "p-1"]
+    assert [r.headers.get(WRITE_TOKEN) for r in responses] == ["0/1", "0/1"]
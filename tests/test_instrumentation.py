@@ -0,0 +1,27 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app.core.instrumentation import _current, instrumented
+
+
+def _queries(op: str) -> float:
+    return REGISTRY.get_sample_value("subnetter_db_queries_per_call_sum", {"op": op}) or 0.0
+
+
+def test_nested_calls_roll_up():
+    @instrumented
+    async def inner_op():
+        _current.get().queries += 2
+
+    @instrumented
+    async def outer_op():
+        _current.get().queries += 1
+        await inner_op()
+        await inner_op()
+
+    before_inner, before_outer = _queries("inner_op"), _queries("outer_op")
+    asyncio.run(outer_op())
+    assert _queries("inner_op") - before_inner == 4
+    assert _queries("outer_op") - before_outer == 5
+    assert _current.get() is None
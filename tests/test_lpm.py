@@ -0,0 +1,76 @@
+import ipaddress
+import random
+import uuid
+
+from app.services.lpm import VrfLpmTable
+
+net = ipaddress.ip_network
+ip = ipaddress.ip_address
+
+
+def test_lookup_most_specific():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    t = VrfLpmTable(rev=1)
+    t.add(a, net("10.0.0.0/8"), None)
+    t.add(b, net("10.1.0.0/16"), a)
+    t.add(c, net("2001:db8::/32"), None)
+    assert t.lookup(ip("10.1.2.3")) == b
+    assert t.lookup(ip("10.2.0.1")) == a
+    assert t.lookup(ip("11.0.0.1")) is None
+    assert t.lookup(ip("2001:db8::1")) == c
+    assert t.cidr(b) == "10.1.0.0/16"
+
+
+def test_same_cidr_newest_wins():
+    parent, child = uuid.uuid4(), uuid.uuid4()
+    t = VrfLpmTable(rev=1)
+    t.add(parent, net("10.0.0.0/24"), None)
+    t.add(child, net("10.0.0.0/24"), parent)
+    assert t.lookup(ip("10.0.0.5")) == child
+    t.remove(child)
+    assert t.lookup(ip("10.0.0.5")) == parent
+    t.remove(parent)
+    assert t.lookup(ip("10.0.0.5")) is None
+    assert t.lengths[4] == []
+
+
+def test_parent_of_and_children_within():
+    top, x, y = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    t = VrfLpmTable(rev=1)
+    t.add(top, net("10.0.0.0/16"), None)
+    t.add(x, net("10.0.1.0/24"), top)
+    t.add(y, net("10.0.200.0/24"), top)
+    assert t.parent_of(net("10.0.0.0/20")) == top
+    assert t.parent_of(net("10.0.1.0/24")) == x
+    assert t.parent_of(net("10.0.0.0/8")) is None
+    assert t.children_within(top, net("10.0.0.0/20")) == [x]
+    t.reparent(x, None)
+    assert t.children_within(top, net("10.0.0.0/20")) == []
+    assert t.children_within(None, net("10.0.0.0/20")) == [x]
+
+
+def test_matches_brute_force():
+    rng = random.Random(11)
+    t = VrfLpmTable(rev=1)
+    live: dict[uuid.UUID, ipaddress.IPv4Network] = {}
+    order: list[uuid.UUID] = []
+    for _ in range(500):
+        if live and rng.random() < 0.3:
+            victim = rng.choice(order)
+            t.remove(victim)
+            del live[victim]
+            order.remove(victim)
+            continue
+        plen = rng.randint(8, 28)
+        n = net(f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/{plen}", strict=False)
+        id = uuid.uuid4()
+        t.add(id, n, None)
+        live[id] = n
+        order.append(id)
+        probe = ip(f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}")
+        hits = [i for i in order if probe in live[i]]
+        if hits:
+            best = max(live[i].prefixlen for i in hits)
+            assert t.lookup(probe) == [i for i in hits if live[i].prefixlen == best][-1]
+        else:
+            assert t.lookup(probe) is None
@@ -0,0 +1,97 @@
+import ipaddress
+import random
+
+import pytest
+
+from app.services.radix import PrefixTrie, VrfPrefixIndex
+
+
+def _overlaps(a: tuple[int, int], b: tuple[int, int], bits: int) -> bool:
+    plen = min(a[1], b[1])
+    shift = bits - plen
+    return a[0] >> shift == b[0] >> shift
+
+
+def _random_prefix(rng: random.Random, bits: int, max_plen: int) -> tuple[int, int]:
+    plen = rng.randint(0, max_plen)
+    key = rng.getrandbits(bits) & ~((1 << (bits - plen)) - 1)
+    return key, plen
+
+
+def test_insert_and_find_overlap():
+    t = PrefixTrie(32)
+    t.insert(0x0A000000, 8)  # 10.0.0.0/8
+    assert len(t) == 1
+    assert t.find_overlap(0x0A010000, 16) == (0x0A000000, 8)  # inside
+    assert t.find_overlap(0x00000000, 0) == (0x0A000000, 8)    # covering
+    assert t.find_overlap(0x0B000000, 8) is None               # sibling
+
+
+def test_find_overlap_below_query():
+    t = PrefixTrie(32)
+    t.insert(0x0A010200, 24)
+    t.insert(0x0A020000, 16)
+    assert t.find_overlap(0x0A000000, 8) in {(0x0A010200, 24), (0x0A020000, 16)}
+    assert t.find_overlap(0x0A030000, 16) is None
+
+
+def test_duplicates_are_counted():
+    t = PrefixTrie(32)
+    t.insert(0xC0A80000, 16)
+    t.insert(0xC0A80000, 16)
+    assert len(t) == 2
+    assert t.remove(0xC0A80000, 16)
+    assert t.find_overlap(0xC0A80100, 24) == (0xC0A80000, 16)
+    assert t.remove(0xC0A80000, 16)
+    assert t.find_overlap(0xC0A80100, 24) is None
+    assert len(t) == 0
+
+
+def test_remove_missing():
+    t = PrefixTrie(32)
+    t.insert(0x0A000000, 8)
+    assert not t.remove(0x0A000000, 16)
+    assert not t.remove(0x0B000000, 8)
+    assert not t.remove(0, 0)
+    assert len(t) == 1
+
+
+@pytest.mark.parametrize("bits", [32, 128])
+def test_matches_brute_force(bits):
+    rng = random.Random(bits)
+    max_plen = min(bits, 24)  # short masks keep overlaps frequent
+    t = PrefixTrie(bits)
+    stored: list[tuple[int, int]] = []
+    for _ in range(3000):
+        p = _random_prefix(rng, bits, max_plen)
+        op = rng.random()
+        if op < 0.45:
+            t.insert(*p)
+            stored.append(p)
+        elif op < 0.7 and stored:
+            victim = rng.choice(stored)
+            assert t.remove(*victim)
+            stored.remove(victim)
+        elif op < 0.75:
+            assert t.remove(*p) == (p in stored)
+            if p in stored:
+                stored.remove(p)
+        else:
+            hit = t.find_overlap(*p)
+            expected = [s for s in stored if _overlaps(s, p, bits)]
+            if expected:
+                assert hit in expected
+            else:
+                assert hit is None
+        assert len(t) == len(stored)
+
+
+def test_vrf_prefix_index():
+    idx = VrfPrefixIndex(rev=1)
+    idx.add(ipaddress.ip_network("10.0.0.0/16"))
+    idx.add(ipaddress.ip_network("2001:db8::/32"))
+    assert idx.find_overlap(ipaddress.ip_network("10.0.5.0/24")) == "10.0.0.0/16"
+    assert idx.find_overlap(ipaddress.ip_network("2001:db8:1::/48")) == "2001:db8::/32"
+    assert idx.find_overlap(ipaddress.ip_network("10.1.0.0/16")) is None
+    idx.discard(ipaddress.ip_network("10.0.0.0/16"))
+    assert idx.find_overlap(ipaddress.ip_network("10.0.5.0/24")) is None
@@ -0,0 +1,50 @@
+import ipaddress
+import random
+
+import pytest
+
+from app.services.ranges import cidr_blocks, gaps, to_addr, to_cidr
+
+
+def test_gaps():
+    assert list(gaps(0, 99, [])) == [(0, 99)]
+    assert list(gaps(0, 99, [(10, 19), (15, 29), (50, 59)])) == [(0, 9), (30, 49), (60, 99)]
+    assert list(gaps(10, 20, [(0, 12), (18, 40)])) == [(13, 17)]
+    assert list(gaps(10, 20, [(0, 100)])) == []
+    assert list(gaps(10, 20, [(30, 40), (0, 5)])) == [(10, 20)]
+
+
+def test_gaps_match_set_difference():
+    rng = random.Random(3)
+    for _ in range(200):
+        lo, hi = sorted(rng.sample(range(300), 2))
+        used = [tuple(sorted(rng.sample(range(-20, 320), 2))) for _ in range(rng.randint(0, 8))]
+        free = set(range(lo, hi + 1)).difference(*(range(s, e + 1) for s, e in used))
+        out = list(gaps(lo, hi, used))
+        assert sorted(x for s, e in out for x in range(s, e + 1)) == sorted(free)
+        assert all(e + 1 < s for (_, e), (s, _) in zip(out, out[1:]))
+
+
+@pytest.mark.parametrize("version,bits", [(4, 32), (6, 128)])
+def test_cidr_blocks_match_summarize(version, bits):
+    rng = random.Random(bits)
+    addr = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    for _ in range(300):
+        a, b = sorted(rng.getrandbits(bits) for _ in range(2))
+        if rng.random() < 0.5:
+            b = min(a + rng.randint(0, 5000), (1 << bits) - 1)
+        expected = [
+            (int(n.network_address), n.prefixlen)
+            for n in ipaddress.summarize_address_range(addr(a), addr(b))
+        ]
+        assert list(cidr_blocks(a, b, bits)) == expected
+
+
+def test_cidr_blocks_whole_space():
+    assert list(cidr_blocks(0, (1 << 32) - 1, 32)) == [(0, 0)]
+
+
+def test_to_cidr():
+    assert to_addr(0x0A000001, 4) == "10.0.0.1"
+    assert to_cidr(0x20010DB8 << 96, 32, 6) == "2001:db8::/32"
+    assert to_addr(0xFFFF0A000001, 6) == str(ipaddress.IPv6Address(0xFFFF0A000001))
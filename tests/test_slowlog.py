@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql
+
+from app.db import models as m
+from app.db.slowlog import _read_only
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.parametrize("stmt", [
+    select(m.Prefix).where(m.Prefix.vrf_id == uuid.uuid4()).order_by(m.Prefix.cidr).limit(10),
+    select(func.count(), func.coalesce(func.sum(m.Prefix.ip_count), 0)).where(m.Prefix.id.in_([uuid.uuid4()])),
+])
+def test_plain_selects_are_analyzed(stmt):
+    assert _read_only(_sql(stmt))
+
+
+@pytest.mark.parametrize("sql", [
+    _sql(select(m.Prefix.id).where(m.Prefix.id == uuid.uuid4()).with_for_update()),
+    _sql(select(m.Prefix.id).with_for_update(read=True)),
+    _sql(select(m.Prefix.id).with_for_update(key_share=True)),
+    _sql(update(m.Prefix).values(ip_rev=m.Prefix.ip_rev + 1)),
+    "SELECT nextval('change_log_seq_seq')",
+    "SELECT pg_advisory_xact_lock(42)",
+    "SELECT * INTO scratch FROM prefix",
+    "WITH d AS (DELETE FROM prefix RETURNING id) SELECT count(*) FROM d",
+])
+def test_writes_locks_and_calls_are_not(sql):
+    assert not _read_only(sql)